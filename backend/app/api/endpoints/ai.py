@@ -7,9 +7,10 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 from app.core.response import success_response, error_response
+from app.core.timing import TimedRoute
 from app.services.ai_service import ai_service
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 class ChatRequest(BaseModel):
@@ -69,14 +70,14 @@ async def chat_stream(request: ChatRequest):
 @router.get("/history/{session_id}")
 async def get_history(session_id: str):
     """获取对话历史"""
-    history = ai_service.get_history(session_id)
+    history = await ai_service.get_history(session_id)
     return success_response(data=history)
 
 
 @router.delete("/history/{session_id}")
 async def clear_history(session_id: str):
     """清除对话历史"""
-    ai_service.clear_history(session_id)
+    await ai_service.clear_history(session_id)
     return success_response(message="历史记录已清除")
 
 
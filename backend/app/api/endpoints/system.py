@@ -1,26 +1,188 @@
 """
 系统相关API接口
 """
-from fastapi import APIRouter
-from app.core.response import success_response
+import asyncio
+import sys
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from app.core.admin import require_admin
+from app.core.response import success_response, cached_response
 from app.core.cache import cache_manager
+from app.core.compression import compression_stats
+from app.core.config import settings
+from app.core.memory import TracingNotStarted, executor_stats, memory_tracer, process_memory
+from app.core.timing import ProfileBusy, TimedRoute, profiler, timing_stats
+from app.services.ai_service import ai_service
+from app.services.batch_jobs import job_manager
 from app.services.tool_registry import tool_registry
+from app.tools.code_render_cache import render_cache
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/health")
 async def health_check():
     """健康检查"""
-    cache_stats = cache_manager.get_stats()
+    cache_stats = await cache_manager.aget_stats()
     return success_response(data={
         "status": "healthy",
-        "cache": cache_stats
+        "cache": cache_stats,
+        "tools": tool_registry.get_load_stats()
     })
 
 
 @router.get("/navigation")
-async def get_navigation():
-    """获取导航树"""
-    navigation = tool_registry.get_navigation_tree()
-    return success_response(data=navigation)
+async def get_navigation(request: Request):
+    """获取导航树（预先序列化，If-None-Match 匹配时返回 304）"""
+    snapshot = tool_registry.get_catalog_snapshot("navigation")
+    return cached_response(request, snapshot.body, snapshot.etag, settings.CATALOG_CACHE_MAX_AGE)
+
+
+@router.get("/compression")
+async def get_compression_stats():
+    """响应压缩统计（按路由与编码：原始/压缩后字节数、压缩耗费的 CPU 时间）"""
+    return success_response(data=compression_stats.get_stats())
+
+
+@router.delete("/compression", dependencies=[Depends(require_admin)])
+async def reset_compression_stats():
+    """清空响应压缩统计（管理接口，请求头 X-Admin-Token）"""
+    compression_stats.reset()
+    return success_response(message="压缩统计已清空")
+
+
+@router.get("/timing")
+async def get_timing_stats():
+    """请求耗时统计（按路由与阶段：次数、平均值、p50/p90/p99、最大值，单位毫秒）"""
+    return success_response(data=timing_stats.get_stats())
+
+
+@router.delete("/timing", dependencies=[Depends(require_admin)])
+async def reset_timing_stats():
+    """清空请求耗时统计（管理接口，请求头 X-Admin-Token）"""
+    timing_stats.reset()
+    return success_response(message="耗时统计已清空")
+
+
+@router.get("/profile", dependencies=[Depends(require_admin)])
+async def profile_process(
+    seconds: float = 5.0,
+    interval_ms: float = 10.0,
+    format: str = "collapsed",
+    include_idle: bool = False
+):
+    """
+    对当前进程做限时采样分析（管理接口，请求头 X-Admin-Token）
+    format=collapsed 返回火焰图折叠格式文本（flamegraph.pl / speedscope 可直接读取），format=json 返回统计与按次数排序的栈
+    """
+    if format not in ("collapsed", "json"):
+        raise HTTPException(status_code=400, detail=f"不支持的格式: {format}")
+    if not 0 < seconds <= settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"采样时间必须在 0 到 {settings.PROFILE_MAX_SECONDS} 秒之间")
+    if not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="采样间隔必须在 1 到 1000 毫秒之间")
+    # 采样在线程池中进行，事件循环照常处理请求（也会被采样）
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, profiler.run, seconds, interval_ms / 1000, include_idle
+        )
+    except ProfileBusy:
+        raise HTTPException(status_code=409, detail="已有采样分析在进行中")
+    stacks = result.pop("stacks")
+    if format == "collapsed":
+        return PlainTextResponse(
+            profiler.collapsed(stacks),
+            headers={f"X-Profile-{key.replace('_', '-')}": str(value) for key, value in result.items()}
+        )
+    result["stacks"] = [{"stack": stack, "count": count} for stack, count in stacks.most_common()]
+    return success_response(data=result)
+
+
+def _memory_report() -> dict:
+    """缓存、会话、渲染缓存等的占用（遍历缓存内容，在线程池中调用）"""
+    templates = sys.modules.get("app.tools.code_templates")
+    return {
+        "process": process_memory(),
+        "cache": cache_manager.memory_report(),
+        "sessions": ai_service.get_session_stats(),
+        "batch_jobs": job_manager.get_memory_stats(),
+        "render_cache": render_cache.get_stats(),
+        "template_cache": templates.template_registry.get_stats() if templates else None,
+    }
+
+
+@router.get("/memory", dependencies=[Depends(require_admin)])
+async def get_memory_report():
+    """
+    内存报告（管理接口）：进程 RSS 与 tracemalloc 概况、按键前缀的缓存占用、会话数与历史大小、
+    批量任务在途条目、渲染/模板缓存、线程池与进程池队列
+    """
+    # 未导入的模块（工具按需加载）不导入，视为未创建
+    code_generator = sys.modules.get("app.tools.code_generator")
+    render_pool = sys.modules.get("app.tools.code_render_pool")
+    loop = asyncio.get_running_loop()
+    # 先读取线程池状态，报告本身也要占用默认线程池的一个线程
+    executors = {
+        "default": executor_stats(getattr(loop, "_default_executor", None)),
+        "code_generator": executor_stats(getattr(code_generator, "_executor", None)),
+        "code_render_pool": executor_stats(getattr(render_pool, "_pool", None)),
+    }
+    report = await loop.run_in_executor(None, _memory_report)
+    report["executors"] = executors
+    return success_response(data=report)
+
+
+def _check_group(by: str, depth: int, top: int) -> None:
+    if by not in ("module", "app"):
+        raise HTTPException(status_code=400, detail=f"不支持的汇总方式: {by}")
+    if depth < 0 or not 1 <= top <= 500:
+        raise HTTPException(status_code=400, detail="depth 不能为负数，top 必须在 1 到 500 之间")
+
+
+@router.post("/memory/tracemalloc", dependencies=[Depends(require_admin)])
+async def start_tracemalloc(frames: int = 1):
+    """启动 tracemalloc 并记录基线快照（管理接口；跟踪期间 Python 内存分配变慢、占用增加，用完请停止）"""
+    if not 1 <= frames <= 50:
+        raise HTTPException(status_code=400, detail="frames 必须在 1 到 50 之间")
+    info = await asyncio.get_running_loop().run_in_executor(None, memory_tracer.start, frames)
+    return success_response(data=info, message="tracemalloc 已启动")
+
+
+@router.delete("/memory/tracemalloc", dependencies=[Depends(require_admin)])
+async def stop_tracemalloc():
+    """停止 tracemalloc 并释放快照"""
+    memory_tracer.stop()
+    return success_response(message="tracemalloc 已停止")
+
+
+@router.post("/memory/snapshot", dependencies=[Depends(require_admin)])
+async def set_memory_baseline():
+    """重新记录基线快照（之后的 /memory/diff 与此比较）"""
+    try:
+        info = await asyncio.get_running_loop().run_in_executor(None, memory_tracer.set_baseline)
+    except TracingNotStarted:
+        raise HTTPException(status_code=409, detail="tracemalloc 未启动")
+    return success_response(data=info, message="基线快照已记录")
+
+
+@router.get("/memory/snapshot", dependencies=[Depends(require_admin)])
+async def get_memory_snapshot(by: str = "module", depth: int = 0, top: int = 30):
+    """当前 Python 内存分配按模块汇总（by=app 归到最内层的 app.* 栈帧；depth 截取模块名前几级）"""
+    _check_group(by, depth, top)
+    try:
+        data = await asyncio.get_running_loop().run_in_executor(None, memory_tracer.snapshot, by, depth, top)
+    except TracingNotStarted:
+        raise HTTPException(status_code=409, detail="tracemalloc 未启动")
+    return success_response(data=data)
+
+
+@router.get("/memory/diff", dependencies=[Depends(require_admin)])
+async def get_memory_diff(by: str = "module", depth: int = 0, top: int = 30):
+    """当前 Python 内存分配与基线快照的差异按模块汇总（按增长字节数排列）"""
+    _check_group(by, depth, top)
+    try:
+        data = await asyncio.get_running_loop().run_in_executor(None, memory_tracer.diff, by, depth, top)
+    except TracingNotStarted:
+        raise HTTPException(status_code=409, detail="tracemalloc 未启动")
+    return success_response(data=data)
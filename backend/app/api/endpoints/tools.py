@@ -1,15 +1,30 @@
 """
 工具相关API接口
 """
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.requests import ClientDisconnect
 from pydantic import BaseModel
-from typing import Any, Optional, List
-from app.core.response import success_response, error_response
+from typing import Any, Optional, List, Iterable, Tuple
+from urllib.parse import quote
+from app.core import jsonlib
+from app.core.config import settings
+from app.core.response import success_response, error_response, cached_response, envelope_response
+from app.core.memory import PeakRSSTracker
+from app.core.timing import TimedRoute
+from app.core.upload import SpooledBuffer, UploadTooLarge, read_multipart
+from app.services.batch_jobs import JobNotFound, job_manager
 from app.services.tool_registry import tool_registry
-from app.tools import code_generator
-import base64
+from app.tools.json_stream_formatter import STREAM_MODES, JSONStreamError, aiter_reformat
+import asyncio
+import json
+import logging
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=TimedRoute)
 
 
 class ToolExecuteRequest(BaseModel):
@@ -30,6 +45,7 @@ class CodeGenerateRequest(BaseModel):
     qr_border: int = 4
     qr_fill_color: str = "black"
     qr_back_color: str = "white"
+    qr_resize_mode: str = "stretch"  # stretch：平滑缩放到输出尺寸；fit：整数倍放大后居中（清晰，输出尺寸不能小于模块数）
     # 条形码配置
     barcode_width: float = 0.4
     barcode_height: float = 15.0
@@ -40,12 +56,14 @@ class CodeGenerateRequest(BaseModel):
     # 模板合成配置
     use_template: bool = False
     template_base64: Optional[str] = None
+    template_id: Optional[str] = None  # 已注册模板的ID（优先于 template_base64）
     position_x: int = 0
     position_y: int = 0
     # 最终输出配置
     output_format: str = "PNG"
     output_quality: int = 95
     output_path: Optional[str] = None
+    output_profile: Optional[str] = None  # 编码配置：fastest / balanced（无损）/ gray16 / smallest，默认 CODE_OUTPUT_PROFILE
 
 
 class BatchCodeGenerateRequest(BaseModel):
@@ -53,13 +71,23 @@ class BatchCodeGenerateRequest(BaseModel):
     items: List[dict]
     common_config: dict = {}
     max_concurrent: int = 10
+    use_cache: bool = True  # 是否使用渲染缓存（批内重复项始终只生成一次）
+
+
+class SheetGenerateRequest(BaseModel):
+    """条码拼版请求"""
+    items: List[dict]
+    common_config: dict = {}
+    sheet: dict = {}  # 拼版配置，见 SheetSpec（纸张、行列、边距、单元格模板、输出格式 PNG/PDF）
+    max_concurrent: int = 10
+    use_cache: bool = True
 
 
 @router.get("/")
-async def get_tools():
-    """获取所有工具列表"""
-    tools = tool_registry.get_all_tools()
-    return success_response(data=tools)
+async def get_tools(request: Request):
+    """获取所有工具列表（预先序列化，If-None-Match 匹配时返回 304）"""
+    snapshot = tool_registry.get_catalog_snapshot("tools")
+    return cached_response(request, snapshot.body, snapshot.etag, settings.CATALOG_CACHE_MAX_AGE)
 
 
 @router.get("/{tool_id}")
@@ -80,32 +108,258 @@ async def execute_tool(tool_id: str, request: ToolExecuteRequest):
             params=request.params,
             use_cache=request.cache
         )
-        return success_response(data=result)
+        return envelope_response(data=result)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"工具执行失败: {str(e)}")
 
 
+def _parse_upload_options(items: Iterable[Tuple[str, str]]) -> dict:
+    """
+    解析查询参数/表单字段中的工具选项
+    值按 JSON 解析（数字、布尔、列表、对象），解析失败则保留为字符串；
+    同名参数重复出现时合并为列表
+    """
+    options = {}
+    repeated = set()
+    for key, value in items:
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+        if key in options:
+            if key not in repeated:
+                options[key] = [options[key]]
+                repeated.add(key)
+            options[key].append(value)
+        else:
+            options[key] = value
+    return options
+
+
+@router.post("/{tool_id}/upload")
+async def upload_tool_input(tool_id: str, request: Request):
+    """
+    上传原始文档执行工具（适合大文档）
+    
+    支持两种方式：
+    - multipart/form-data：文件字段 file，其他表单字段作为工具选项
+    - 原始请求体：整个请求体即为文档内容
+    工具选项也可以通过查询参数传递，如 ?indent=4&input_mode=ndjson
+    """
+    upload_param = tool_registry.get_upload_param(tool_id)
+    if not upload_param:
+        raise HTTPException(status_code=400, detail=f"工具不支持上传执行: {tool_id}")
+    
+    options = _parse_upload_options(request.query_params.multi_items())
+    content_type = request.headers.get("content-type", "")
+    form = None
+    
+    try:
+        with PeakRSSTracker() as tracker:
+            if content_type.startswith("multipart/form-data"):
+                # 边接收边检查大小，不等整个表单写入临时文件后才拒绝
+                form = await read_multipart(request.headers, request.stream())
+                upload = form.get("file")
+                if not isinstance(upload, StarletteUploadFile):
+                    raise HTTPException(status_code=400, detail="缺少上传文件字段: file")
+                options.update(_parse_upload_options(
+                    (key, value) for key, value in form.multi_items()
+                    if not isinstance(value, StarletteUploadFile)
+                ))
+                spool = SpooledBuffer(file=upload.file)
+            else:
+                spool = SpooledBuffer()
+                await spool.write_stream(request.stream())
+            
+            with spool:
+                params = {**options, upload_param: spool.buffer()}
+                result = await tool_registry.execute_tool(
+                    tool_id=tool_id,
+                    params=params,
+                    use_cache=False
+                )
+        
+        memory = tracker.to_dict()
+        headers = {}
+        if memory["rss_peak"] is not None:
+            headers["X-Peak-RSS"] = str(memory["rss_peak"])
+        if isinstance(result, dict):
+            result["memory"] = memory
+            result["upload_size"] = spool.size
+        return envelope_response(data=result, headers=headers)
+    except HTTPException:
+        raise
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"工具执行失败: {str(e)}")
+    finally:
+        if form is not None:
+            await form.close()
+
+
+# ============ JSON格式化专用接口 ============
+
+@router.post("/json_formatter/stream")
+async def stream_format_json(request: Request, mode: str = "pretty", indent: int = 2):
+    """
+    流式格式化/压缩 JSON（适合超大文档）
+    
+    请求体为原始 JSON，响应以分块传输的方式边读边输出，内存占用与文档大小无关。
+    mode: pretty（缩进格式化）或 compact（压缩）
+    在输出第一块数据之前发现的语法错误返回 400；
+    输出开始后才发现的错误会中断连接，客户端将收到不完整的分块响应。
+    """
+    if mode not in STREAM_MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的格式化模式: {mode}")
+    
+    chunks = aiter_reformat(request.stream(), mode=mode, indent=indent)
+    
+    # 预读第一块：小文档的语法错误可以直接以 400 返回
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = b""
+    except JSONStreamError as e:
+        raise HTTPException(status_code=400, detail=f"JSON解析错误: {str(e)}")
+    
+    async def body():
+        yield first
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except JSONStreamError as e:
+            logger.warning(f"流式格式化中断: {str(e)}")
+            raise
+    
+    return StreamingResponse(
+        body(),
+        media_type="application/json",
+        headers={"X-Accel-Buffering": "no"}
+    )
+
+
 # ============ 条形码/二维码生成器专用接口 ============
+# 条码相关模块（Pillow、qrcode、barcode）在各接口首次调用时才导入，服务启动时不导入
 
 @router.get("/code_generator/formats")
 async def get_code_formats():
     """获取支持的条码/二维码格式"""
+    from app.tools import code_generator
     formats = code_generator.get_supported_formats()
     return success_response(data=formats)
 
 
+@router.get("/code_generator/cache")
+async def get_code_cache_stats():
+    """获取条码渲染缓存（各阶段）与模板缓存统计"""
+    from app.tools import code_generator
+    return success_response(data=code_generator.get_render_cache_stats())
+
+
+@router.post("/code_generator/templates")
+async def upload_code_template(template: UploadFile = File(...)):
+    """上传模板图片，返回模板ID（相同内容返回相同ID）"""
+    from app.tools.code_templates import template_registry
+    data = await template.read()
+    try:
+        info = await asyncio.get_running_loop().run_in_executor(
+            None, template_registry.register, data
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return success_response(data=info, message="模板上传成功")
+
+
+@router.get("/code_generator/templates")
+async def list_code_templates():
+    """获取已注册的模板列表"""
+    from app.tools.code_templates import template_registry
+    return success_response(data={
+        "templates": template_registry.list_templates(),
+        "cache": template_registry.get_stats()
+    })
+
+
+@router.delete("/code_generator/templates/{template_id}")
+async def delete_code_template(template_id: str):
+    """删除模板"""
+    from app.tools.code_templates import TemplateNotFound, template_registry
+    try:
+        deleted = template_registry.delete(template_id)
+    except TemplateNotFound:
+        deleted = False
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"模板不存在: {template_id}")
+    return success_response(message="模板已删除")
+
+
+# 单个条码的响应方式：json（统一响应结构，图片为 base64）、binary（直接返回图片字节）
+CODE_RESPONSE_MODES = ["json", "binary"]
+
+
+def _code_response_mode(http_request: Request, response_mode: Optional[str]) -> str:
+    """确定响应方式：未指定时 Accept 为 image/* 则返回图片字节"""
+    if response_mode is None:
+        accept = http_request.headers.get("accept", "")
+        return "binary" if accept.startswith("image/") else "json"
+    if response_mode not in CODE_RESPONSE_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的响应方式: {response_mode}，可选: {', '.join(CODE_RESPONSE_MODES)}"
+        )
+    return response_mode
+
+
+def _code_image_response(result: dict) -> Response:
+    """以图片字节返回生成结果，尺寸与保存路径放在响应头中"""
+    from app.tools import code_generator
+    output_format = result["format"]
+    extension = code_generator.OUTPUT_EXTENSIONS.get(output_format, "bin")
+    headers = {
+        "Content-Disposition": f'inline; filename="code.{extension}"',
+        "X-Code-Width": str(result["width"]),
+        "X-Code-Height": str(result["height"]),
+    }
+    if result.get("saved_path"):
+        headers["X-Code-Saved-Path"] = quote(result["saved_path"])
+    return Response(
+        content=result["data"],
+        media_type=code_generator.OUTPUT_MEDIA_TYPES.get(output_format, "application/octet-stream"),
+        headers=headers
+    )
+
+
 @router.post("/code_generator/generate")
-async def generate_code(request: CodeGenerateRequest):
-    """生成单个条码/二维码"""
+async def generate_code(
+    request: CodeGenerateRequest,
+    http_request: Request,
+    response_mode: Optional[str] = None
+):
+    """
+    生成单个条码/二维码
+    response_mode=binary（或 Accept: image/*）时直接返回图片字节，不生成 base64
+    """
+    from app.tools import code_generator
+    from app.tools.code_templates import template_registry
+    mode = _code_response_mode(http_request, response_mode)
+    if request.use_template and request.template_id and not template_registry.exists(request.template_id):
+        raise HTTPException(status_code=404, detail=f"模板不存在: {request.template_id}")
     try:
         params = request.model_dump()
-        result = await code_generator.generate_code(params)
+        result = await code_generator.generate_code(params, binary=mode == "binary")
         if result.get("success"):
-            return success_response(data=result)
+            if mode == "binary":
+                return _code_image_response(result)
+            return envelope_response(data=result)
         else:
             raise HTTPException(status_code=400, detail=result.get("error", "生成失败"))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"生成失败: {str(e)}")
 
@@ -113,16 +367,275 @@ async def generate_code(request: CodeGenerateRequest):
 @router.post("/code_generator/generate_batch")
 async def generate_codes_batch(request: BatchCodeGenerateRequest):
     """批量生成条码/二维码（支持并发）"""
+    from app.tools import code_generator
     try:
         params = request.model_dump()
         result = await code_generator.generate_codes_batch(params)
-        return success_response(data=result)
+        return envelope_response(data=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"批量生成失败: {str(e)}")
 
 
+def _check_stream_format(format: str) -> None:
+    from app.tools.code_batch_stream import BATCH_STREAM_FORMATS
+    if format not in BATCH_STREAM_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的输出格式: {format}，可选: {', '.join(BATCH_STREAM_FORMATS)}"
+        )
+
+
+class _RequestBodyStreamingResponse(StreamingResponse):
+    """
+    边读请求体边输出的流式响应
+    请求体由条目来源按需读取（客户端断开时读取即失败），不再另起任务监听断开，
+    否则监听任务会抢走尚未读取的请求体消息
+    """
+    
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+def _batch_stream_response(
+    items: Any,
+    common_config: Optional[dict],
+    format: str,
+    max_concurrent: int,
+    use_cache: bool,
+    background: Optional[BackgroundTask] = None,
+    response_class: type = StreamingResponse
+) -> StreamingResponse:
+    """把条目来源（列表或异步迭代器）接入流式批量生成"""
+    from app.tools import code_generator
+    from app.tools.code_batch_stream import BATCH_STREAM_MEDIA_TYPES, STREAM_ENCODERS
+    progress = code_generator.BatchProgress()
+    results = code_generator.iter_codes_batch(
+        items,
+        common_config=common_config,
+        max_concurrent=max_concurrent,
+        use_cache=use_cache,
+        binary=True,
+        progress=progress
+    )
+    headers = {"X-Accel-Buffering": "no"}
+    if format in ("zip", "pdf"):
+        headers["Content-Disposition"] = f'attachment; filename="codes.{format}"'
+    elif format == "sse":
+        headers["Cache-Control"] = "no-cache"
+    return response_class(
+        STREAM_ENCODERS[format](results, progress),
+        media_type=BATCH_STREAM_MEDIA_TYPES[format],
+        headers=headers,
+        background=background
+    )
+
+
+@router.post("/code_generator/generate_batch/stream")
+async def stream_codes_batch(request: BatchCodeGenerateRequest, format: str = "ndjson"):
+    """
+    流式批量生成条码/二维码，每完成一项立即输出
+    format: ndjson（每行一个结果）、sse（Server-Sent Events）、zip（原始图片文件归档）、
+            pdf（多页矢量 PDF，每个条码一页）
+    """
+    _check_stream_format(format)
+    if not request.items:
+        raise HTTPException(status_code=400, detail="没有提供要生成的内容")
+    
+    items = request.items
+    if format == "pdf":
+        # 多页 PDF 由各条目的单页 PDF 合并而成
+        items = [{**item, "output_format": "PDF"} for item in items]
+    
+    return _batch_stream_response(
+        items, request.common_config, format, request.max_concurrent, request.use_cache
+    )
+
+
+async def _iter_upload_chunks(upload: StarletteUploadFile, chunk_size: int = 64 * 1024):
+    """按块读取表单上传文件"""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+@router.post("/code_generator/generate_batch/upload")
+async def upload_codes_batch(request: Request):
+    """
+    上传 CSV / NDJSON 内容文件流式批量生成（适合大批量，条目边读边生成）
+    
+    支持两种方式：
+    - 原始请求体：Content-Type 为 text/csv 或 application/x-ndjson（或 ?source=csv|ndjson），
+      请求体按需读取，不会整体缓存
+    - multipart/form-data：文件字段 file，其他选项作为表单字段（格式可由文件扩展名确定）
+    选项（查询参数或表单字段，值按 JSON 解析）：
+    format（ndjson/sse/zip/pdf，同 generate_batch/stream）、source、common_config（JSON 对象）、
+    max_concurrent、use_cache
+    """
+    from app.tools.code_batch_source import CodeItemSource, detect_source_format
+    options = _parse_upload_options(request.query_params.multi_items())
+    content_type = request.headers.get("content-type", "")
+    form = None
+    filename = ""
+    
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if not isinstance(upload, StarletteUploadFile):
+                raise HTTPException(status_code=400, detail="缺少上传文件字段: file")
+            options.update(_parse_upload_options(
+                (key, value) for key, value in form.multi_items()
+                if not isinstance(value, StarletteUploadFile)
+            ))
+            filename = upload.filename or ""
+            chunks = _iter_upload_chunks(upload)
+        else:
+            chunks = request.stream()
+        
+        format = str(options.get("format", "ndjson"))
+        _check_stream_format(format)
+        try:
+            max_concurrent = int(options.get("max_concurrent", 10))
+            source = CodeItemSource(
+                chunks,
+                detect_source_format(options.get("source"), content_type, filename),
+                common_config=options.get("common_config"),
+                # 多页 PDF 由各条目的单页 PDF 合并而成
+                overrides={"output_format": "PDF"} if format == "pdf" else None
+            )
+            await source.prepare()
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        response = _batch_stream_response(
+            source,
+            None,
+            format,
+            max_concurrent,
+            bool(options.get("use_cache", True)),
+            background=BackgroundTask(form.close) if form is not None else None,
+            response_class=StreamingResponse if form is not None else _RequestBodyStreamingResponse
+        )
+        form = None
+        return response
+    finally:
+        if form is not None:
+            await form.close()
+
+
+@router.post("/code_generator/sheet")
+async def generate_code_sheet(request: SheetGenerateRequest):
+    """
+    条码拼版：把全部条码直接绘制到整页画布上，逐页流式输出
+    sheet.output_format: PNG（每页一个 PNG，ZIP 归档，含 manifest.json）、PDF（多页 PDF）
+    """
+    from app.tools.code_sheet import SHEET_MEDIA_TYPES, SheetSpec, iter_sheet
+    from app.tools.code_templates import TemplateNotFound
+    if not request.items:
+        raise HTTPException(status_code=400, detail="没有提供要生成的内容")
+    try:
+        # 有模板时构造配置会解码模板图片，放到线程池执行
+        spec = await asyncio.get_running_loop().run_in_executor(None, lambda: SheetSpec(**request.sheet))
+    except TemplateNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"拼版配置错误: {str(e)}")
+    
+    extension = "zip" if spec.output_format == "PNG" else "pdf"
+    return StreamingResponse(
+        iter_sheet(
+            request.items,
+            spec,
+            common_config=request.common_config,
+            max_concurrent=request.max_concurrent,
+            use_cache=request.use_cache
+        ),
+        media_type=SHEET_MEDIA_TYPES[spec.output_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="sheets.{extension}"',
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+async def _job_call(func, job_id: str):
+    """对批量任务执行 job_manager 的异步操作，任务不存在时返回 404"""
+    try:
+        return await func(job_id)
+    except JobNotFound:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+
+
+@router.post("/code_generator/jobs")
+async def submit_code_job(request: BatchCodeGenerateRequest):
+    """提交后台批量生成任务，立即返回任务ID"""
+    if not request.items:
+        raise HTTPException(status_code=400, detail="没有提供要生成的内容")
+    try:
+        job = await job_manager.submit(
+            request.items,
+            common_config=request.common_config,
+            max_concurrent=request.max_concurrent,
+            use_cache=request.use_cache
+        )
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"任务创建失败: {str(e)}")
+    return success_response(data=job.to_dict(), message="任务已提交")
+
+
+@router.get("/code_generator/jobs")
+async def list_code_jobs():
+    """获取批量任务列表"""
+    return success_response(data=await job_manager.list_jobs())
+
+
+@router.get("/code_generator/jobs/{job_id}")
+async def get_code_job(job_id: str):
+    """获取批量任务进度"""
+    return success_response(data=(await _job_call(job_manager.aget, job_id)).to_dict())
+
+
+@router.get("/code_generator/jobs/{job_id}/results")
+async def get_code_job_results(job_id: str, offset: int = 0, limit: int = 100):
+    """按完成顺序分页获取批量任务结果（任务进行中也可获取已完成部分）"""
+    job = await _job_call(job_manager.aget, job_id)
+    limit = max(1, min(limit, 1000))
+    # 结果行已是 JSON，不解析，直接拼接到响应体中
+    results, count = await asyncio.get_running_loop().run_in_executor(None, job.read_results_raw, offset, limit)
+    data = jsonlib.splice_raw_field({
+        "job_id": job_id,
+        "status": job.status,
+        "completed": job.state["completed"],
+        "offset": offset,
+        "next_offset": offset + count
+    }, "results", results)
+    return envelope_response(raw_data=data)
+
+
+@router.post("/code_generator/jobs/{job_id}/cancel")
+async def cancel_code_job(job_id: str):
+    """取消批量任务（已完成的结果保留）"""
+    job = await _job_call(job_manager.cancel, job_id)
+    return success_response(data=job.to_dict(), message="任务已取消")
+
+
+@router.delete("/code_generator/jobs/{job_id}")
+async def delete_code_job(job_id: str):
+    """删除批量任务及其结果"""
+    await _job_call(job_manager.delete, job_id)
+    return success_response(message="任务已删除")
+
+
 @router.post("/code_generator/generate_with_template")
 async def generate_code_with_template(
+    http_request: Request,
     content: str = Form(...),
     code_type: str = Form("qrcode"),
     barcode_format: str = Form("code128"),
@@ -133,24 +646,34 @@ async def generate_code_with_template(
     output_format: str = Form("PNG"),
     output_quality: int = Form(95),
     output_path: Optional[str] = Form(None),
+    output_profile: Optional[str] = Form(None),
     qr_box_size: int = Form(10),
     qr_border: int = Form(4),
     barcode_width: float = Form(0.4),
     barcode_height: float = Form(15.0),
-    template: UploadFile = File(...)
+    template: UploadFile = File(...),
+    response_mode: Optional[str] = None
 ):
-    """生成条码/二维码并合成到模板图片（支持文件上传）"""
+    """
+    生成条码/二维码并合成到模板图片（支持文件上传）
+    response_mode=binary（或 Accept: image/*）时直接返回图片字节
+    """
+    from app.tools import code_generator
+    from app.tools.code_templates import template_registry
+    mode = _code_response_mode(http_request, response_mode)
     try:
-        # 读取模板图片
+        # 读取并注册模板图片（相同模板重复上传时不再重复解码）
         template_content = await template.read()
-        template_base64 = base64.b64encode(template_content).decode('utf-8')
+        template_info = await asyncio.get_running_loop().run_in_executor(
+            None, template_registry.register, template_content
+        )
         
         params = {
             "content": content,
             "code_type": code_type,
             "barcode_format": barcode_format,
             "use_template": True,
-            "template_base64": template_base64,
+            "template_id": template_info["template_id"],
             "position_x": position_x,
             "position_y": position_y,
             "output_width": output_width,
@@ -158,15 +681,18 @@ async def generate_code_with_template(
             "output_format": output_format,
             "output_quality": output_quality,
             "output_path": output_path,
+            "output_profile": output_profile,
             "qr_box_size": qr_box_size,
             "qr_border": qr_border,
             "barcode_width": barcode_width,
             "barcode_height": barcode_height,
         }
         
-        result = await code_generator.generate_code(params)
+        result = await code_generator.generate_code(params, binary=mode == "binary")
         if result.get("success"):
-            return success_response(data=result)
+            if mode == "binary":
+                return _code_image_response(result)
+            return envelope_response(data=result)
         else:
             raise HTTPException(status_code=400, detail=result.get("error", "生成失败"))
     except Exception as e:
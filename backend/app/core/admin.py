@@ -0,0 +1,18 @@
+"""
+管理接口鉴权
+管理接口（采样分析等）需要在请求头 X-Admin-Token 中提供 ADMIN_TOKEN；未配置 ADMIN_TOKEN 时管理接口不可用
+"""
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from app.core.config import settings
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """管理接口依赖：未配置令牌时返回 404，令牌不匹配时返回 403"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="管理接口未启用（未配置 ADMIN_TOKEN）")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="管理令牌无效")
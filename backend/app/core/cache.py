@@ -1,21 +1,59 @@
 """
-内存缓存管理模块
+缓存管理模块
+    - memory：进程内缓存（默认，单进程部署）
+    - sqlite：SQLite 文件缓存（WAL 模式），同一台机器上的多个工作进程共享会话历史与工具结果缓存
+异步代码中使用 CacheManager 的 aget/aset/adelete/aupdate：sqlite 后端的读写在缓存线程池中执行，不阻塞事件循环
 """
-from typing import Any, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
 from datetime import datetime, timedelta
+import asyncio
 import hashlib
 import json
 import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from app.core import jsonlib
+from app.core.config import settings
+from app.core.memory import deep_sizeof
 
 logger = logging.getLogger(__name__)
 
 
+def key_prefix(key: str) -> str:
+    """缓存键的前缀（去掉最后一段，如 tool:json_formatter:1a2b3c4d -> tool:json_formatter）"""
+    return key.rsplit(":", 1)[0] if ":" in key else key
+
+
+def _prefix_report(rows: Iterator[Tuple[str, int, bool]]) -> Dict[str, Dict[str, int]]:
+    """按前缀汇总 (键, 字节数, 是否过期)，按字节数从大到小排列"""
+    report: Dict[str, Dict[str, int]] = {}
+    for key, size, expired in rows:
+        entry = report.setdefault(key_prefix(key), {"keys": 0, "bytes": 0, "expired_keys": 0, "expired_bytes": 0})
+        entry["keys"] += 1
+        entry["bytes"] += size
+        if expired:
+            entry["expired_keys"] += 1
+            entry["expired_bytes"] += size
+    return dict(sorted(report.items(), key=lambda item: -item[1]["bytes"]))
+
+
 class MemoryCache:
     """内存缓存管理器"""
     
+    # 每写入多少次清理一次过期条目（过期条目只在读取时删除，不再读取的键会一直占用内存）
+    PURGE_INTERVAL = 256
+    
     def __init__(self):
         self._cache = {}
         self._expire_times = {}
+        self._writes = 0
+        self._update_lock = threading.Lock()
     
     def get(self, key: str) -> Optional[Any]:
         """获取缓存"""
@@ -38,8 +76,43 @@ class MemoryCache:
         if ttl:
             self._expire_times[key] = datetime.now() + timedelta(seconds=ttl)
         
+        self._writes += 1
+        if self._writes % self.PURGE_INTERVAL == 0:
+            self.purge_expired()
         logger.debug(f"缓存写入: {key}")
     
+    def update(self, key: str, func: Callable[[Optional[Any]], Any], ttl: Optional[int] = None) -> Any:
+        """读取-修改-写入：以当前值（不存在时为 None）调用 func，写入并返回新值"""
+        with self._update_lock:
+            value = func(self.get(key))
+            self.set(key, value, ttl)
+        return value
+    
+    def purge_expired(self) -> int:
+        """删除所有过期条目，返回删除数"""
+        now = datetime.now()
+        expired = [key for key, expire_time in list(self._expire_times.items()) if now > expire_time]
+        for key in expired:
+            self._cache.pop(key, None)
+            self._expire_times.pop(key, None)
+        return len(expired)
+    
+    def scan(self, prefix: str) -> Iterator[Tuple[str, Any]]:
+        """遍历以 prefix 开头且未过期的条目"""
+        now = datetime.now()
+        for key, value in list(self._cache.items()):
+            if key.startswith(prefix) and not (key in self._expire_times and now > self._expire_times[key]):
+                yield key, value
+    
+    def memory_report(self) -> Dict[str, Any]:
+        """按键前缀统计条目数与占用内存（深度估算，含已过期但尚未删除的条目）"""
+        now = datetime.now()
+        rows = (
+            (key, deep_sizeof(key) + deep_sizeof(value), key in self._expire_times and now > self._expire_times[key])
+            for key, value in list(self._cache.items())
+        )
+        return {"backend": "memory", "prefixes": _prefix_report(rows)}
+    
     def delete(self, key: str) -> None:
         """删除缓存"""
         if key in self._cache:
@@ -65,15 +138,295 @@ class MemoryCache:
         }
 
 
+class SQLiteCache:
+    """
+    SQLite 文件缓存（多进程共享）
+    值以 JSON 保存（缓存的工具结果与会话历史本身就要以 JSON 返回），无法编码或超过 max_value_bytes 的值不缓存；
+    每个线程使用独立连接，WAL 模式下读写互不阻塞，写入冲突时最多等待 busy_timeout，
+    超时（或其他数据库错误）时读取按未命中处理、写入放弃，缓存不可用不影响请求
+    所有方法都是阻塞调用，异步代码应通过 CacheManager 的异步方法在线程池中调用
+    """
+    
+    # 每写入多少次清理一次过期条目
+    PURGE_INTERVAL = 256
+    
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_value_bytes: Optional[int] = None,
+        busy_timeout: Optional[float] = None
+    ):
+        self.path = path or settings.CACHE_PATH or os.path.join(tempfile.gettempdir(), "aetheris", "cache.sqlite3")
+        self.max_value_bytes = max_value_bytes if max_value_bytes is not None else settings.CACHE_MAX_VALUE_BYTES
+        self.busy_timeout = busy_timeout if busy_timeout is not None else settings.CACHE_BUSY_TIMEOUT
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+            )
+    
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def _read(self, conn: sqlite3.Connection, key: str) -> Optional[Any]:
+        row = conn.execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return None if row is None else jsonlib.loads(row[0])
+    
+    def _encode(self, key: str, value: Any) -> Optional[bytes]:
+        """编码缓存值，无法编码或超过大小上限时返回 None"""
+        try:
+            data = jsonlib.dumps_bytes(value)
+        except (TypeError, ValueError) as e:
+            logger.debug(f"缓存值无法编码，不缓存: {key} - {e}")
+            return None
+        if self.max_value_bytes and len(data) > self.max_value_bytes:
+            logger.debug(f"缓存值过大，不缓存: {key}（{len(data)} 字节）")
+            return None
+        return data
+    
+    def _write(self, conn: sqlite3.Connection, key: str, data: bytes, ttl: Optional[int]) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, data, time.time() + ttl if ttl else None)
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_INTERVAL == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+    
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存（过期的条目视为不存在）"""
+        try:
+            value = self._read(self._connection(), key)
+        except sqlite3.Error as e:
+            logger.warning(f"缓存读取失败，按未命中处理: {key} - {e}")
+            return None
+        if value is not None:
+            logger.debug(f"缓存命中: {key}")
+        return value
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """设置缓存"""
+        data = self._encode(key, value)
+        if data is None:
+            return
+        try:
+            self._write(self._connection(), key, data, ttl)
+        except sqlite3.Error as e:
+            logger.warning(f"缓存写入失败，不缓存: {key} - {e}")
+            return
+        logger.debug(f"缓存写入: {key}")
+    
+    def update(self, key: str, func: Callable[[Optional[Any]], Any], ttl: Optional[int] = None) -> Any:
+        """
+        读取-修改-写入：在同一个 BEGIN IMMEDIATE 事务中读取当前值、调用 func 并写入，
+        多个进程同时更新同一个键时依次执行，不会丢失更新；数据库错误（如等待写锁超时）时不写入，返回 None
+        """
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            logger.warning(f"缓存更新失败，未写入: {key} - {e}")
+            return None
+        try:
+            value = func(self._read(conn, key))
+            data = self._encode(key, value)
+            if data is not None:
+                self._write(conn, key, data, ttl)
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK")
+            logger.warning(f"缓存更新失败，未写入: {key} - {e}")
+            return None
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+    
+    def delete(self, key: str) -> None:
+        """删除缓存"""
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+        logger.debug(f"缓存删除: {key}")
+    
+    def clear_all(self) -> None:
+        """清除所有缓存（所有工作进程共享，只应在启动器中调用一次）"""
+        self._connection().execute("DELETE FROM cache")
+        logger.info("所有缓存已清除")
+    
+    def get_stats(self) -> dict:
+        """获取缓存统计信息"""
+        total, expired = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(expires_at IS NOT NULL AND expires_at <= ?), 0) FROM cache",
+            (time.time(),)
+        ).fetchone()
+        return {"total_keys": total, "expired_keys": expired, "path": self.path}
+    
+    def scan(self, prefix: str) -> Iterator[Tuple[str, Any]]:
+        """遍历以 prefix 开头且未过期的条目"""
+        rows = self._connection().execute(
+            "SELECT key, value FROM cache WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+            (prefix, prefix + "\U0010ffff", time.time())
+        )
+        for key, value in rows:
+            yield key, jsonlib.loads(value)
+    
+    def memory_report(self) -> Dict[str, Any]:
+        """按键前缀统计条目数与 JSON 字节数（数据在文件中，不占用进程内存），以及数据库文件大小"""
+        now = time.time()
+        rows = self._connection().execute("SELECT key, length(value), expires_at FROM cache").fetchall()
+        files = {}
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                files[f"file{suffix}"] = os.path.getsize(self.path + suffix)
+            except OSError:
+                pass
+        return {
+            "backend": "sqlite",
+            "files": files,
+            "prefixes": _prefix_report((key, size, expires_at is not None and expires_at <= now) for key, size, expires_at in rows),
+        }
+
+
+class LRUCache:
+    """
+    线程安全的有界 LRU 缓存
+    同时支持条目数上限与字节数上限（字节数由 size 参数或 sizeof 函数给出）
+    """
+    
+    def __init__(
+        self,
+        max_items: int = 128,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None
+    ):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        """获取缓存（命中时移到最近使用位置）"""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+    
+    def peek(self, key: Any, default: Any = None) -> Any:
+        """查看缓存（不计入命中统计，不改变使用顺序）"""
+        with self._lock:
+            return self._data.get(key, default)
+    
+    def set(self, key: Any, value: Any, size: Optional[int] = None) -> None:
+        """写入缓存，超出上限时淘汰最久未使用的条目"""
+        if size is None:
+            size = self._sizeof(value) if self._sizeof else 0
+        if self.max_bytes and size > self.max_bytes:
+            # 单个条目超过总上限，不缓存
+            return
+        with self._lock:
+            if key in self._data:
+                self.total_bytes -= self._sizes.pop(key, 0)
+                del self._data[key]
+            self._data[key] = value
+            self._sizes[key] = size
+            self.total_bytes += size
+            while self._data and (
+                len(self._data) > self.max_items
+                or (self.max_bytes and self.total_bytes > self.max_bytes)
+            ):
+                old_key, _ = self._data.popitem(last=False)
+                self.total_bytes -= self._sizes.pop(old_key, 0)
+                self.evictions += 1
+    
+    def delete(self, key: Any) -> None:
+        """删除缓存"""
+        with self._lock:
+            if key in self._data:
+                del self._data[key]
+                self.total_bytes -= self._sizes.pop(key, 0)
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+    
+    def keys(self) -> list:
+        """当前缓存键（按最久未使用到最近使用排序）"""
+        with self._lock:
+            return list(self._data.keys())
+    
+    def __contains__(self, key: Any) -> bool:
+        with self._lock:
+            return key in self._data
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get_stats(self) -> dict:
+        """获取缓存统计信息"""
+        return {
+            "items": len(self._data),
+            "bytes": self.total_bytes,
+            "max_items": self.max_items,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
 class CacheManager:
     """缓存管理器（支持不同缓存后端）"""
     
-    def __init__(self, cache_type: str = "memory"):
-        self.cache_type = cache_type
-        if cache_type == "memory":
+    # sqlite 后端异步调用使用的线程数
+    THREADS = 4
+    
+    def __init__(self, cache_type: Optional[str] = None):
+        self.cache_type = cache_type or settings.CACHE_TYPE
+        if self.cache_type == "memory":
             self._backend = MemoryCache()
+        elif self.cache_type == "sqlite":
+            self._backend = SQLiteCache()
         else:
-            raise ValueError(f"不支持的缓存类型: {cache_type}")
+            raise ValueError(f"不支持的缓存类型: {self.cache_type}")
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+    
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """内存后端直接调用；sqlite 后端会阻塞在磁盘 IO 与写锁上，放到缓存线程池执行"""
+        if not self.shared:
+            return func(*args)
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.THREADS, thread_name_prefix="cache")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+    
+    @property
+    def shared(self) -> bool:
+        """缓存是否在多个进程间共享（共享时工作进程启动不清空缓存）"""
+        return self.cache_type != "memory"
     
     def generate_key(self, prefix: str, data: Any) -> str:
         """生成缓存键"""
@@ -89,10 +442,34 @@ class CacheManager:
         """设置缓存"""
         self._backend.set(key, value, ttl)
     
+    def update(self, key: str, func: Callable[[Optional[Any]], Any], ttl: Optional[int] = None) -> Any:
+        """原子地读取-修改-写入（func 接收当前值，不存在时为 None，返回新值）"""
+        return self._backend.update(key, func, ttl)
+    
     def delete(self, key: str) -> None:
         """删除缓存"""
         self._backend.delete(key)
     
+    async def aget(self, key: str) -> Optional[Any]:
+        """获取缓存（异步）"""
+        return await self._run(self._backend.get, key)
+    
+    async def aset(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """设置缓存（异步）"""
+        await self._run(self._backend.set, key, value, ttl)
+    
+    async def aupdate(self, key: str, func: Callable[[Optional[Any]], Any], ttl: Optional[int] = None) -> Any:
+        """原子地读取-修改-写入（异步，func 在缓存线程中调用）"""
+        return await self._run(self._backend.update, key, func, ttl)
+    
+    async def adelete(self, key: str) -> None:
+        """删除缓存（异步）"""
+        await self._run(self._backend.delete, key)
+    
+    async def aget_stats(self) -> dict:
+        """获取缓存统计（异步）"""
+        return await self._run(self._backend.get_stats)
+    
     def clear_all(self) -> None:
         """清除所有缓存"""
         self._backend.clear_all()
@@ -100,6 +477,14 @@ class CacheManager:
     def get_stats(self) -> dict:
         """获取缓存统计"""
         return self._backend.get_stats()
+    
+    def scan(self, prefix: str) -> Iterator[Tuple[str, Any]]:
+        """遍历以 prefix 开头且未过期的条目"""
+        return self._backend.scan(prefix)
+    
+    def memory_report(self) -> Dict[str, Any]:
+        """按键前缀统计缓存占用"""
+        return self._backend.memory_report()
 
 
 # 创建全局缓存管理器实例
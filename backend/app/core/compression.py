@@ -0,0 +1,331 @@
+"""
+响应压缩中间件（纯 ASGI）
+按 Accept-Encoding 协商 zstd / br / gzip（服务端按 COMPRESSION_ENCODINGS 的顺序优先，未安装的编码自动忽略）：
+    - 只压缩文本类内容（JSON、NDJSON、CSV、SSE、SVG、BMP 等），PNG/JPEG/PDF 等已压缩的内容原样返回
+    - 一次性响应小于 COMPRESSION_MIN_SIZE 时不压缩；较大的响应体在线程池中压缩，不阻塞事件循环
+    - 流式响应逐块压缩并立即刷新（同步刷新），不缓冲，SSE / NDJSON 进度与 X-Accel-Buffering: no 语义不变
+    - 压缩后强 ETag 改为弱 ETag（内容编码不同，字节不再相同），并追加 Vary: Accept-Encoding
+按路由统计压缩的响应数、原始/压缩后字节数与压缩耗费的 CPU 时间
+"""
+import asyncio
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.timing import route_key
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 可压缩的内容类型（其余类型原样返回）
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "application/csv",
+    "image/svg+xml",
+    "image/bmp",
+}
+COMPRESSIBLE_SUFFIXES = ("+json", "+xml")
+
+# 超过该大小的一次性响应体在线程池中压缩（zlib / brotli / zstd 压缩时释放 GIL）
+THREAD_THRESHOLD = 256 * 1024
+
+
+class StreamEncoder:
+    """增量压缩器：compress 追加数据，flush 输出已压缩的部分（同步刷新），finish 结束压缩流"""
+
+    def __init__(self, compress: Callable[[bytes], bytes], flush: Callable[[], bytes], finish: Callable[[], bytes]):
+        self.compress = compress
+        self.flush = flush
+        self.finish = finish
+
+
+def _gzip_encoder(level: int) -> StreamEncoder:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return StreamEncoder(
+        compressor.compress,
+        lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush
+    )
+
+
+def _brotli_encoder(quality: int) -> StreamEncoder:
+    compressor = brotli.Compressor(quality=quality)
+    return StreamEncoder(compressor.process, compressor.flush, compressor.finish)
+
+
+def _zstd_encoder(level: int) -> StreamEncoder:
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return StreamEncoder(
+        compressor.compress,
+        lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+        compressor.flush
+    )
+
+
+def available_encodings() -> List[str]:
+    """已安装的压缩编码"""
+    encodings = ["gzip"]
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    return encodings
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """解析 Accept-Encoding（编码 → q 值）"""
+    accepted = {}
+    for part in value.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def negotiate(accept_encoding: str, preferred: List[str]) -> Optional[str]:
+    """按服务端优先顺序选择客户端接受的编码，客户端不接受任何压缩编码时返回 None"""
+    if not accept_encoding:
+        return None
+    accepted = parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    candidates = [name for name in preferred if accepted.get(name, wildcard) > 0]
+    if not candidates:
+        return None
+    # q 值更高的优先，相同时按服务端顺序
+    return max(candidates, key=lambda name: (accepted.get(name, wildcard), -preferred.index(name)))
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type in COMPRESSIBLE_TYPES
+        or media_type.endswith(COMPRESSIBLE_SUFFIXES)
+    )
+
+
+class CompressionStats:
+    """按路由与编码统计压缩效果（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._skipped: Dict[str, int] = {}
+
+    def record(self, route: str, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float, streaming: bool):
+        with self._lock:
+            item = self._routes.setdefault((route, encoding), {
+                "responses": 0, "streaming": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0
+            })
+            item["responses"] += 1
+            item["streaming"] += int(streaming)
+            item["bytes_in"] += bytes_in
+            item["bytes_out"] += bytes_out
+            item["cpu_seconds"] += cpu_seconds
+
+    def skip(self, reason: str):
+        with self._lock:
+            self._skipped[reason] = self._skipped.get(reason, 0) + 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = []
+            for (route, encoding), item in sorted(self._routes.items()):
+                saved = item["bytes_in"] - item["bytes_out"]
+                routes.append({
+                    "route": route,
+                    "encoding": encoding,
+                    "responses": item["responses"],
+                    "streaming": item["streaming"],
+                    "bytes_in": item["bytes_in"],
+                    "bytes_out": item["bytes_out"],
+                    "bytes_saved": saved,
+                    "ratio": round(item["bytes_out"] / item["bytes_in"], 4) if item["bytes_in"] else None,
+                    "cpu_ms": round(item["cpu_seconds"] * 1000, 2),
+                    # 每节省 1MB 耗费的 CPU 毫秒数
+                    "cpu_ms_per_mb_saved": round(item["cpu_seconds"] * 1000 / (saved / 1024 / 1024), 2) if saved > 0 else None,
+                })
+            return {"encodings": available_encodings(), "routes": routes, "skipped": dict(self._skipped)}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._skipped.clear()
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """响应压缩中间件"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        encodings: Optional[List[str]] = None,
+        gzip_level: int = 1,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+        stats: CompressionStats = compression_stats
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        installed = available_encodings()
+        self.encodings = [name for name in (encodings or ["zstd", "br", "gzip"]) if name in installed]
+        self.factories: Dict[str, Callable[[], StreamEncoder]] = {
+            "gzip": lambda: _gzip_encoder(gzip_level),
+            "br": lambda: _brotli_encoder(brotli_quality),
+            "zstd": lambda: _zstd_encoder(zstd_level),
+        }
+        self.stats = stats
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, scope, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """单个响应的压缩状态：先保留响应头，看到第一个响应体消息后决定是否压缩"""
+
+    def __init__(self, middleware: CompressionMiddleware, scope: Scope, encoding: str, send: Send):
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self._send = send
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+        self.encoder: Optional[StreamEncoder] = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    def _skip_reason(self, message: Message) -> Optional[str]:
+        """根据响应头判断是否不压缩，返回原因"""
+        status = message["status"]
+        if status < 200 or status in (204, 206, 304):
+            return "status"
+        headers = Headers(raw=message.get("headers", []))
+        if "content-encoding" in headers:
+            return "already_encoded"
+        if not is_compressible(headers.get("content-type", "")):
+            return "content_type"
+        content_length = headers.get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) < self.middleware.minimum_size:
+            return "small"
+        return None
+
+    def _compressed_headers(self, content_length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+
+    def _compress_all(self, body: bytes) -> Tuple[bytes, float]:
+        """一次性压缩整个响应体，返回 (压缩结果, 线程 CPU 时间)"""
+        start = time.thread_time()
+        encoder = self.middleware.factories[self.encoding]()
+        compressed = encoder.compress(body) + encoder.finish()
+        return compressed, time.thread_time() - start
+
+    def _compress_chunk(self, body: bytes, more_body: bool) -> bytes:
+        start = time.thread_time()
+        data = self.encoder.compress(body) if body else b""
+        data += self.encoder.flush() if more_body else self.encoder.finish()
+        self.cpu_seconds += time.thread_time() - start
+        return data
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            reason = self._skip_reason(message)
+            if reason:
+                self.middleware.stats.skip(reason)
+                self.passthrough = True
+                await self._send(message)
+            else:
+                self.start_message = message
+            return
+        if self.passthrough or message_type != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None and not more_body:
+            # 一次性响应
+            await self._send_single(body)
+            return
+
+        if self.encoder is None:
+            # 流式响应：逐块压缩并立即刷新
+            self.encoder = self.middleware.factories[self.encoding]()
+            self._compressed_headers(None)
+            await self._send(self.start_message)
+        data = self._compress_chunk(body, more_body)
+        self.bytes_in += len(body)
+        self.bytes_out += len(data)
+        if data or not more_body:
+            await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+        if not more_body:
+            self.middleware.stats.record(
+                route_key(self.scope), self.encoding, self.bytes_in, self.bytes_out, self.cpu_seconds, streaming=True
+            )
+
+    async def _send_single(self, body: bytes) -> None:
+        if len(body) < self.middleware.minimum_size:
+            self.middleware.stats.skip("small")
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+        if len(body) > THREAD_THRESHOLD:
+            compressed, cpu_seconds = await asyncio.get_running_loop().run_in_executor(None, self._compress_all, body)
+        else:
+            compressed, cpu_seconds = self._compress_all(body)
+        if len(compressed) >= len(body):
+            # 压缩后没有变小（内容本身不可压缩），原样返回
+            self.middleware.stats.skip("not_smaller")
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+        self._compressed_headers(len(compressed))
+        self.middleware.stats.record(route_key(self.scope), self.encoding, len(body), len(compressed), cpu_seconds, streaming=False)
+        await self._send(self.start_message)
+        await self._send({"type": "http.response.body", "body": compressed})
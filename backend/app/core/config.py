@@ -21,6 +21,7 @@ class Settings(BaseSettings):
     HOST: str = "127.0.0.1"
     PORT: int = 8000
     API_PREFIX: str = "/api"
+    WORKERS: int = 1  # 工作进程数（python -m app.launcher），大于 1 时缓存自动使用 sqlite
     
     # CORS配置
     ALLOWED_ORIGINS: List[str] = [
@@ -29,9 +30,48 @@ class Settings(BaseSettings):
     ]
     
     # 缓存配置
-    CACHE_TYPE: str = "memory"  # memory 或 redis
+    CACHE_TYPE: str = "memory"  # memory（进程内）或 sqlite（文件，多个工作进程共享）
+    CACHE_PATH: str = ""  # sqlite 缓存文件路径，默认为系统临时目录下的 aetheris/cache.sqlite3
+    CACHE_MAX_VALUE_BYTES: int = 8 * 1024 * 1024  # sqlite 缓存单个值的上限（字节，编码为 JSON 后），超过时不缓存
+    CACHE_BUSY_TIMEOUT: float = 0.5  # sqlite 缓存写锁等待时间（秒），超时后本次读写按未命中/不缓存处理
     CACHE_TTL: int = 3600  # 默认缓存时间（秒）
     REDIS_URL: str = "redis://localhost:6379"
+    CATALOG_CACHE_MAX_AGE: int = 0  # 导航树/工具列表的浏览器缓存时间（秒），0 表示每次用 ETag 向服务端验证
+    
+    # 响应压缩配置
+    COMPRESSION_ENABLED: bool = True  # 是否按 Accept-Encoding 压缩响应
+    COMPRESSION_ENCODINGS: str = "zstd,br,gzip"  # 服务端优先顺序（逗号分隔），brotli / zstandard 未安装时自动忽略
+    COMPRESSION_MIN_SIZE: int = 1024  # 小于该大小的一次性响应不压缩（字节）
+    COMPRESSION_GZIP_LEVEL: int = 1  # gzip 压缩级别（1-9；文本类响应 1 与 6 的压缩率相差很小，CPU 少 2-4 倍）
+    COMPRESSION_BROTLI_QUALITY: int = 4  # brotli 压缩质量（0-11，越高越慢）
+    COMPRESSION_ZSTD_LEVEL: int = 3  # zstd 压缩级别（1-22）
+    
+    # 上传配置
+    UPLOAD_SPOOL_MAX_MEMORY: int = 8 * 1024 * 1024  # 超过该大小的上传内容落盘并 mmap 解析（字节）
+    UPLOAD_MAX_SIZE: int = 2 * 1024 * 1024 * 1024  # 单次上传大小上限（字节）
+    
+    # 工具加载配置
+    TOOL_PLUGINS_ENABLED: bool = True  # 是否通过入口点（aetheris.tools）发现插件工具
+    TOOL_WARMUP: bool = True  # 服务启动后是否在后台预热工具（导入执行函数、初始化渲染资源）
+    TOOL_WARMUP_DELAY: float = 1.0  # 开始接收请求后延迟多少秒再预热
+    TOOL_WARMUP_BEFORE_READY: bool = False  # 是否在开始接收请求前完成预热（多进程部署时由启动器开启）
+    
+    # 条码生成器配置
+    CODE_GENERATOR_BACKEND: str = "thread"  # 渲染后端：thread（线程池）或 process（多进程）
+    CODE_GENERATOR_WORKERS: int = 0  # 渲染线程/进程数，0 表示默认（线程 10，进程为 CPU 核心数）
+    CODE_TEMPLATE_DIR: str = ""  # 模板原图存储目录，默认为系统临时目录下的 aetheris/templates
+    CODE_TEMPLATE_CACHE_ITEMS: int = 32  # 已解码模板图片缓存数量
+    CODE_TEMPLATE_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 已解码模板图片缓存上限（字节）
+    CODE_TEMPLATE_DIR_MAX_ITEMS: int = 1000  # 模板目录最多保存的模板数，超出时删除最久未上传的模板
+    CODE_TEMPLATE_DIR_MAX_BYTES: int = 1024 * 1024 * 1024  # 模板目录总大小上限（字节），超出时同上
+    CODE_RENDER_CACHE_ENABLED: bool = True  # 是否启用分阶段渲染缓存
+    CODE_RENDER_CACHE_ITEMS: int = 4096  # 每个渲染阶段的缓存条目上限
+    CODE_RENDER_CACHE_MAX_BYTES: int = 128 * 1024 * 1024  # 每个渲染阶段的缓存上限（字节）
+    CODE_JOB_DIR: str = ""  # 批量任务目录，默认为系统临时目录下的 aetheris/jobs
+    CODE_JOB_WORKERS: int = 10  # 批量任务全局并发生成数（所有任务共享）
+    CODE_JOB_ADOPT_INTERVAL: float = 30.0  # 检查并接管执行进程已退出的未完成任务的间隔（秒），0 表示只在启动时检查
+    CODE_OUTPUT_PROFILE: str = "balanced"  # 默认图片编码配置：fastest / balanced（无损）/ gray16 / smallest（后两者有损）
+    CODE_SOURCE_MAX_RECORD_SIZE: int = 1024 * 1024  # 上传内容文件（CSV/NDJSON）单条记录长度上限（字符）
     
     # AI配置
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
@@ -43,6 +83,11 @@ class Settings(BaseSettings):
     # 日志配置
     LOG_LEVEL: str = "INFO"
     
+    # 性能诊断配置
+    TIMING_ENABLED: bool = True  # 是否按路由与阶段记录请求耗时直方图
+    ADMIN_TOKEN: str = ""  # 管理接口（采样分析等）的访问令牌（请求头 X-Admin-Token），为空时管理接口不可用
+    PROFILE_MAX_SECONDS: float = 30.0  # 单次采样分析的最长时间（秒）
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,170 @@
+"""
+JSON 编解码辅助模块
+统一处理 str、bytes 以及 mmap 等缓冲区输入
+安装了 orjson 时优先使用 orjson 加速编解码，不支持的情况自动回退到标准库 json：
+    - 解析：NaN/Infinity、超出 64 位的整数、非法代理字符等
+    - 编码：ensure_ascii、2 以外的缩进、超出 64 位的整数、NaN/Infinity
+注意：orjson 输出浮点数指数时不带 "+" 和前导零（1e100 而非 1e+100），数值相同
+"""
+import json
+import re
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson 3.9 之前的版本解析超深嵌套时可能崩溃，不使用
+if orjson is not None:
+    try:
+        if tuple(int(p) for p in orjson.__version__.split(".")[:2]) < (3, 9):
+            orjson = None
+    except (AttributeError, ValueError):
+        orjson = None
+
+_NON_SPACE_STR = re.compile(r"\S")
+_NON_SPACE_BYTES = re.compile(rb"\S")
+
+# orjson 把超出 64 位的整数解析为浮点数（丢失精度而不报错），解析前先查找 19 位以上的数字串：
+# 把数字统一替换为 0 后用 bytes.find 查找（比正则逐位置匹配快一个数量级），命中后再用正则确认取值范围
+_DIGITS_TO_ZERO = bytes.maketrans(b"123456789", b"000000000")
+_LONG_DIGITS_MARK = b"0" * 19
+_LONG_DIGITS = re.compile(rb"-?[0-9]{19,}")
+_INT_MIN = -(1 << 63)
+_INT_MAX = (1 << 64) - 1
+# 分块扫描（str 需要先编码），相邻块重叠，跨块的数字串不会被截断漏判
+_SCAN_CHUNK = 1024 * 1024
+_SCAN_OVERLAP = 32
+
+
+class NonFiniteFloat(float):
+    """
+    标准库解析出的 NaN/Infinity
+    orjson 会把 NaN 编码为 null，使用 float 子类让 orjson 拒绝编码，从而回退到标准库保留原值
+    """
+
+
+def _parse_constant(name: str) -> float:
+    return NonFiniteFloat(name)
+
+
+def is_accelerated() -> bool:
+    """是否启用了 orjson 加速"""
+    return orjson is not None
+
+
+def is_blank(source: Union[str, bytes, Any]) -> bool:
+    """判断输入是否为空或全为空白（只扫描到第一个非空白字符，不复制输入）"""
+    if source is None or len(source) == 0:
+        return True
+    pattern = _NON_SPACE_STR if isinstance(source, str) else _NON_SPACE_BYTES
+    return pattern.search(source) is None
+
+
+def _chunk_has_big_int(chunk: bytes, truncated: bool) -> bool:
+    """检查一块 UTF-8 字节；truncated 表示块尾之后还有内容"""
+    marked = chunk.translate(_DIGITS_TO_ZERO)
+    position = marked.find(_LONG_DIGITS_MARK)
+    while position != -1:
+        match = _LONG_DIGITS.search(chunk, max(0, position - 1))
+        digits = match.group()
+        # 超过 20 位必然越界；延伸到块尾的数字串可能被截断，按越界处理
+        if len(digits.lstrip(b"-")) > 20 or (truncated and match.end() == len(chunk)):
+            return True
+        if not _INT_MIN <= int(digits) <= _INT_MAX:
+            return True
+        position = marked.find(_LONG_DIGITS_MARK, match.end())
+    return False
+
+
+def _has_big_int(source: Union[str, bytes, Any]) -> bool:
+    """
+    是否包含 orjson 无法精确解析的整数（超出 [-2^63, 2^64-1]）
+    字符串或小数部分中的长数字串也可能命中，只是多走一次标准库，不影响结果
+    """
+    step = _SCAN_CHUNK - _SCAN_OVERLAP
+    if isinstance(source, str):
+        size = len(source)
+        return any(
+            _chunk_has_big_int(
+                source[start:start + _SCAN_CHUNK].encode("utf-8", "surrogatepass"),
+                start + _SCAN_CHUNK < size
+            )
+            for start in range(0, size, step)
+        )
+    with memoryview(source) as view, view.cast("B") as data:
+        size = data.nbytes
+        return any(
+            _chunk_has_big_int(bytes(data[start:start + _SCAN_CHUNK]), start + _SCAN_CHUNK < size)
+            for start in range(0, size, step)
+        )
+
+
+def loads(source: Union[str, bytes, Any], fast: bool = True) -> Any:
+    """解析 JSON，支持 str、bytes、bytearray 以及 mmap/memoryview 缓冲区"""
+    if fast and orjson is not None and not _has_big_int(source):
+        try:
+            if isinstance(source, (str, bytes, bytearray, memoryview)):
+                return orjson.loads(source)
+            with memoryview(source) as view:
+                return orjson.loads(view)
+        except orjson.JSONDecodeError:
+            # 交给标准库：兼容 NaN 等扩展语法，或给出标准错误信息
+            pass
+
+    if not isinstance(source, (str, bytes, bytearray)):
+        # 标准库只接受 str/bytes：直接从缓冲区解码为 str，不先复制出一份 bytes
+        # （解码出的 str 无法避免，回退路径的额外内存约为文档大小的 1~4 倍）
+        with memoryview(source) as view:
+            encoding = json.detect_encoding(bytes(view[:4]))
+            source = str(view, encoding, "surrogatepass")
+    return json.loads(source, parse_constant=_parse_constant)
+
+
+def dumps(
+    obj: Any,
+    indent: Optional[int] = None,
+    sort_keys: bool = False,
+    ensure_ascii: bool = False,
+    fast: bool = True
+) -> str:
+    """
+    编码 JSON
+    indent 为 None 时输出紧凑格式（无多余空白）
+    """
+    if fast and orjson is not None and not ensure_ascii and indent in (None, 2):
+        option = 0
+        if indent == 2:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, option=option).decode("utf-8")
+        except TypeError:
+            # orjson.JSONEncodeError 是 TypeError 的子类
+            pass
+
+    if indent is None:
+        return json.dumps(obj, separators=(',', ':'), sort_keys=sort_keys, ensure_ascii=ensure_ascii)
+    return json.dumps(obj, indent=indent, sort_keys=sort_keys, ensure_ascii=ensure_ascii)
+
+
+def dumps_bytes(obj: Any, default: Optional[Callable[[Any], Any]] = None, fast: bool = True) -> bytes:
+    """
+    编码为紧凑的 UTF-8 JSON 字节串（用于响应体，省去 str 与 bytes 之间的转换）
+    default 用于转换 JSON 不支持的类型；非字符串的字典键与标准库一样转为字符串
+    """
+    if fast and orjson is not None:
+        try:
+            return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=default).encode("utf-8")
+
+
+def splice_raw_field(obj: dict, key: str, raw: bytes, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """编码字典并追加一个值为预先序列化 JSON 的字段（raw 必须是有效的 JSON，不做校验）"""
+    head = dumps_bytes(obj, default=default)[:-1]
+    separator = b"," if len(head) > 1 else b""
+    return b"".join((head, separator, dumps_bytes(key), b":", raw, b"}"))
@@ -0,0 +1,301 @@
+"""
+进程内存测量模块
+    - RSS / 峰值 RSS、请求级峰值内存跟踪
+    - 数据结构的深度大小估算、线程池/进程池队列状态
+    - tracemalloc 快照与差异（按分配位置所在模块汇总，未启动时没有任何开销）
+"""
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def get_rss() -> Optional[int]:
+    """获取当前进程常驻内存（字节），无法获取时返回 None"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+def get_process_peak_rss() -> Optional[int]:
+    """获取进程生命周期内的峰值常驻内存（字节）"""
+    try:
+        with open("/proc/self/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", None) or info.rss
+    return None
+
+
+class PeakRSSTracker:
+    """
+    请求级峰值内存跟踪器
+    在后台线程中定时采样 RSS，记录区间内的峰值
+    用法:
+        with PeakRSSTracker() as tracker:
+            ...
+        tracker.to_dict()
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.rss_start: Optional[int] = None
+        self.rss_end: Optional[int] = None
+        self.rss_peak: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        rss = get_rss()
+        if rss is not None and (self.rss_peak is None or rss > self.rss_peak):
+            self.rss_peak = rss
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "PeakRSSTracker":
+        self.rss_start = get_rss()
+        self.rss_peak = self.rss_start
+        if self.rss_start is not None:
+            self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sample()
+        self.rss_end = get_rss()
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        delta = None
+        if self.rss_peak is not None and self.rss_start is not None:
+            delta = self.rss_peak - self.rss_start
+        return {
+            "rss_start": self.rss_start,
+            "rss_end": self.rss_end,
+            "rss_peak": self.rss_peak,
+            "rss_peak_delta": delta,
+            "process_peak_rss": get_process_peak_rss(),
+        }
+
+
+def deep_sizeof(obj: Any) -> int:
+    """
+    JSON 类数据（dict / list / tuple / set / str / bytes / 数值）的深度大小估算（字节），共享的对象只计一次
+    其他对象只计对象本身（sys.getsizeof），不展开其属性
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+
+def executor_stats(executor: Any) -> Optional[Dict[str, Any]]:
+    """线程池 / 进程池的队列状态（未创建时返回 None）"""
+    if executor is None:
+        return None
+    stats: Dict[str, Any] = {"type": type(executor).__name__, "max_workers": getattr(executor, "_max_workers", None)}
+    work_queue = getattr(executor, "_work_queue", None)
+    if work_queue is not None and hasattr(executor, "_threads"):
+        # ThreadPoolExecutor：排队任务数、已创建与空闲的线程数
+        stats["queued"] = work_queue.qsize()
+        stats["threads"] = len(executor._threads)
+        idle = getattr(executor, "_idle_semaphore", None)
+        stats["idle_threads"] = getattr(idle, "_value", None)
+    pending = getattr(executor, "_pending_work_items", None)
+    if pending is not None:
+        # ProcessPoolExecutor：已提交未完成的任务数（含已分派给子进程的）
+        stats["pending"] = len(pending)
+        stats["processes"] = len(getattr(executor, "_processes", None) or {})
+    return stats
+
+
+def process_memory() -> Dict[str, Any]:
+    """进程级内存概况"""
+    info: Dict[str, Any] = {
+        "rss": get_rss(),
+        "peak_rss": get_process_peak_rss(),
+        "gc_counts": gc.get_count(),
+        "gc_objects_tracked": len(gc.get_objects()),
+        "threads": threading.active_count(),
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        info["tracemalloc"] = {
+            "traced": current,
+            "traced_peak": peak,
+            "overhead": tracemalloc.get_tracemalloc_memory(),
+            "frames": tracemalloc.get_traceback_limit(),
+        }
+        if info["rss"] is not None:
+            # tracemalloc 只跟踪 Python 分配器；PIL 图像缓冲、sqlite、glibc 线程 arena 等原生内存只体现在差值里
+            info["untraced"] = info["rss"] - current - tracemalloc.get_tracemalloc_memory()
+    return info
+
+
+class TracingNotStarted(Exception):
+    """tracemalloc 未启动"""
+
+
+class MemoryTracer:
+    """
+    tracemalloc 控制：启动时记录基线快照，之后可查看当前分配或与基线的差异
+    分配按栈帧所在模块汇总（模块名由 sys.modules 中各模块的 __file__ 反查，depth 截取前几级，如 app.tools）；
+    by=app 时取调用栈中最内层的 app.* 栈帧（需要 frames > 1），能把标准库/第三方库中的分配归到调用它的业务模块
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.baseline_time: Optional[float] = None
+        self._modules: Dict[str, str] = {}
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> Dict[str, Any]:
+        """启动跟踪并记录基线（已在跟踪时只重新记录基线）"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            return self._set_baseline()
+
+    def stop(self) -> None:
+        """停止跟踪并释放快照"""
+        with self._lock:
+            tracemalloc.stop()
+            self.baseline = None
+            self.baseline_time = None
+
+    def set_baseline(self) -> Dict[str, Any]:
+        """重新记录基线快照"""
+        with self._lock:
+            self._require_tracing()
+            return self._set_baseline()
+
+    def _set_baseline(self) -> Dict[str, Any]:
+        self.baseline = self._take()
+        self.baseline_time = time.time()
+        return {"frames": tracemalloc.get_traceback_limit(), "baseline_time": self.baseline_time,
+                "traced": sum(trace.size for trace in self.baseline.traces)}
+
+    @staticmethod
+    def _require_tracing() -> None:
+        if not tracemalloc.is_tracing():
+            raise TracingNotStarted()
+
+    @staticmethod
+    def _take() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+
+    def _module(self, filename: str) -> str:
+        module = self._modules.get(filename)
+        if module is None:
+            self._modules = {
+                os.path.abspath(path): name
+                for name, mod in list(sys.modules.items())
+                if isinstance(path := getattr(mod, "__file__", None), str)
+            }
+            module = self._modules.get(os.path.abspath(filename))
+            self._modules[filename] = module = module or filename
+        return module
+
+    def _group(self, snapshot: tracemalloc.Snapshot, by: str, depth: int) -> Dict[str, List[int]]:
+        """按模块汇总 [字节数, 分配块数]"""
+        groups: Dict[str, List[int]] = {}
+        names: Dict[Tuple[str, ...], str] = {}
+        for trace in snapshot.traces:
+            frames = trace.traceback
+            key = tuple(frame.filename for frame in frames) if by == "app" else (frames[-1].filename,)
+            name = names.get(key)
+            if name is None:
+                modules = [self._module(filename) for filename in key]
+                # traceback 中栈帧从最外层到最内层排列
+                name = modules[-1]
+                if by == "app":
+                    name = next((module for module in reversed(modules) if module.startswith("app.")), name)
+                if depth and not name.startswith("<"):
+                    name = ".".join(name.split(".")[:depth])
+                names[key] = name
+            entry = groups.get(name)
+            if entry is None:
+                groups[name] = [trace.size, 1]
+            else:
+                entry[0] += trace.size
+                entry[1] += 1
+        return groups
+
+    def snapshot(self, by: str = "module", depth: int = 0, top: int = 30) -> Dict[str, Any]:
+        """当前分配按模块汇总（按字节数从大到小）"""
+        self._require_tracing()
+        groups = self._group(self._take(), by, depth)
+        rows = sorted(groups.items(), key=lambda item: -item[1][0])
+        return {
+            "total": sum(size for size, _ in groups.values()),
+            "modules": [{"module": name, "size": size, "count": count} for name, (size, count) in rows[:top]],
+        }
+
+    def diff(self, by: str = "module", depth: int = 0, top: int = 30) -> Dict[str, Any]:
+        """当前分配与基线的差异按模块汇总（按增长字节数绝对值从大到小）"""
+        self._require_tracing()
+        baseline = self.baseline
+        if baseline is None:
+            raise TracingNotStarted()
+        before = self._group(baseline, by, depth)
+        after = self._group(self._take(), by, depth)
+        rows = []
+        for name in set(before) | set(after):
+            size, count = after.get(name, (0, 0))
+            old_size, old_count = before.get(name, (0, 0))
+            if size != old_size or count != old_count:
+                rows.append({"module": name, "size": size, "size_diff": size - old_size,
+                             "count": count, "count_diff": count - old_count})
+        rows.sort(key=lambda row: -abs(row["size_diff"]))
+        return {
+            "baseline_time": self.baseline_time,
+            "seconds_since_baseline": round(time.time() - self.baseline_time, 1),
+            "total_diff": sum(row["size_diff"] for row in rows),
+            "modules": rows[:top],
+        }
+
+
+memory_tracer = MemoryTracer()
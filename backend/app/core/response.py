@@ -1,9 +1,17 @@
 """
 统一响应模型
+success_response 经 ResponseModel 校验、再由 FastAPI 的 jsonable_encoder 与标准库 json 序列化，适合小响应；
+数据量大的接口使用 envelope_response：直接拼出 {code, message, data, timestamp} 并用 orjson 编码为字节，
+data 也可以是预先序列化的 JSON 字节（raw_data），直接拼接到响应体中
 """
+import time
+from fastapi import Request, Response
 from pydantic import BaseModel
-from typing import Any, Optional
+from pydantic_core import to_jsonable_python
+from typing import Any, Mapping, Optional
 from datetime import datetime
+from app.core import jsonlib
+from app.core.timing import span
 
 
 class ResponseModel(BaseModel):
@@ -50,3 +58,59 @@ def error_response(code: int, message: str, error: Optional[str] = None) -> Erro
         error=error,
         timestamp=int(datetime.now().timestamp())
     )
+
+
+def envelope_bytes(
+    data: Any = None,
+    message: str = "success",
+    code: int = 0,
+    raw_data: Optional[bytes] = None
+) -> bytes:
+    """
+    统一响应格式的响应体（与 success_response 的输出字段及顺序相同）
+    orjson 不支持的类型（pydantic 模型、集合、Decimal 等）按 pydantic 的规则转换，与 ResponseModel 序列化结果一致
+    """
+    with span("serialize"):
+        if raw_data is None:
+            raw_data = jsonlib.dumps_bytes(data, default=to_jsonable_python)
+        # 只在最终拼接时复制一次 data
+        head = jsonlib.dumps_bytes({"code": code, "message": message})[:-1]
+        return b"".join((head, b',"data":', raw_data, b',"timestamp":', str(int(time.time())).encode(), b"}"))
+
+
+class EnvelopeResponse(Response):
+    """直接编码的统一格式响应（不经 ResponseModel 校验与 jsonable_encoder 遍历）"""
+    media_type = "application/json"
+
+
+def envelope_response(
+    data: Any = None,
+    message: str = "success",
+    raw_data: Optional[bytes] = None,
+    headers: Optional[Mapping[str, str]] = None
+) -> EnvelopeResponse:
+    """成功响应（快速路径），raw_data 为预先序列化的 data（必须是有效的 JSON，不做校验）"""
+    return EnvelopeResponse(envelope_bytes(data, message, raw_data=raw_data), headers=headers)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否匹配 ETag（按 RFC 7232 使用弱比较，忽略 W/ 前缀）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def cached_response(request: Request, body: bytes, etag: str, max_age: int = 0) -> Response:
+    """
+    预先序列化的 JSON 响应，带 ETag 与 Cache-Control
+    请求的 If-None-Match 匹配时返回 304（不含响应体）
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}" if max_age > 0 else "no-cache",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,382 @@
+"""
+请求耗时统计与采样分析
+    - TimingMiddleware：按路由与阶段记录耗时直方图（对数分桶，每个直方图占用固定内存）
+    - TimedRoute：记录处理函数的开始与结束时间，据此得到 parse 与 serialize 阶段
+    - span(stage)：在处理请求的上下文中累计某个阶段的耗时（通过上下文变量传递，不在请求中时不记录）
+    - run_in_executor：在线程池中执行并记录排队时间
+    - SamplingProfiler：按固定间隔采样所有线程的调用栈，输出火焰图折叠格式（flamegraph.pl / speedscope 可直接读取）
+
+阶段（同一阶段的嵌套或并发区间按墙钟时间合并计算，queue 除外）：
+    parse      请求进入到处理函数开始（读取请求体、依赖与参数校验）
+    cache      工具结果缓存与会话历史的读写
+    queue      提交到线程池后等待执行的时间（并发条目累加，可能超过请求总耗时）
+    execute    工具执行（含线程池排队）
+    upstream   调用上游 AI 接口
+    serialize  响应序列化（处理函数内的 envelope_response，以及处理函数返回后 FastAPI 的序列化）
+    handler    处理函数总耗时（包含 cache / queue / execute / upstream 及处理函数内的 serialize）
+    send       响应头发出到响应发送完成（含响应压缩、流式响应的生成）
+    total      请求进入到响应发送完成
+"""
+import asyncio
+import bisect
+import functools
+import inspect
+import math
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+perf_counter = time.perf_counter
+
+
+def route_key(scope: Scope) -> str:
+    """统计用的路由（路径模板，不含参数值）"""
+    template = getattr(scope.get("route"), "path", None)
+    if not template:
+        return "<unmatched>"
+    # include_router 挂载的子路由的 path 不含前缀，按模板的层级数从请求路径中取回前缀
+    path = scope.get("path", "").rstrip("/")
+    depth = template.rstrip("/").count("/")
+    prefix = path.rsplit("/", depth)[0] if depth else path
+    return prefix + template
+
+
+class Histogram:
+    """
+    对数分桶直方图：10µs 起每桶上界 ×2^(1/4)（分位数相对误差约 ±9%），约 118s 以上计入最后一桶
+    记录次数、总和与最大值
+    """
+
+    BUCKETS = 96
+    # 各桶上界（秒），最后一桶不设上界
+    BOUNDS = tuple(1e-5 * 2 ** (index / 4) for index in range(BUCKETS - 1))
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @classmethod
+    def upper_bound(cls, index: int) -> float:
+        """第 index 个桶的上界（秒），最后一桶为无穷大"""
+        return cls.BOUNDS[index] if index < len(cls.BOUNDS) else math.inf
+
+    def percentile(self, q: float) -> float:
+        """分位数（桶上界，不超过最大值）"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.upper_bound(index), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.5) * 1000, 3),
+            "p90_ms": round(self.percentile(0.9) * 1000, 3),
+            "p99_ms": round(self.percentile(0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class TimingStats:
+    """按 (路由, 阶段) 汇总的耗时直方图"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+
+    def record(self, route: str, stages: Dict[str, float]) -> None:
+        with self._lock:
+            for stage, seconds in stages.items():
+                histogram = self._histograms.get((route, stage))
+                if histogram is None:
+                    histogram = self._histograms[(route, stage)] = Histogram()
+                histogram.observe(seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """按路由分组，路由按总耗时从高到低排列"""
+        with self._lock:
+            items = [(key, histogram.to_dict()) for key, histogram in self._histograms.items()]
+        routes: Dict[str, Dict[str, Any]] = {}
+        for (route, stage), stats in items:
+            routes.setdefault(route, {})[stage] = stats
+        ordered = sorted(routes.items(), key=lambda item: -item[1].get("total", {}).get("total_ms", 0.0))
+        return {route: stages for route, stages in ordered}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+
+class RequestTiming:
+    """单个请求的阶段耗时（只在事件循环线程中修改）"""
+
+    __slots__ = ("start", "stages", "handler_start", "handler_end", "response_start", "_open")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.stages: Dict[str, float] = {}
+        self.handler_start: Optional[float] = None
+        self.handler_end: Optional[float] = None
+        self.response_start: Optional[float] = None
+        # 阶段 -> [未结束的区间数, 最外层区间的开始时间]
+        self._open: Dict[str, List[Any]] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def enter(self, stage: str) -> None:
+        entry = self._open.get(stage)
+        if entry is None:
+            self._open[stage] = [1, perf_counter()]
+        elif entry[0] == 0:
+            entry[0] = 1
+            entry[1] = perf_counter()
+        else:
+            entry[0] += 1
+
+    def exit(self, stage: str) -> None:
+        entry = self._open[stage]
+        entry[0] -= 1
+        if entry[0] == 0:
+            self.add(stage, perf_counter() - entry[1])
+
+    def finish(self, end: float) -> Dict[str, float]:
+        """结束请求，计算各阶段耗时"""
+        stages = dict(self.stages)
+        if self.handler_start is not None:
+            stages["parse"] = self.handler_start - self.start
+            if self.handler_end is not None:
+                stages["handler"] = self.handler_end - self.handler_start
+                if self.response_start is not None and self.response_start >= self.handler_end:
+                    stages["serialize"] = stages.get("serialize", 0.0) + self.response_start - self.handler_end
+        if self.response_start is not None:
+            stages["send"] = end - self.response_start
+        stages["total"] = end - self.start
+        return stages
+
+
+_current: ContextVar[Optional[RequestTiming]] = ContextVar("aetheris_request_timing", default=None)
+
+
+class span:
+    """
+    累计阶段耗时：with span("cache"): ...
+    不在请求中时只有一次上下文变量读取的开销；同一阶段的嵌套或并发区间按墙钟时间合并
+    """
+
+    __slots__ = ("stage", "timing")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.timing = _current.get()
+
+    def __enter__(self) -> "span":
+        if self.timing is not None:
+            self.timing.enter(self.stage)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self.timing is not None:
+            self.timing.exit(self.stage)
+
+
+async def run_in_executor(executor: Any, func: Callable[..., Any], *args: Any) -> Any:
+    """在线程池中执行 func，记录排队时间（queue）；执行时间计入调用方的 execute 阶段"""
+    loop = asyncio.get_running_loop()
+    timing = _current.get()
+    if timing is None:
+        return await loop.run_in_executor(executor, func, *args)
+
+    def call() -> Tuple[float, Any]:
+        return perf_counter(), func(*args)
+
+    submitted = perf_counter()
+    with span("execute"):
+        started, result = await loop.run_in_executor(executor, call)
+    timing.add("queue", started - submitted)
+    return result
+
+
+def _timed_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    """包装处理函数，记录开始与结束时间（签名不变，include_router 重复包装时直接返回）"""
+    if getattr(endpoint, "__timed__", False):
+        return endpoint
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            timing = _current.get()
+            if timing is None:
+                return await endpoint(*args, **kwargs)
+            timing.handler_start = perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                timing.handler_end = perf_counter()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            # 同步处理函数在线程池中执行，上下文变量随之复制，修改的是同一个 RequestTiming
+            timing = _current.get()
+            if timing is None:
+                return endpoint(*args, **kwargs)
+            timing.handler_start = perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                timing.handler_end = perf_counter()
+    wrapper.__timed__ = True
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """记录处理函数开始与结束时间的路由（APIRouter(route_class=TimedRoute)）"""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+class TimingMiddleware:
+    """
+    请求耗时中间件（ASGI）
+    放在最外层：total 包含其他中间件（CORS、压缩）的耗时
+    """
+
+    def __init__(self, app: ASGIApp, stats: Optional[TimingStats] = None):
+        self.app = app
+        self.stats = stats or timing_stats
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timing = RequestTiming(perf_counter())
+        token = _current.set(timing)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                timing.response_start = perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self.stats.record(route_key(scope), timing.finish(perf_counter()))
+
+
+# 采样时视为空闲的栈顶（事件循环等待、线程池等待任务），默认不计入
+IDLE_FRAMES = frozenset({
+    "selectors:EpollSelector.select",
+    "selectors:KqueueSelector.select",
+    "selectors:PollSelector.select",
+    "selectors:SelectSelector.select",
+    "threading:Condition.wait",
+    "threading:Thread._wait_for_tstate_lock",
+    "concurrent.futures.thread:_worker",
+    "multiprocessing.connection:wait",
+})
+
+
+class ProfileBusy(Exception):
+    """已有采样分析在进行中"""
+
+
+class SamplingProfiler:
+    """
+    采样分析器：在独立线程中每隔 interval 秒读取所有线程的当前调用栈（sys._current_frames），
+    统计折叠栈（线程名;模块:函数;...）出现的次数。被分析的代码不需要任何改动，未采样时没有开销；
+    采样期间每次采样持有 GIL 的时间与线程数和栈深度成正比（见 benchmarks/README.md）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._labels: Dict[Any, str] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def _label(self, frame: Any) -> str:
+        code = frame.f_code
+        label = self._labels.get(code)
+        if label is None:
+            module = frame.f_globals.get("__name__", "?")
+            label = self._labels[code] = f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+        return label
+
+    def run(self, seconds: float, interval: float = 0.01, include_idle: bool = False) -> Dict[str, Any]:
+        """采样 seconds 秒（阻塞，应在线程池中调用），返回折叠栈计数"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfileBusy()
+        try:
+            own = threading.get_ident()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks: Counter = Counter()
+            samples = idle = 0
+            cpu_start = time.thread_time()
+            start = perf_counter()
+            deadline = start + seconds
+            while True:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    if ident not in names:
+                        names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    labels = []
+                    while frame is not None:
+                        labels.append(self._label(frame))
+                        frame = frame.f_back
+                    if not include_idle and labels and labels[0] in IDLE_FRAMES:
+                        idle += 1
+                        continue
+                    labels.append(names.get(ident, f"thread-{ident}"))
+                    labels.reverse()
+                    stacks[";".join(labels)] += 1
+                samples += 1
+                remaining = deadline - perf_counter()
+                if remaining <= 0:
+                    break
+                time.sleep(min(interval, remaining))
+            return {
+                "samples": samples,
+                "idle_samples": idle,
+                "duration_s": round(perf_counter() - start, 3),
+                "interval_ms": round(interval * 1000, 3),
+                "sampler_cpu_ms": round((time.thread_time() - cpu_start) * 1000, 1),
+                "stacks": stacks,
+            }
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def collapsed(stacks: Counter) -> str:
+        """火焰图折叠格式：每行 "栈 次数"（flamegraph.pl、speedscope、inferno 可直接读取）"""
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+timing_stats = TimingStats()
+profiler = SamplingProfiler()
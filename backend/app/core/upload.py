@@ -0,0 +1,121 @@
+"""
+大文件上传接收模块
+请求体先写入 SpooledTemporaryFile（小文件留在内存，大文件落盘），
+落盘后通过 mmap 只读映射供解析使用，避免多次复制整个文档
+multipart 表单边接收边计数，超过大小限制立即中止，不会先把整个表单写完再检查
+"""
+import mmap
+import tempfile
+from typing import Any, AsyncIterator, Optional, Union
+
+from starlette.datastructures import FormData, Headers
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from app.core.config import settings
+
+
+class UploadTooLarge(ValueError):
+    """上传内容超过大小限制"""
+
+
+def _too_large(max_size: int) -> UploadTooLarge:
+    return UploadTooLarge(f"上传内容超过大小限制: {max_size} 字节")
+
+
+async def limit_stream(stream: AsyncIterator[bytes], max_size: int) -> AsyncIterator[bytes]:
+    """按累计字节数限制数据流，超过 max_size 时抛出 UploadTooLarge（max_size 为 0 表示不限制）"""
+    size = 0
+    async for chunk in stream:
+        size += len(chunk)
+        if max_size and size > max_size:
+            raise _too_large(max_size)
+        yield chunk
+
+
+async def read_multipart(
+    headers: Headers,
+    stream: AsyncIterator[bytes],
+    max_size: Optional[int] = None
+) -> FormData:
+    """
+    解析 multipart 表单，整个请求体（含表单字段与分隔符）按 max_size 限制
+    Content-Length 已超过限制时直接拒绝；分块传输时在接收过程中计数
+    格式错误抛出 ValueError，超过限制抛出 UploadTooLarge
+    """
+    max_size = max_size if max_size is not None else settings.UPLOAD_MAX_SIZE
+    content_length = headers.get("content-length", "")
+    if max_size and content_length.isdigit() and int(content_length) > max_size:
+        raise _too_large(max_size)
+    parser = MultiPartParser(headers, limit_stream(stream, max_size))
+    try:
+        return await parser.parse()
+    except MultiPartException as e:
+        raise ValueError(f"表单格式错误: {e.message}")
+
+
+class SpooledBuffer:
+    """
+    上传内容缓冲区
+    用法:
+        with SpooledBuffer() as spool:
+            await spool.write_stream(request.stream())
+            data = spool.buffer()
+    """
+
+    def __init__(
+        self,
+        file: Optional[Any] = None,
+        max_memory: Optional[int] = None,
+        max_size: Optional[int] = None
+    ):
+        self.max_size = max_size if max_size is not None else settings.UPLOAD_MAX_SIZE
+        self._owns_file = file is None
+        self._file = file if file is not None else tempfile.SpooledTemporaryFile(
+            max_size=max_memory if max_memory is not None else settings.UPLOAD_SPOOL_MAX_MEMORY
+        )
+        self._mmap: Optional[mmap.mmap] = None
+        self.size = 0
+
+    async def write_stream(self, stream: AsyncIterator[bytes]) -> int:
+        """写入请求体数据流，返回总字节数"""
+        async for chunk in stream:
+            if not chunk:
+                continue
+            self.size += len(chunk)
+            if self.max_size and self.size > self.max_size:
+                raise _too_large(self.max_size)
+            self._file.write(chunk)
+        return self.size
+
+    @property
+    def on_disk(self) -> bool:
+        """内容是否已落盘"""
+        return bool(getattr(self._file, "_rolled", True))
+
+    def buffer(self) -> Union[bytes, mmap.mmap]:
+        """获取只读内容：落盘时返回 mmap，否则返回 bytes"""
+        self._file.flush()
+        self._file.seek(0, 2)
+        self.size = self._file.tell()
+        if self.max_size and self.size > self.max_size:
+            raise _too_large(self.max_size)
+        if self.size and self.on_disk:
+            if self._mmap is None:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._mmap
+        self._file.seek(0)
+        return self._file.read()
+
+    def close(self) -> None:
+        """释放映射与临时文件"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self) -> "SpooledBuffer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -0,0 +1,81 @@
+"""
+Aetheris 生产环境启动器
+以多个工作进程运行服务（uvicorn --workers），并处理多进程部署需要的共享状态：
+    - 缓存（会话历史、工具结果缓存）使用 sqlite 文件后端，所有工作进程共享
+    - 批量任务由持有任务锁的进程执行，其他进程读取任务目录中的进度与结果；
+      uvicorn 不会重启退出的工作进程，其未完成的任务由存活的进程定期检查接管（CODE_JOB_ADOPT_INTERVAL）
+    - 工作进程在开始接收请求前完成工具预热
+    - 已安装 uvloop / httptools 时使用它们作为事件循环与 HTTP 解析器
+
+用法（在 backend 目录下）:
+    python -m app.launcher
+    python -m app.launcher --workers 4 --port 8000
+
+每个工作进程各自维护的状态（不共享）：条码渲染缓存、模板缓存、压缩统计、导航树/工具列表快照（内容相同，ETag 一致）
+"""
+import argparse
+import importlib.util
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def select_loop() -> str:
+    """已安装 uvloop 时使用 uvloop，否则使用 asyncio"""
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def select_http() -> str:
+    """已安装 httptools 时使用 httptools，否则使用 h11"""
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def prepare_environment(workers: int, cache_type: str) -> None:
+    """
+    设置工作进程继承的环境变量（工作进程重新导入应用，环境变量优先于 .env）
+    必须在导入 app.core.config 之前调用
+    """
+    if workers > 1 and cache_type == "memory":
+        logger.warning("多个工作进程不能共享进程内缓存，已改为 sqlite 缓存")
+        os.environ["CACHE_TYPE"] = "sqlite"
+    os.environ.setdefault("TOOL_WARMUP_BEFORE_READY", "true")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Aetheris 生产环境启动器")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数（默认读取 WORKERS 配置）")
+    parser.add_argument("--host", default=None, help="监听地址（默认读取 HOST 配置）")
+    parser.add_argument("--port", type=int, default=None, help="监听端口（默认读取 PORT 配置）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    from app.core.config import Settings
+    configured = Settings()
+    workers = max(1, args.workers or configured.WORKERS)
+    prepare_environment(workers, configured.CACHE_TYPE.lower())
+
+    import uvicorn
+    from app.core.cache import CacheManager
+
+    # 共享缓存只在主进程中清空一次，工作进程启动时不清空
+    cache_manager = CacheManager(os.environ.get("CACHE_TYPE", configured.CACHE_TYPE).lower())
+    if cache_manager.shared:
+        cache_manager.clear_all()
+
+    loop, http = select_loop(), select_http()
+    logger.info(f"启动 {workers} 个工作进程（事件循环 {loop}，HTTP 解析 {http}，缓存 {cache_manager.cache_type}）")
+    uvicorn.run(
+        "app.main:app",
+        host=args.host or configured.HOST,
+        port=args.port or configured.PORT,
+        workers=workers,
+        loop=loop,
+        http=http,
+        log_level=configured.LOG_LEVEL.lower(),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,16 @@ Aetheris 后端主应用入口
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 from app.api import api_router
 from app.core.config import settings
 from app.core.cache import cache_manager
+from app.core.compression import CompressionMiddleware
+from app.core.timing import TimingMiddleware
+from app.services.batch_jobs import job_manager
+from app.services.tool_registry import tool_registry
 
 # 配置日志
 logging.basicConfig(
@@ -23,15 +28,36 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时
     logger.info("Aetheris 后端服务启动中...")
-    cache_manager.clear_all()
+    # 共享缓存由多个工作进程使用，不在单个进程启动/关闭时清空（启动器在主进程中清空一次）
+    if not cache_manager.shared:
+        cache_manager.clear_all()
     logger.info("缓存系统已初始化")
+    if settings.CODE_GENERATOR_BACKEND == "process":
+        from app.tools import code_render_pool
+        await asyncio.get_running_loop().run_in_executor(None, code_render_pool.warm_up)
+    # 恢复未完成的批量任务
+    await job_manager.start()
+    # 工具在首次执行时才导入；开始接收请求后在后台预热，避免首个请求承担导入与初始化耗时
+    # 多进程部署时在开始接收请求前完成预热，新启动的工作进程不会以冷状态处理请求
+    warmup_task = None
+    if settings.TOOL_WARMUP_BEFORE_READY:
+        await tool_registry.warm_up_in_background()
+    elif settings.TOOL_WARMUP:
+        warmup_task = asyncio.create_task(tool_registry.warm_up_in_background(settings.TOOL_WARMUP_DELAY))
     
     yield
     
     # 关闭时
     logger.info("Aetheris 后端服务关闭中...")
-    cache_manager.clear_all()
-    logger.info("缓存已清理")
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    await job_manager.stop()
+    if not cache_manager.shared:
+        cache_manager.clear_all()
+        logger.info("缓存已清理")
+    if settings.CODE_GENERATOR_BACKEND == "process":
+        from app.tools import code_render_pool
+        code_render_pool.shutdown()
 
 
 # 创建 FastAPI 应用
@@ -51,6 +77,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 响应压缩（在 CORS 之外，CORS 等中间件添加的响应头也会保留；耗时统计中间件在更外层）
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        encodings=[name.strip() for name in settings.COMPRESSION_ENCODINGS.split(",") if name.strip()],
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        zstd_level=settings.COMPRESSION_ZSTD_LEVEL,
+    )
+
+# 请求耗时统计（最外层，总耗时包含压缩）
+if settings.TIMING_ENABLED:
+    app.add_middleware(TimingMiddleware)
+
 # 注册路由
 app.include_router(api_router, prefix=settings.API_PREFIX)
 
@@ -8,11 +8,25 @@ import json
 from typing import List, Dict, Optional, AsyncGenerator
 from app.core.config import settings
 from app.core.cache import cache_manager
+from app.core.memory import deep_sizeof
+from app.core.timing import span
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+async def _timed_lines(response: httpx.Response) -> AsyncGenerator[str, None]:
+    """逐行读取上游流式响应，只把等待上游数据的时间计入 upstream 阶段（调用方处理与转发每一行的时间不计入）"""
+    lines = response.aiter_lines()
+    while True:
+        with span("upstream"):
+            try:
+                line = await lines.__anext__()
+            except StopAsyncIteration:
+                return
+        yield line
+
+
 class AIService:
     """AI 服务类"""
 
@@ -82,7 +96,7 @@ class AIService:
                 reply = "抱歉，我暂时无法回答这个问题。请稍后再试。"
 
             # 保存到历史记录
-            self._save_to_history(session_id, message, reply)
+            await self._save_to_history(session_id, message, reply)
 
             return {
                 "reply": reply,
@@ -164,10 +178,11 @@ class AIService:
                 # deepseek-reasoner 不支持 temperature，移除它
                 payload.pop("temperature", None)
 
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            return response.json()
+        with span("upstream"):
+            async with httpx.AsyncClient(timeout=120.0) as client:
+                response = await client.post(url, headers=headers, json=payload)
+                response.raise_for_status()
+                return response.json()
 
     async def chat_stream(
         self,
@@ -230,7 +245,7 @@ class AIService:
                 async with client.stream("POST", url, headers=headers, json=payload) as response:
                     response.raise_for_status()
                     
-                    async for line in response.aiter_lines():
+                    async for line in _timed_lines(response):
                         if not line or not line.startswith("data: "):
                             continue
                         
@@ -270,7 +285,7 @@ class AIService:
 
             # 保存到历史记录
             if full_content:
-                self._save_to_history(session_id, message, full_content)
+                await self._save_to_history(session_id, message, full_content)
 
             # 发送完成信号
             yield {
@@ -293,35 +308,51 @@ class AIService:
                 "content": f"服务异常：{str(e)}"
             }
 
-    def _save_to_history(self, session_id: str, user_message: str, ai_reply: str):
-        """保存对话到历史记录"""
+    async def _save_to_history(self, session_id: str, user_message: str, ai_reply: str):
+        """保存对话到历史记录（读取与追加在一次原子更新中完成，多个工作进程同时写同一会话不会丢失消息）"""
         cache_key = f"chat_history:{session_id}"
-        history = cache_manager.get(cache_key) or []
 
-        history.append({
-            "role": "user",
-            "content": user_message
-        })
-        history.append({
-            "role": "assistant",
-            "content": ai_reply
-        })
+        def append(history: Optional[List[Dict]]) -> List[Dict]:
+            history = history or []
+            history.append({
+                "role": "user",
+                "content": user_message
+            })
+            history.append({
+                "role": "assistant",
+                "content": ai_reply
+            })
 
-        # 只保留最近 50 条消息
-        if len(history) > 50:
-            history = history[-50:]
+            # 只保留最近 50 条消息
+            return history[-50:]
 
-        cache_manager.set(cache_key, history, ttl=3600 * 24)  # 24 小时过期
+        with span("cache"):
+            await cache_manager.aupdate(cache_key, append, ttl=3600 * 24)  # 24 小时过期
 
-    def get_history(self, session_id: str) -> List[Dict]:
+    async def get_history(self, session_id: str) -> List[Dict]:
         """获取对话历史"""
         cache_key = f"chat_history:{session_id}"
-        return cache_manager.get(cache_key) or []
+        return await cache_manager.aget(cache_key) or []
+
+    def get_session_stats(self) -> Dict:
+        """会话统计：会话数、消息总数、历史占用（内存缓存为深度估算，sqlite 缓存为解码后的估算）"""
+        sessions = messages = size = max_messages = 0
+        for _, history in cache_manager.scan("chat_history:"):
+            sessions += 1
+            messages += len(history)
+            size += deep_sizeof(history)
+            max_messages = max(max_messages, len(history))
+        return {
+            "sessions": sessions,
+            "messages": messages,
+            "bytes": size,
+            "max_messages": max_messages
+        }
 
-    def clear_history(self, session_id: str) -> bool:
+    async def clear_history(self, session_id: str) -> bool:
         """清除对话历史"""
         cache_key = f"chat_history:{session_id}"
-        cache_manager.delete(cache_key)
+        await cache_manager.adelete(cache_key)
         return True
 
 
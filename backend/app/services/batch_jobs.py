@@ -0,0 +1,630 @@
+"""
+条码批量生成任务服务
+提交后立即返回任务ID，由全局调度器在后台生成：
+    - 固定数量的工作协程（全局并发上限），按任务轮转取条目，多个任务公平共享
+    - 条目从任务目录的 input.ndjson 按需读取，不会一次创建全部协程
+    - 每完成一项追加到 results.ndjson（缓冲写入，随 state.json 每 STATE_SAVE_INTERVAL 落盘一次），可分页读取部分结果
+    - 任务状态保存在 state.json，服务重启后自动恢复未完成的任务（已完成的条目不会重做）
+多个工作进程共享任务目录：
+    - 执行任务的进程持有任务目录中 owner.lock 的文件锁（进程退出时自动释放），未完成的任务只由拿到锁的进程恢复执行
+    - 每个进程每隔 CODE_JOB_ADOPT_INTERVAL 秒检查一次任务目录，接管执行进程已退出的未完成任务
+      （uvicorn 不会重启退出的工作进程，不能等到服务重启）
+    - 其他进程按需从任务目录读取任务的只读视图（进度读 state.json，分页结果按需读取行偏移）；
+      取消请求写入 cancel 标记文件，由执行进程处理
+任务目录结构: {CODE_JOB_DIR}/{job_id}/{input.ndjson, results.ndjson, state.json, owner.lock, cancel}
+"""
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core import jsonlib
+from app.core.config import settings
+from app.tools.code_render_cache import RenderCache, RenderStats
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 下没有 fcntl，不加锁（此时只支持单个工作进程）
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+# cancelling: 已请求取消，等待执行任务的进程处理
+JOB_STATUSES = ["queued", "running", "cancelling", "completed", "cancelled", "failed"]
+FINISHED_STATUSES = {"completed", "cancelled", "failed"}
+
+# 进度状态保存的最小间隔（秒），结果文件的缓冲区在保存状态前写入
+STATE_SAVE_INTERVAL = 1.0
+
+# 输入与结果文件的读写缓冲区大小（条目读写在事件循环中执行，大部分只访问缓冲区）
+FILE_BUFFER_SIZE = 64 * 1024
+
+# 任务关闭缓存时使用的占位缓存
+_disabled_cache = RenderCache(max_items=1, enabled=False)
+
+
+class JobNotFound(KeyError):
+    """任务不存在"""
+
+
+class BatchJob:
+    """单个批量任务（状态、输入读取与结果写入）"""
+
+    def __init__(self, directory: str, state: Dict[str, Any], readonly: bool = False):
+        self.directory = directory
+        self.state = state
+        # 只读视图：任务由其他进程执行，只用于查询进度与结果
+        self.readonly = readonly
+        self._owner_lock = None
+        self.stats = RenderStats()
+        self.in_flight = 0
+        self.input_exhausted = False
+        self._input = None
+        self._next_index = 0
+        self._skip: Set[int] = set()
+        self._results = None
+        self._result_offsets: List[int] = []
+        # 只读视图已扫描到的结果文件位置（行偏移按需读取）
+        self._scanned_bytes = 0
+        self._last_saved = 0.0
+
+    @property
+    def job_id(self) -> str:
+        return self.state["job_id"]
+
+    @property
+    def status(self) -> str:
+        return self.state["status"]
+
+    @property
+    def max_concurrent(self) -> int:
+        return self.state["max_concurrent"]
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @classmethod
+    def create(
+        cls,
+        directory: str,
+        items: Iterable[Dict[str, Any]],
+        common_config: Dict[str, Any],
+        max_concurrent: int,
+        use_cache: bool
+    ) -> "BatchJob":
+        """创建任务目录并写入输入条目"""
+        job_id = uuid.uuid4().hex[:16]
+        job_dir = os.path.join(directory, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        total = 0
+        with open(os.path.join(job_dir, "input.ndjson"), "wb") as f:
+            for item in items:
+                f.write(jsonlib.dumps(item).encode("utf-8") + b"\n")
+                total += 1
+        now = time.time()
+        job = cls(job_dir, {
+            "job_id": job_id,
+            "status": "queued",
+            "total": total,
+            "completed": 0,
+            "success_count": 0,
+            "fail_count": 0,
+            "common_config": common_config,
+            "max_concurrent": max(1, max_concurrent),
+            "use_cache": use_cache,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+            "error": None,
+        })
+        job.save_state(force=True)
+        return job
+
+    @classmethod
+    def load(cls, job_dir: str, readonly: bool = False) -> "BatchJob":
+        """
+        从任务目录恢复，按 results.ndjson 重新统计已完成的条目
+        readonly 时只读取 state.json（进度最多滞后 STATE_SAVE_INTERVAL），结果行偏移在分页读取时按需扫描
+        """
+        with open(os.path.join(job_dir, "state.json"), "rb") as f:
+            state = jsonlib.loads(f.read())
+        job = cls(job_dir, state, readonly=readonly)
+        if readonly:
+            if state["status"] not in FINISHED_STATUSES and os.path.exists(job._path("cancel")):
+                state["status"] = "cancelling"
+        else:
+            job._scan_results()
+        return job
+
+    def _scan_offsets(self, count: int) -> None:
+        """只读视图：扫描结果行偏移直到有 count 行（不解析，不截断未写完的行）"""
+        if len(self._result_offsets) >= count:
+            return
+        path = self._path("results.ndjson")
+        if not os.path.exists(path):
+            return
+        offset = self._scanned_bytes
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self._result_offsets.append(offset)
+                offset += len(line)
+                if len(self._result_offsets) >= count:
+                    break
+        self._scanned_bytes = offset
+
+    def _page_offsets(self, offset: int, limit: int) -> List[int]:
+        """分页对应的结果行偏移（只读视图只扫描到该页末尾）"""
+        start = max(0, offset)
+        end = start + max(0, limit)
+        if self.readonly:
+            self._scan_offsets(end)
+        return self._result_offsets[start:end]
+
+    def acquire(self) -> bool:
+        """获取任务的执行权（非阻塞文件锁），已被其他进程持有时返回 False"""
+        if self._owner_lock is not None or fcntl is None:
+            return True
+        handle = open(self._path("owner.lock"), "a+b")
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._owner_lock = handle
+        return True
+
+    def release(self) -> None:
+        """释放执行权"""
+        if self._owner_lock is not None:
+            self._owner_lock.close()
+            self._owner_lock = None
+
+    def request_cancel(self) -> None:
+        """请求执行任务的进程取消任务"""
+        with open(self._path("cancel"), "wb"):
+            pass
+
+    def cancel_requested(self) -> bool:
+        """是否有其他进程请求取消（任务目录被删除也视为取消）"""
+        return not os.path.isdir(self.directory) or os.path.exists(self._path("cancel"))
+
+    def _scan_results(self) -> None:
+        """扫描已有结果：记录行偏移与已完成序号，截断中断时未写完的最后一行"""
+        path = self._path("results.ndjson")
+        completed = success = 0
+        offset = 0
+        if os.path.exists(path):
+            with open(path, "rb+") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("未写完的结果行")
+                        result = jsonlib.loads(line)
+                    except ValueError:
+                        f.truncate(offset)
+                        break
+                    self._result_offsets.append(offset)
+                    self._skip.add(result["index"])
+                    completed += 1
+                    success += 1 if result.get("success") else 0
+                    offset += len(line)
+        self.state.update(completed=completed, success_count=success, fail_count=completed - success)
+
+    def take_item(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """读取下一个待生成的条目，输入读完时返回 None"""
+        if self.input_exhausted:
+            return None
+        if self._input is None:
+            self._input = open(self._path("input.ndjson"), "rb", buffering=FILE_BUFFER_SIZE)
+        for line in self._input:
+            index = self._next_index
+            self._next_index += 1
+            if index in self._skip:
+                self._skip.discard(index)
+                continue
+            return index, jsonlib.loads(line)
+        self.input_exhausted = True
+        self._input.close()
+        self._input = None
+        return None
+
+    def record(self, index: int, result: Dict[str, Any]) -> None:
+        """追加一条结果（写入缓冲区，保存状态时落盘）"""
+        if self._results is None:
+            self._results = open(self._path("results.ndjson"), "ab", buffering=FILE_BUFFER_SIZE)
+        line = jsonlib.dumps({**result, "index": index}).encode("utf-8") + b"\n"
+        self._result_offsets.append(self._results.tell())
+        self._results.write(line)
+        self.state["completed"] += 1
+        if result.get("success"):
+            self.state["success_count"] += 1
+        else:
+            self.state["fail_count"] += 1
+        self.save_state()
+
+    def read_results(self, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """按完成顺序分页读取结果"""
+        offsets = self._page_offsets(offset, limit)
+        if not offsets:
+            return []
+        if self._results is not None:
+            self._results.flush()
+        results = []
+        with open(self._path("results.ndjson"), "rb") as f:
+            for position in offsets:
+                f.seek(position)
+                results.append(jsonlib.loads(f.readline()))
+        return results
+
+    def read_results_raw(self, offset: int = 0, limit: int = 100) -> Tuple[bytes, int]:
+        """按完成顺序分页读取结果，不解析，直接拼成 JSON 数组字节串，返回 (数组, 条数)"""
+        offsets = self._page_offsets(offset, limit)
+        if not offsets:
+            return b"[]", 0
+        if self._results is not None:
+            self._results.flush()
+        lines = []
+        with open(self._path("results.ndjson"), "rb") as f:
+            for position in offsets:
+                f.seek(position)
+                lines.append(f.readline().rstrip(b"\r\n"))
+        return b"[" + b",".join(lines) + b"]", len(lines)
+
+    def set_status(self, status: str, error: Optional[str] = None) -> None:
+        """更新任务状态并立即保存"""
+        self.state["status"] = status
+        if error:
+            self.state["error"] = error
+        if status in FINISHED_STATUSES:
+            self.state["finished_at"] = time.time()
+            self.close()
+        self.save_state(force=True)
+
+    def save_state(self, force: bool = False) -> None:
+        """保存任务状态（进度更新按间隔节流，状态变化时立即保存）"""
+        now = time.time()
+        if not force and now - self._last_saved < STATE_SAVE_INTERVAL:
+            return
+        if not os.path.isdir(self.directory):
+            # 任务已被其他进程删除
+            return
+        # 先写入结果，state.json 记录的完成数不会超过文件中的结果行
+        if self._results is not None:
+            self._results.flush()
+        self.state["updated_at"] = now
+        self._last_saved = now
+        path = self._path("state.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(jsonlib.dumps(self.state, indent=2).encode("utf-8"))
+        os.replace(tmp_path, path)
+
+    def close(self) -> None:
+        """关闭输入与结果文件，释放执行权"""
+        for handle in (self._input, self._results):
+            if handle is not None:
+                handle.close()
+        self._input = None
+        self._results = None
+        self.release()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """任务进度信息"""
+        state = self.state
+        return {
+            "job_id": state["job_id"],
+            "status": state["status"],
+            "total": state["total"],
+            "completed": state["completed"],
+            "success_count": state["success_count"],
+            "fail_count": state["fail_count"],
+            "progress": round(state["completed"] / state["total"], 4) if state["total"] else 1.0,
+            "in_flight": self.in_flight,
+            "created_at": state["created_at"],
+            "updated_at": state["updated_at"],
+            "finished_at": state["finished_at"],
+            "error": state["error"],
+            "cache_stats": self.stats.to_dict(),
+        }
+
+
+class BatchJobManager:
+    """
+    批量任务管理器
+    workers 个工作协程为全局并发上限；每个任务的在途条目数不超过其 max_concurrent
+    _jobs 只包含本进程执行的任务，其他进程的任务按需从任务目录读取只读视图
+    """
+
+    def __init__(self, directory: Optional[str] = None, workers: Optional[int] = None):
+        self.directory = directory or settings.CODE_JOB_DIR or os.path.join(
+            tempfile.gettempdir(), "aetheris", "jobs"
+        )
+        self.workers = workers or settings.CODE_JOB_WORKERS
+        self.adopt_interval = settings.CODE_JOB_ADOPT_INTERVAL
+        self._jobs: Dict[str, BatchJob] = {}
+        # 已确认结束的任务，检查任务目录时跳过
+        self._finished: Set[str] = set()
+        self._active: Deque[BatchJob] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def started(self) -> bool:
+        return self._wakeup is not None
+
+    async def start(self) -> None:
+        """加载已有任务并启动工作协程（未完成的任务继续执行）"""
+        if self.started:
+            # 已启动或正在启动（并发提交时只启动一次）
+            return
+        self._wakeup = asyncio.Event()
+        await self._adopt()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.adopt_interval > 0:
+            self._tasks.append(asyncio.create_task(self._watch()))
+        self._wakeup.set()
+
+    def _find_orphans(self, known: Set[str]) -> List[BatchJob]:
+        """扫描任务目录，取得没有执行进程的未完成任务的执行权并加载（在线程池中执行）"""
+        os.makedirs(self.directory, exist_ok=True)
+        names = set(os.listdir(self.directory))
+        # 已删除的任务不再记录
+        self._finished &= names
+        adopted = []
+        for name in sorted(names - known - self._finished):
+            job_dir = os.path.join(self.directory, name)
+            if name.startswith(".") or not os.path.exists(os.path.join(job_dir, "state.json")):
+                continue
+            probe = None
+            try:
+                probe = BatchJob.load(job_dir, readonly=True)
+                if probe.status in FINISHED_STATUSES:
+                    self._finished.add(name)
+                    continue
+                # 未结束的任务只由拿到执行权的进程恢复
+                if not probe.acquire():
+                    continue
+                job = BatchJob.load(job_dir)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"批量任务 {name} 无法恢复: {str(e)}")
+                if probe is not None:
+                    probe.release()
+                continue
+            # 持有执行权后才扫描（会截断未写完的结果行），再把锁转交给任务
+            job._owner_lock, probe._owner_lock = probe._owner_lock, None
+            adopted.append(job)
+        return adopted
+
+    async def _adopt(self) -> None:
+        """接管执行进程已退出的未完成任务"""
+        jobs = await asyncio.get_running_loop().run_in_executor(None, self._find_orphans, set(self._jobs))
+        for job in jobs:
+            self._jobs[job.job_id] = job
+            self._active.append(job)
+            logger.info(f"恢复批量任务 {job.job_id}: {job.state['completed']}/{job.state['total']}")
+        if jobs:
+            self._wakeup.set()
+
+    async def _watch(self) -> None:
+        """定期检查任务目录（其他工作进程退出后不会被重启，其任务由存活的进程接管）"""
+        while True:
+            await asyncio.sleep(self.adopt_interval)
+            try:
+                await self._adopt()
+            except OSError as e:
+                logger.warning(f"检查批量任务目录失败: {str(e)}")
+
+    async def stop(self) -> None:
+        """停止工作协程并保存状态（在途条目未写入结果，恢复后会重新生成）"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+        for job in self._jobs.values():
+            if job.status not in FINISHED_STATUSES and os.path.isdir(job.directory):
+                job.save_state(force=True)
+            job.close()
+        self._jobs.clear()
+        self._active.clear()
+
+    async def submit(
+        self,
+        items: Iterable[Dict[str, Any]],
+        common_config: Optional[Dict[str, Any]] = None,
+        max_concurrent: int = 10,
+        use_cache: bool = True
+    ) -> BatchJob:
+        """提交任务（输入写入任务目录后立即返回）"""
+        await self.start()
+        job = await asyncio.get_running_loop().run_in_executor(
+            None, BatchJob.create, self.directory, items, common_config or {}, max_concurrent, use_cache
+        )
+        job.acquire()
+        self._jobs[job.job_id] = job
+        if job.state["total"]:
+            self._active.append(job)
+            self._wakeup.set()
+        else:
+            job.set_status("completed")
+        return job
+
+    def _load_view(self, job_id: str) -> BatchJob:
+        """从任务目录读取只读视图"""
+        if os.path.basename(job_id) != job_id or job_id.startswith("."):
+            raise JobNotFound(job_id)
+        try:
+            return BatchJob.load(os.path.join(self.directory, job_id), readonly=True)
+        except (OSError, ValueError, KeyError):
+            raise JobNotFound(job_id)
+
+    def get(self, job_id: str) -> BatchJob:
+        """本进程执行的任务，或从任务目录读取的只读视图（任务由其他进程执行或已结束）"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        return self._load_view(job_id)
+
+    async def aget(self, job_id: str) -> BatchJob:
+        """get 的异步版本（只读视图在线程池中读取）"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        return await asyncio.get_running_loop().run_in_executor(None, self._load_view, job_id)
+
+    def _load_views(self, known: Set[str]) -> List[BatchJob]:
+        """读取任务目录中不在 known 里的任务的只读视图"""
+        views = []
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name in known or name.startswith("."):
+                    continue
+                try:
+                    views.append(BatchJob.load(os.path.join(self.directory, name), readonly=True))
+                except (OSError, ValueError, KeyError):
+                    continue
+        return views
+
+    async def list_jobs(self) -> List[Dict[str, Any]]:
+        """任务列表（其他进程的任务在线程池中读取）"""
+        jobs = list(self._jobs.values())
+        jobs += await asyncio.get_running_loop().run_in_executor(None, self._load_views, set(self._jobs))
+        return [job.to_dict() for job in sorted(jobs, key=lambda j: j.state["created_at"])]
+
+    def get_memory_stats(self) -> Dict[str, Any]:
+        """本进程执行的任务占用：在途条目、结果行偏移（每条结果一个整数）、打开的文件"""
+        jobs = list(self._jobs.values())
+        return {
+            "jobs": len(jobs),
+            "active_jobs": sum(1 for job in jobs if job.status not in FINISHED_STATUSES),
+            "in_flight_items": sum(job.in_flight for job in jobs),
+            "result_offsets": sum(len(job._result_offsets) for job in jobs),
+            "open_files": sum((job._input is not None) + (job._results is not None) for job in jobs),
+        }
+
+    async def cancel(self, job_id: str) -> BatchJob:
+        """取消任务（在途条目完成后不再写入结果）；其他进程执行的任务写入取消标记，由执行进程处理"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return await asyncio.get_running_loop().run_in_executor(None, self._cancel_view, job_id)
+        if job.status not in FINISHED_STATUSES:
+            job.set_status("cancelled")
+        return job
+
+    def _cancel_view(self, job_id: str) -> BatchJob:
+        """取消不由本进程执行的任务（在线程池中执行）"""
+        job = self._load_view(job_id)
+        if job.status in FINISHED_STATUSES:
+            return job
+        if job.acquire():
+            # 执行进程已退出（尚未被接管），持有执行权时重新统计结果后直接取消
+            try:
+                job._scan_results()
+                job.set_status("cancelled")
+            finally:
+                job.release()
+        else:
+            job.request_cancel()
+            job.state["status"] = "cancelling"
+        return job
+
+    async def delete(self, job_id: str) -> None:
+        """删除任务及其文件（其他进程执行的任务在发现目录被删除后停止）"""
+        job = await self.cancel(job_id)
+        self._jobs.pop(job_id, None)
+        job.close()
+        await asyncio.get_running_loop().run_in_executor(None, self._remove_directory, job)
+
+    def _remove_directory(self, job: BatchJob) -> None:
+        """删除任务目录（在线程池中执行）"""
+        # 先整体改名再删除，执行进程不会在删除过程中重新写入状态文件
+        trash = os.path.join(self.directory, f".deleted-{job.job_id}-{uuid.uuid4().hex[:8]}")
+        try:
+            os.rename(job.directory, trash)
+        except OSError:
+            trash = job.directory
+        shutil.rmtree(trash, ignore_errors=True)
+
+    async def _next_work(self) -> Tuple[BatchJob, int, Dict[str, Any]]:
+        """按任务轮转取下一个条目；没有可执行的条目时等待"""
+        while True:
+            for _ in range(len(self._active)):
+                job = self._active.popleft()
+                if job.status in FINISHED_STATUSES or job.input_exhausted:
+                    continue
+                if job.cancel_requested():
+                    self._cancel_requested(job)
+                    continue
+                self._active.append(job)
+                if job.in_flight >= job.max_concurrent:
+                    continue
+                try:
+                    work = job.take_item()
+                except (OSError, ValueError) as e:
+                    job.set_status("failed", error=f"读取任务输入失败: {str(e)}")
+                    continue
+                if work is None:
+                    self._finish_if_done(job)
+                    continue
+                if job.status == "queued":
+                    job.set_status("running")
+                return (job,) + work
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    def _cancel_requested(self, job: BatchJob) -> None:
+        """处理其他进程的取消请求；任务目录已被删除时直接丢弃任务"""
+        if os.path.isdir(job.directory):
+            job.set_status("cancelled")
+            logger.info(f"批量任务 {job.job_id} 已按请求取消")
+        else:
+            job.state["status"] = "cancelled"
+            job.close()
+            self._jobs.pop(job.job_id, None)
+            logger.info(f"批量任务 {job.job_id} 已被删除")
+
+    def _finish_if_done(self, job: BatchJob) -> None:
+        if job.input_exhausted and job.in_flight == 0 and job.status not in FINISHED_STATUSES:
+            job.set_status("completed")
+
+    async def _worker(self) -> None:
+        """工作协程：取条目、生成、写结果"""
+        while True:
+            job, index, item = await self._next_work()
+            # 有任务时才导入条码生成器（服务启动时不导入）
+            from app.tools import code_generator
+            job.in_flight += 1
+            try:
+                config_dict = {**job.state["common_config"], **item}
+                try:
+                    result = await code_generator.generate_code(
+                        config_dict,
+                        stats=job.stats,
+                        cache=None if job.state["use_cache"] else _disabled_cache
+                    )
+                except Exception as e:
+                    result = {"success": False, "content": config_dict.get("content"), "error": str(e)}
+                if job.status not in FINISHED_STATUSES:
+                    try:
+                        job.record(index, result)
+                    except OSError as e:
+                        logger.error(f"批量任务 {job.job_id} 写入结果失败: {str(e)}")
+                        job.set_status("failed", error=f"写入结果失败: {str(e)}")
+            finally:
+                job.in_flight -= 1
+            self._finish_if_done(job)
+            # 释放了任务的并发名额，唤醒等待的工作协程
+            self._wakeup.set()
+
+
+job_manager = BatchJobManager()
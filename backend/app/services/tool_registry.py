@@ -1,12 +1,44 @@
 """
 工具注册中心
+工具以声明（元数据 + "模块:函数" 形式的执行函数路径）注册，启动时不导入任何工具模块：
+    - 内置工具：app/tools/manifest.json
+    - 插件：入口点组 aetheris.tools，入口点对象为一个工具声明字典或其列表
+执行函数在首次执行时才导入（在线程池中导入，不阻塞事件循环）；
+声明了 warmup 的工具可在服务开始接收请求后于后台预热
+工具列表与导航树的响应预先序列化为快照（带 ETag），只在注册工具后重建
 """
-from typing import Dict, List, Optional, Any, Callable
+from typing import Dict, List, Optional, Any, Callable, Union
+import asyncio
+import hashlib
+import importlib
+import importlib.metadata
+import json
 import logging
+import os
+import threading
+import time
 from app.core.cache import cache_manager
+from app.core.config import settings
+from app.core.response import envelope_bytes
+from app.core.timing import span
 
 logger = logging.getLogger(__name__)
 
+# 内置工具清单
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "tools", "manifest.json")
+
+# 插件入口点组
+PLUGIN_ENTRY_POINT_GROUP = "aetheris.tools"
+
+
+def load_object(path: str) -> Any:
+    """按 "模块:属性" 路径导入对象"""
+    module_name, _, attribute = path.partition(":")
+    obj = importlib.import_module(module_name)
+    for name in filter(None, attribute.split(".")):
+        obj = getattr(obj, name)
+    return obj
+
 
 class ToolMetadata:
     """工具元数据"""
@@ -19,7 +51,8 @@ class ToolMetadata:
         category: str,
         icon: str = "",
         keywords: List[str] = None,
-        version: str = "1.0.0"
+        version: str = "1.0.0",
+        upload_param: Optional[str] = None
     ):
         self.tool_id = tool_id
         self.name = name
@@ -28,6 +61,8 @@ class ToolMetadata:
         self.icon = icon
         self.keywords = keywords or []
         self.version = version
+        # 支持原始上传时，上传内容对应的执行参数名
+        self.upload_param = upload_param
     
     def to_dict(self) -> dict:
         """转换为字典"""
@@ -42,89 +77,149 @@ class ToolMetadata:
         }
 
 
+class CatalogSnapshot:
+    """
+    工具目录快照：预先序列化的完整响应体（统一响应格式）与强 ETag
+    响应中的 timestamp 为快照生成时间，保证同一版本的响应体逐字节相同
+    """
+    
+    def __init__(self, version: int, data: Any):
+        self.version = version
+        self.data = data
+        self.body = envelope_bytes(data)
+        self.etag = f'"{version}-{hashlib.sha1(self.body).hexdigest()[:16]}"'
+
+
 class ToolRegistry:
     """工具注册中心"""
     
-    def __init__(self):
+    def __init__(self, manifest_path: Optional[str] = MANIFEST_PATH, discover_plugins: Optional[bool] = None):
         self._tools: Dict[str, ToolMetadata] = {}
-        self._executors: Dict[str, Callable] = {}
-        self._initialize_default_tools()
+        # 已导入的执行函数，或尚未导入的 "模块:函数" 路径
+        self._executors: Dict[str, Union[Callable, str]] = {}
+        self._warmups: Dict[str, str] = {}
+        self._load_times: Dict[str, float] = {}
+        self._load_lock = threading.Lock()
+        # 注册表版本（每次注册工具加一）与按版本缓存的目录快照
+        self._version = 0
+        self._snapshots: Dict[str, CatalogSnapshot] = {}
+        if manifest_path:
+            self._load_manifest(manifest_path)
+        if settings.TOOL_PLUGINS_ENABLED if discover_plugins is None else discover_plugins:
+            self._discover_plugins()
     
-    def _initialize_default_tools(self):
-        """初始化默认工具"""
-        from app.tools import json_formatter, json_field_extractor, code_generator
-        
-        # 注册默认工具
-        self.register_tool(
-            metadata=ToolMetadata(
-                tool_id="ai_chat",
-                name="AI助手",
-                description="智能对话助手",
-                category="AI助手",
-                icon="message",
-                keywords=["对话", "AI", "助手"]
-            ),
-            executor=None
-        )
-        
-        # 注册JSON格式化工具
-        self.register_tool(
-            metadata=ToolMetadata(
-                tool_id="json_formatter",
-                name="JSON格式化",
-                description="格式化、压缩、验证JSON数据",
-                category="文本处理",
-                icon="file",
-                keywords=["JSON", "格式化", "压缩", "验证"]
-            ),
-            executor=json_formatter.format_json
-        )
-        
-        # 注册JSON字段提取工具
-        self.register_tool(
-            metadata=ToolMetadata(
-                tool_id="json_field_extractor",
-                name="JSON字段提取",
-                description="提取JSON中的指定字段，支持嵌套路径和数组索引",
-                category="文本处理",
-                icon="file",
-                keywords=["JSON", "字段", "提取", "嵌套", "CSV", "导出"]
-            ),
-            executor=json_field_extractor.extract_json_fields
-        )
-        
-        # 注册条形码/二维码生成工具
-        self.register_tool(
-            metadata=ToolMetadata(
-                tool_id="code_generator",
-                name="条码生成器",
-                description="生成条形码、二维码，支持合成到模板图片",
-                category="数据处理",
-                icon="qrcode",
-                keywords=["条形码", "二维码", "QRCode", "Code128", "图片"]
-            ),
-            executor=code_generator.generate_code
-        )
-        
+    def _load_manifest(self, path: str):
+        """读取内置工具清单"""
+        with open(path, encoding="utf-8") as f:
+            declarations = json.load(f)
+        for declaration in declarations:
+            self.register_declaration(declaration)
         logger.info("默认工具已注册")
     
+    def _discover_plugins(self):
+        """通过入口点发现插件工具（只导入入口点所在模块，不导入执行函数）"""
+        try:
+            entry_points = importlib.metadata.entry_points(group=PLUGIN_ENTRY_POINT_GROUP)
+        except Exception as e:
+            logger.warning(f"插件发现失败: {e}")
+            return
+        for entry_point in entry_points:
+            try:
+                declared = entry_point.load()
+                for declaration in declared if isinstance(declared, (list, tuple)) else [declared]:
+                    self.register_declaration(declaration)
+            except Exception as e:
+                logger.warning(f"插件加载失败: {entry_point.name} - {e}")
+    
+    def register_declaration(self, declaration: dict):
+        """按工具声明注册（元数据字段 + 可选的 executor、warmup 路径）"""
+        declaration = dict(declaration)
+        executor = declaration.pop("executor", None)
+        warmup = declaration.pop("warmup", None)
+        self.register_tool(ToolMetadata(**declaration), executor=executor, warmup=warmup)
+    
     def register_tool(
         self,
         metadata: ToolMetadata,
-        executor: Optional[Callable] = None
+        executor: Optional[Union[Callable, str]] = None,
+        warmup: Optional[str] = None
     ):
-        """注册工具"""
+        """注册工具（executor 可以是函数，也可以是首次执行时才导入的 "模块:函数" 路径）"""
         self._tools[metadata.tool_id] = metadata
         if executor:
             self._executors[metadata.tool_id] = executor
+        if warmup:
+            self._warmups[metadata.tool_id] = warmup
+        self._version += 1
+        self._snapshots.clear()
         logger.info(f"工具已注册: {metadata.tool_id} - {metadata.name}")
     
+    def load_executor(self, tool_id: str) -> Callable:
+        """获取执行函数，尚未导入时导入并记录耗时（同步，可能较慢）"""
+        executor = self._executors.get(tool_id)
+        if executor is None:
+            raise ValueError(f"工具未实现: {tool_id}")
+        if not isinstance(executor, str):
+            return executor
+        with self._load_lock:
+            executor = self._executors[tool_id]
+            if isinstance(executor, str):
+                start = time.perf_counter()
+                executor = self._executors[tool_id] = load_object(executor)
+                self._load_times[tool_id] = time.perf_counter() - start
+                logger.info(f"工具已加载: {tool_id}（{self._load_times[tool_id] * 1000:.1f}ms）")
+        return executor
+    
+    def is_loaded(self, tool_id: str) -> bool:
+        """执行函数是否已导入"""
+        return tool_id in self._executors and not isinstance(self._executors[tool_id], str)
+    
+    def warm_up(self, tool_ids: Optional[List[str]] = None) -> Dict[str, float]:
+        """导入执行函数并运行预热函数（同步），返回各工具耗时（秒）"""
+        timings = {}
+        for tool_id in tool_ids or list(self._executors):
+            start = time.perf_counter()
+            try:
+                self.load_executor(tool_id)
+                if tool_id in self._warmups:
+                    load_object(self._warmups[tool_id])()
+            except Exception as e:
+                logger.warning(f"工具预热失败: {tool_id} - {e}")
+                continue
+            timings[tool_id] = time.perf_counter() - start
+        return timings
+    
+    async def warm_up_in_background(self, delay: float = 0.0) -> Dict[str, float]:
+        """延迟 delay 秒后在线程池中预热（服务启动后调用，不影响开始接收请求）"""
+        await asyncio.sleep(delay)
+        timings = await asyncio.get_running_loop().run_in_executor(None, self.warm_up)
+        logger.info("工具预热完成: " + ", ".join(
+            f"{tool_id} {elapsed * 1000:.1f}ms" for tool_id, elapsed in timings.items()
+        ))
+        return timings
+    
+    def get_load_stats(self) -> Dict[str, Any]:
+        """各工具执行函数的导入状态与耗时（毫秒）"""
+        return {
+            tool_id: {
+                "loaded": self.is_loaded(tool_id),
+                "load_ms": round(self._load_times[tool_id] * 1000, 1) if tool_id in self._load_times else None
+            }
+            for tool_id in self._executors
+        }
+    
     def get_tool(self, tool_id: str) -> Optional[dict]:
         """获取工具信息"""
         if tool_id in self._tools:
             return self._tools[tool_id].to_dict()
         return None
     
+    def get_upload_param(self, tool_id: str) -> Optional[str]:
+        """获取工具接收原始上传内容的参数名，不支持上传时返回 None"""
+        if tool_id in self._tools:
+            return self._tools[tool_id].upload_param
+        return None
+    
     def get_all_tools(self) -> List[dict]:
         """获取所有工具"""
         return [tool.to_dict() for tool in self._tools.values()]
@@ -159,6 +254,17 @@ class ToolRegistry:
         
         return navigation
     
+    def get_catalog_snapshot(self, name: str) -> CatalogSnapshot:
+        """获取目录快照（tools：工具列表，navigation：导航树），注册表变化后首次获取时重建"""
+        snapshot = self._snapshots.get(name)
+        if snapshot is None or snapshot.version != self._version:
+            builders = {"tools": self.get_all_tools, "navigation": self.get_navigation_tree}
+            if name not in builders:
+                raise ValueError(f"未知的目录: {name}")
+            snapshot = CatalogSnapshot(self._version, builders[name]())
+            self._snapshots[name] = snapshot
+        return snapshot
+    
     async def execute_tool(
         self,
         tool_id: str,
@@ -171,22 +277,28 @@ class ToolRegistry:
         
         # 检查缓存
         if use_cache:
-            cache_key = cache_manager.generate_key(f"tool:{tool_id}", params)
-            cached_result = cache_manager.get(cache_key)
+            with span("cache"):
+                cache_key = cache_manager.generate_key(f"tool:{tool_id}", params)
+                cached_result = await cache_manager.aget(cache_key)
             if cached_result is not None:
                 logger.info(f"使用缓存结果: {tool_id}")
                 return cached_result
         
-        # 执行工具
+        # 执行工具（首次执行时在线程池中导入执行函数）
         if tool_id not in self._executors:
             raise ValueError(f"工具未实现: {tool_id}")
         
-        executor = self._executors[tool_id]
-        result = await executor(params)
+        with span("execute"):
+            if self.is_loaded(tool_id):
+                executor = self._executors[tool_id]
+            else:
+                executor = await asyncio.get_running_loop().run_in_executor(None, self.load_executor, tool_id)
+            result = await executor(params)
         
         # 缓存结果
         if use_cache:
-            cache_manager.set(cache_key, result, ttl=3600)
+            with span("cache"):
+                await cache_manager.aset(cache_key, result, ttl=3600)
         
         return result
 
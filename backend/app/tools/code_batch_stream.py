@@ -0,0 +1,126 @@
+"""
+条码批量生成的流式输出
+把 iter_codes_batch 产出的结果逐个编码为响应数据块：
+    - ndjson：每行一个结果（含 index 与 base64），最后一行为汇总 {"done": true, ...}
+    - sse：每个结果一个 result 事件，最后一个 done 事件为汇总
+    - zip：原始图片文件（不压缩，ZIP_STORED），最后写入 manifest.json（汇总与失败项）
+    - pdf：多页 PDF，每个条码一页（条目的输出格式固定为 PDF），页面逐个写出
+结果按完成顺序输出，以 index 对应请求中的条目顺序
+"""
+import base64
+import re
+import time
+import zipfile
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from app.core import jsonlib
+from app.tools.code_generator import OUTPUT_EXTENSIONS, BatchProgress
+from app.tools.code_vector import PDFWriter, read_pdf_page
+
+# 支持的流式输出格式
+BATCH_STREAM_FORMATS = ["ndjson", "sse", "zip", "pdf"]
+
+# 各格式的响应类型
+BATCH_STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+    "zip": "application/zip",
+    "pdf": "application/pdf",
+}
+
+_UNSAFE_FILENAME = re.compile(r"[^\w.-]+")
+
+ResultStream = AsyncIterator[Tuple[int, Dict[str, Any]]]
+
+
+def _with_base64(result: Dict[str, Any]) -> Dict[str, Any]:
+    """二进制结果转换为 base64 结果"""
+    if "data" not in result:
+        return result
+    result = dict(result)
+    result["base64"] = base64.b64encode(result.pop("data")).decode("utf-8")
+    return result
+
+
+async def iter_ndjson(results: ResultStream, progress: BatchProgress) -> AsyncIterator[bytes]:
+    """NDJSON 输出"""
+    async for _, result in results:
+        yield (jsonlib.dumps(_with_base64(result)) + "\n").encode("utf-8")
+    yield (jsonlib.dumps({"done": True, **progress.to_dict()}) + "\n").encode("utf-8")
+
+
+async def iter_sse(results: ResultStream, progress: BatchProgress) -> AsyncIterator[bytes]:
+    """Server-Sent Events 输出"""
+    async for _, result in results:
+        yield f"event: result\ndata: {jsonlib.dumps(_with_base64(result))}\n\n".encode("utf-8")
+    yield f"event: done\ndata: {jsonlib.dumps(progress.to_dict())}\n\n".encode("utf-8")
+
+
+class _ChunkWriter:
+    """不可 seek 的写入目标，zipfile 写入的数据暂存到取走为止"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def zip_filename(index: int, result: Dict[str, Any]) -> str:
+    """归档内的文件名：序号 + 内容摘要 + 扩展名"""
+    content = _UNSAFE_FILENAME.sub("_", str(result.get("content", "")))[:40].strip("_")
+    extension = OUTPUT_EXTENSIONS.get(str(result.get("format", "PNG")).upper(), "bin")
+    name = f"{index:06d}_{content}" if content else f"{index:06d}"
+    return f"{name}.{extension}"
+
+
+async def iter_zip(results: ResultStream, progress: BatchProgress) -> AsyncIterator[bytes]:
+    """ZIP 输出：每完成一项写入一个文件并立即输出"""
+    writer = _ChunkWriter()
+    errors = []
+    archive = zipfile.ZipFile(writer, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True)
+    async for index, result in results:
+        if not result.get("success"):
+            errors.append({"index": index, "content": result.get("content"), "error": result.get("error")})
+            continue
+        info = zipfile.ZipInfo(zip_filename(index, result), date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        data = result["data"] if "data" in result else base64.b64decode(result["base64"])
+        archive.writestr(info, data)
+        chunk = writer.take()
+        if chunk:
+            yield chunk
+
+    manifest = {**progress.to_dict(), "errors": errors}
+    archive.writestr("manifest.json", jsonlib.dumps(manifest, indent=2))
+    archive.close()
+    yield writer.take()
+
+
+async def iter_pdf(results: ResultStream, progress: BatchProgress) -> AsyncIterator[bytes]:
+    """多页 PDF 输出：按完成顺序每项一页，失败项跳过（数量见页数与日志）"""
+    writer = PDFWriter()
+    yield writer.begin()
+    async for _, result in results:
+        if not result.get("success"):
+            continue
+        data = result["data"] if "data" in result else base64.b64decode(result["base64"])
+        yield writer.add_page(*read_pdf_page(data))
+    yield writer.end()
+
+
+STREAM_ENCODERS = {
+    "ndjson": iter_ndjson,
+    "sse": iter_sse,
+    "zip": iter_zip,
+    "pdf": iter_pdf,
+}
@@ -0,0 +1,128 @@
+"""
+条码图片编码配置
+二维码与条形码基本只有两种颜色，按配置选择图片模式与编码参数：
+    - fastest：保持渲染得到的模式（黑白 1 位图 / 双色调色板 / 灰度），zlib 1 级，8 位以上模式使用 RLE 策略
+    - balanced（默认，无损）：只有纯黑纯白的灰度图转为 1 位图，不超过 16 级的灰度图转为调色板，
+      不超过 256 色的彩色图（模板合成结果）按颜色精确映射为调色板，zlib 6 级
+    - gray16（有损）：灰度图（条形码文字抗锯齿、平滑缩放的边缘）量化为 16 级灰度的 4 位调色板，彩色图同 balanced
+    - smallest（有损）：灰度图二值化为 1 位图，彩色图同 balanced，zlib 9 级并启用 optimize
+JPEG/WEBP 按配置选择编码速度（WEBP method、JPEG optimize），质量仍由 output_quality 决定
+"""
+import io
+import zlib
+from typing import Any, Dict
+
+from PIL import Image, ImageChops
+
+# 编码配置
+ENCODING_PROFILES = {
+    "fastest": {"reduce": None, "compress_level": 1, "webp_method": 0, "jpeg_optimize": False},
+    "balanced": {"reduce": "lossless", "compress_level": 6, "webp_method": 4, "jpeg_optimize": False},
+    "gray16": {"reduce": "gray16", "compress_level": 6, "webp_method": 4, "jpeg_optimize": False},
+    "smallest": {"reduce": "bilevel", "compress_level": 9, "webp_method": 6, "jpeg_optimize": True},
+}
+
+DEFAULT_PROFILE = "balanced"
+
+# 16 级灰度：量化查找表与调色板
+_GRAY16_LUT = [v * 16 // 256 for v in range(256)]
+_GRAY16_PALETTE = [c for i in range(16) for c in (i * 17,) * 3]
+
+
+def resolve_profile(profile: Any) -> str:
+    """编码配置名称（不支持的配置回退为 balanced）"""
+    profile = str(profile or DEFAULT_PROFILE).lower()
+    return profile if profile in ENCODING_PROFILES else DEFAULT_PROFILE
+
+
+def _gray16(img: Image.Image) -> Image.Image:
+    """灰度图量化为 16 级灰度的 4 位调色板图"""
+    img = img.point(_GRAY16_LUT).convert('P')
+    img.putpalette(_GRAY16_PALETTE)
+    return img
+
+
+def _gray_palette(img: Image.Image) -> Image.Image:
+    """不超过 16 级的灰度图按灰度值精确映射为调色板图（PNG 按颜色数写为 1/2/4 位），否则原样返回"""
+    colors = img.getcolors(16)
+    if colors is None:
+        return img
+    values = sorted(value for _, value in colors)
+    if values == [0, 255] or values == [0] or values == [255]:
+        return img.convert('1', dither=Image.Dither.NONE)
+    lut = [0] * 256
+    for index, value in enumerate(values):
+        lut[value] = index
+    palette_img = img.point(lut).convert('P')
+    palette_img.putpalette([c for value in values for c in (value,) * 3])
+    return palette_img
+
+
+def _to_palette(img: Image.Image) -> Image.Image:
+    """不超过 256 色的 RGB/RGBA 图无损转为调色板图（映射结果与原图逐像素一致），否则原样返回"""
+    if img.mode == 'RGBA':
+        if img.getextrema()[3][0] < 255:
+            return img
+        img = img.convert('RGB')
+    colors = img.getcolors(256)
+    if colors is None:
+        return img
+    if len(colors) <= 2:
+        # 黑白两色直接转为 1 位图
+        values = {color for _, color in colors}
+        if values <= {(0, 0, 0), (255, 255, 255)}:
+            return img.convert('1', dither=Image.Dither.NONE)
+    # 以实际出现的颜色作为调色板映射（比 quantize 聚类快一个数量级）
+    # Pillow 的调色板映射按近似颜色缓存查找，颜色非常接近时可能映射到相邻颜色，映射后逐像素比对，不一致则保持原图
+    palette = Image.new('P', (1, 1))
+    palette.putpalette([c for _, color in colors for c in color])
+    palette_img = img.quantize(palette=palette, dither=Image.Dither.NONE)
+    if ImageChops.difference(palette_img.convert('RGB'), img).getbbox() is not None:
+        return img
+    return palette_img
+
+
+def reduce_image(img: Image.Image, profile: str) -> Image.Image:
+    """按编码配置选择最小的图片模式"""
+    reduce = ENCODING_PROFILES[profile]["reduce"]
+    if reduce is None or img.mode in ('1', 'P'):
+        return img
+    if img.mode == 'L':
+        if reduce == "bilevel":
+            return img.convert('1', dither=Image.Dither.NONE)
+        palette_img = _gray_palette(img)
+        if palette_img is not img or reduce == "lossless":
+            return palette_img
+        return _gray16(img)
+    if img.mode in ('RGB', 'RGBA'):
+        return _to_palette(img)
+    return img
+
+
+def encode(img: Image.Image, output_format: str, quality: int, profile: str = DEFAULT_PROFILE) -> bytes:
+    """按输出格式与编码配置编码图片"""
+    profile = resolve_profile(profile)
+    options = ENCODING_PROFILES[profile]
+    save_kwargs: Dict[str, Any] = {}
+
+    if output_format == 'JPEG':
+        # JPEG 只支持灰度与 RGB
+        if img.mode not in ('L', 'RGB'):
+            img = img.convert('L' if img.mode == '1' else 'RGB')
+        save_kwargs['quality'] = quality
+        save_kwargs['optimize'] = options["jpeg_optimize"]
+    else:
+        img = reduce_image(img, profile)
+        if output_format == 'PNG':
+            save_kwargs['compress_level'] = options["compress_level"]
+            if profile == "fastest" and img.mode not in ('1', 'P'):
+                save_kwargs['compress_type'] = zlib.Z_RLE
+            if profile == "smallest":
+                save_kwargs['optimize'] = True
+        elif output_format == 'WEBP':
+            save_kwargs['quality'] = quality
+            save_kwargs['method'] = options["webp_method"]
+
+    buffer = io.BytesIO()
+    img.save(buffer, format=output_format, **save_kwargs)
+    return buffer.getvalue()
@@ -7,18 +7,43 @@
 
 import asyncio
 import base64
-import io
+import functools
+import itertools
 import os
+import threading
 from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, List, Dict, Any, Literal
-from PIL import Image
+from typing import (
+    Optional, List, Dict, Any, Literal, NamedTuple, Tuple,
+    AsyncIterable, AsyncIterator, Iterable, Union
+)
+from PIL import Image, ImageChops, ImageColor, ImageDraw, ImageFont
 import qrcode
 from qrcode.constants import ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q, ERROR_CORRECT_H
 import barcode
-from barcode.writer import ImageWriter
 
-# 线程池用于并发生成
-_executor = ThreadPoolExecutor(max_workers=10)
+from app.core import timing
+from app.core.config import settings
+from app.core.timing import span
+from app.tools.code_encoding import ENCODING_PROFILES, encode, resolve_profile
+from app.tools.code_render_cache import RenderCache, RenderStats, image_nbytes, render_cache
+from app.tools.code_templates import template_registry
+
+# 线程池用于并发生成（CODE_GENERATOR_BACKEND=process 时改用多进程后端），首次使用时创建
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# 不使用缓存时的占位缓存
+_disabled_cache = RenderCache(max_items=1, enabled=False)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """渲染线程池（首次使用时创建）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.CODE_GENERATOR_WORKERS or 10)
+    return _executor
 
 
 # 错误纠正级别映射
@@ -29,11 +54,31 @@ ERROR_CORRECT_MAP = {
     'H': ERROR_CORRECT_H
 }
 
+# 条形码两侧空白区（毫米）
+BARCODE_QUIET_ZONE = 6.5
+
 # 支持的条形码类型
 BARCODE_TYPES = [
     'code128', 'code39', 'ean13', 'ean8', 'upca', 'isbn13', 'isbn10', 'issn', 'pzn'
 ]
 
+# 输出格式对应的响应类型与文件扩展名
+OUTPUT_MEDIA_TYPES = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "BMP": "image/bmp",
+    "GIF": "image/gif",
+    "SVG": "image/svg+xml",
+    "PDF": "application/pdf",
+}
+OUTPUT_EXTENSIONS = {
+    "PNG": "png", "JPEG": "jpg", "WEBP": "webp", "BMP": "bmp", "GIF": "gif", "SVG": "svg", "PDF": "pdf"
+}
+
+# 矢量输出格式（由模块数据直接生成，见 code_vector）
+VECTOR_OUTPUT_FORMATS = ["SVG", "PDF"]
+
 
 class CodeGeneratorConfig:
     """码生成配置"""
@@ -50,6 +95,7 @@ class CodeGeneratorConfig:
         qr_border: int = 4,
         qr_fill_color: str = 'black',
         qr_back_color: str = 'white',
+        qr_resize_mode: Literal['fit', 'stretch'] = 'stretch',
         # 条形码配置
         barcode_width: float = 0.4,
         barcode_height: float = 15.0,
@@ -61,12 +107,14 @@ class CodeGeneratorConfig:
         use_template: bool = False,
         template_path: Optional[str] = None,
         template_base64: Optional[str] = None,
+        template_id: Optional[str] = None,
         position_x: int = 0,
         position_y: int = 0,
         # 最终输出配置
         output_format: str = 'PNG',
         output_quality: int = 95,
         output_path: Optional[str] = None,
+        output_profile: Optional[str] = None,
     ):
         self.content = content
         self.code_type = code_type
@@ -78,6 +126,7 @@ class CodeGeneratorConfig:
         self.qr_border = qr_border
         self.qr_fill_color = qr_fill_color
         self.qr_back_color = qr_back_color
+        self.qr_resize_mode = qr_resize_mode
         # Barcode
         self.barcode_width = barcode_width
         self.barcode_height = barcode_height
@@ -89,29 +138,357 @@ class CodeGeneratorConfig:
         self.use_template = use_template
         self.template_path = template_path
         self.template_base64 = template_base64
+        self.template_id = template_id
         self.position_x = position_x
         self.position_y = position_y
         # Final output
         self.output_format = output_format.upper()
         self.output_quality = output_quality
         self.output_path = output_path
+        # 编码配置（未指定时使用 CODE_OUTPUT_PROFILE）
+        self.output_profile = resolve_profile(output_profile or settings.CODE_OUTPUT_PROFILE)
 
 
-def generate_qrcode(config: CodeGeneratorConfig) -> Image.Image:
-    """生成二维码"""
+class QRMatrix(NamedTuple):
+    """二维码模块矩阵（不含边框），每行一个 bytes，1 表示深色模块"""
+    version: int
+    rows: Tuple[bytes, ...]
+    
+    @property
+    def size(self) -> int:
+        return len(self.rows)
+
+
+class EncodedImage(NamedTuple):
+    """编码后的图片"""
+    data: bytes
+    width: int
+    height: int
+
+
+def _barcode_format(config: CodeGeneratorConfig) -> str:
+    """条形码类型（不支持的类型回退为 code128）"""
+    return config.barcode_format if config.barcode_format in BARCODE_TYPES else 'code128'
+
+
+def _error_correct(config: CodeGeneratorConfig) -> str:
+    """纠错级别（不支持的级别回退为 M）"""
+    level = str(config.qr_error_correct).upper()
+    return level if level in ERROR_CORRECT_MAP else 'M'
+
+
+def _matrix_key(config: CodeGeneratorConfig) -> tuple:
+    return ('qrcode', config.content, config.qr_version, _error_correct(config))
+
+
+def _raster_key(config: CodeGeneratorConfig, box_size: Optional[int] = None) -> tuple:
+    if config.code_type == 'qrcode':
+        return _matrix_key(config) + (
+            box_size or config.qr_box_size, config.qr_border,
+            str(config.qr_fill_color).lower(), str(config.qr_back_color).lower()
+        )
+    return (
+        'barcode', config.content, _barcode_format(config),
+        float(config.barcode_width), float(config.barcode_height), bool(config.barcode_write_text)
+    )
+
+
+def _resized_key(config: CodeGeneratorConfig) -> tuple:
+    resize_mode = config.qr_resize_mode if config.code_type == 'qrcode' else None
+    return _raster_key(config) + (config.output_width or None, config.output_height or None, resize_mode)
+
+
+def _template_key(config: CodeGeneratorConfig) -> Optional[tuple]:
+    """模板标识（base64 模板会先注册，以内容哈希作为标识）"""
+    if not config.use_template:
+        return None
+    if config.template_id:
+        template = ('id', config.template_id)
+    elif config.template_base64:
+        template = ('id', template_registry.register_base64(config.template_base64))
+    elif config.template_path and os.path.exists(config.template_path):
+        stat = os.stat(config.template_path)
+        template = ('path', os.path.abspath(config.template_path), stat.st_mtime_ns, stat.st_size)
+    else:
+        raise ValueError("模板图片未提供或不存在")
+    return template + (config.position_x, config.position_y)
+
+
+def encoded_cache_key(config: CodeGeneratorConfig) -> tuple:
+    """encoded 阶段缓存键（渲染参数 + 模板 + 输出格式）"""
+    quality = config.output_quality if config.output_format in ['JPEG', 'WEBP'] else None
+    return _resized_key(config) + (
+        _template_key(config), config.output_format, quality, config.output_profile
+    )
+
+
+def build_qr_matrix(config: CodeGeneratorConfig) -> QRMatrix:
+    """计算二维码模块矩阵"""
     qr = qrcode.QRCode(
         version=config.qr_version,
-        error_correction=ERROR_CORRECT_MAP.get(config.qr_error_correct, ERROR_CORRECT_M),
-        box_size=config.qr_box_size,
-        border=config.qr_border,
+        error_correction=ERROR_CORRECT_MAP[_error_correct(config)],
+        box_size=1,
+        border=0,
     )
     qr.add_data(config.content)
     qr.make(fit=True)
+    rows = tuple(bytes(bytearray(1 if module else 0 for module in row)) for row in qr.modules)
+    return QRMatrix(version=qr.version, rows=rows)
+
+
+def _qr_palette(config: CodeGeneratorConfig) -> Tuple[Optional[List[int]], bool]:
+    """二维码配色：黑白返回 (None, False)，否则返回 ([背景RGB, 前景RGB], 背景是否透明)"""
+    fill_color = str(config.qr_fill_color).lower()
+    back_color = str(config.qr_back_color).lower()
+    if fill_color == 'black' and back_color == 'white':
+        return None, False
+    transparent = back_color == 'transparent'
+    back_rgb = (0, 0, 0) if transparent else ImageColor.getrgb(back_color)[:3]
+    return list(back_rgb) + list(ImageColor.getrgb(fill_color)[:3]), transparent
+
+
+def render_qr_raster(
+    matrix: QRMatrix,
+    config: CodeGeneratorConfig,
+    box_size: Optional[int] = None
+) -> Image.Image:
+    """
+    根据模块矩阵批量生成二维码图片：矩阵直接作为单像素图片，再按整数倍最近邻放大并加边框
+    黑白输出 1 位图，其他配色输出双色调色板图（透明背景带透明索引），
+    转为 RGBA 后与 qrcode 的 PIL 图片输出逐像素一致
+    """
+    box_size = box_size or config.qr_box_size
+    border = config.qr_border
+    modules = matrix.size + border * 2
     
-    img = qr.make_image(fill_color=config.qr_fill_color, back_color=config.qr_back_color)
-    img = img.convert('RGBA')
+    # 在模块层面加边框（调色板索引：0 为背景，1 为深色模块），整张图只需一次放大
+    side = bytes(border)
+    blank = bytes(modules) * border
+    data = blank + b"".join(side + row + side for row in matrix.rows) + blank
+    img = Image.frombytes('P', (modules, modules), data)
     
-    # 调整尺寸
+    palette, transparent = _qr_palette(config)
+    if palette is None:
+        img.putpalette([255, 255, 255, 0, 0, 0])
+        img = img.convert('1', dither=Image.Dither.NONE)
+    else:
+        img.putpalette(palette)
+    if box_size != 1:
+        img = img.resize((modules * box_size, modules * box_size), Image.Resampling.NEAREST)
+    if transparent:
+        img.info['transparency'] = 0
+    return img
+
+
+def _qr_fit(matrix: QRMatrix, config: CodeGeneratorConfig) -> Tuple[int, Optional[Tuple[int, int]]]:
+    """
+    fit 模式下按输出尺寸选择整数模块大小，返回 (模块像素数, 目标尺寸)
+    目标尺寸为 None 表示无需调整；输出尺寸小于模块数（每个模块不足 1 像素）时无法保留全部模块，抛出 ValueError
+    """
+    modules = matrix.size + config.qr_border * 2
+    width, height = config.output_width, config.output_height
+    if not width and not height:
+        return config.qr_box_size, None
+    width = width or height
+    height = height or width
+    if min(width, height) < modules:
+        raise ValueError(
+            f"输出尺寸 {width}x{height} 小于二维码模块数 {modules}（含边框），"
+            f"fit 模式每个模块至少需要 1 像素"
+        )
+    return min(width, height) // modules, (width, height)
+
+
+def _qr_fit_image(img: Image.Image, target: Tuple[int, int]) -> Image.Image:
+    """把整数倍放大后的二维码居中放到目标尺寸（多余部分为背景；目标尺寸不小于码图，由 _qr_fit 保证）"""
+    if img.size == target:
+        return img
+    background = 255 if img.mode == '1' else 0
+    canvas = Image.new(img.mode, target, background)
+    if img.mode == 'P':
+        canvas.putpalette(img.getpalette())
+        canvas.info.update(img.info)
+    canvas.paste(img, ((target[0] - img.width) // 2, (target[1] - img.height) // 2))
+    return canvas
+
+
+# 条形码绘制参数（与 python-barcode 的 ImageWriter 默认值一致）
+BARCODE_DPI = 300
+BARCODE_FONT_PATH = os.path.join(os.path.dirname(barcode.__file__), 'fonts', 'DejaVuSansMono.ttf')
+BARCODE_FONT_SIZE = 10
+BARCODE_TEXT_DISTANCE = 5.0
+BARCODE_TEXT_LINE_DISTANCE = 1
+BARCODE_MARGIN = 1
+BARCODE_GUARD_HEIGHT_FACTOR = 1.1
+
+
+def _mm2px(mm: float) -> float:
+    return mm * BARCODE_DPI / 25.4
+
+
+def _pt2mm(pt: float) -> float:
+    return pt * 0.352777778
+
+
+class BarcodeGeometry(NamedTuple):
+    """条形码几何（单位毫米）：总宽高、条 (x, y, 宽, 高)、文字 (中心 x, 下沿 y, 文本)"""
+    width: float
+    height: float
+    bars: Tuple[Tuple[float, float, float, float], ...]
+    texts: Tuple[Tuple[float, float, str], ...]
+
+
+class BarcodeLayout(NamedTuple):
+    """条形码版面：图片尺寸、条的像素区域 (x0, y0, x1, y1)（含端点）与文字位置"""
+    size: Tuple[int, int]
+    bars: Tuple[Tuple[int, int, int, int], ...]
+    texts: Tuple[Tuple[float, float, str], ...]
+    font_size: int
+
+
+@functools.lru_cache(maxsize=8)
+def _barcode_font(size: int) -> ImageFont.FreeTypeFont:
+    """条形码文字字体（按字号缓存）"""
+    return ImageFont.truetype(BARCODE_FONT_PATH, size)
+
+
+def barcode_geometry(
+    pattern: str,
+    text: str,
+    module_width: float,
+    module_height: float,
+    quiet_zone: float
+) -> BarcodeGeometry:
+    """
+    根据模块图案（'1' 条、'0' 空、'G' 护卫条）计算几何（连续相同的模块合并为一个条）
+    尺寸、条的位置与文字位置的计算方式与 python-barcode 的 BaseWriter/ImageWriter 相同
+    """
+    lines = text.splitlines()
+    width = 2 * quiet_zone + len(pattern) * module_width
+    height = BARCODE_MARGIN * 2 + module_height
+    if text:
+        height += _pt2mm(BARCODE_FONT_SIZE) / 2 * len(lines) + BARCODE_TEXT_DISTANCE
+        height += BARCODE_TEXT_LINE_DISTANCE * (len(lines) - 1)
+    
+    # 按连续相同的模块合并为条/空
+    bars = []
+    guard_starts: List[float] = []
+    guard_ends: List[float] = []
+    was_guard = False
+    height_factor = 1.0
+    xpos = quiet_zone
+    ypos = BARCODE_MARGIN
+    for char, run in itertools.groupby(pattern):
+        run_width = module_width * len(list(run))
+        height_factor = 1.0 if char == '1' else BARCODE_GUARD_HEIGHT_FACTOR
+        if char in '1G':
+            if was_guard and char == '1':
+                guard_ends.append(xpos)
+                was_guard = False
+            elif not was_guard and char == 'G':
+                guard_starts.append(xpos)
+                was_guard = True
+            bars.append((xpos, ypos, run_width, module_height * height_factor))
+        xpos += run_width
+    if pattern and height_factor != 1:
+        guard_ends.append(xpos)
+    
+    # 文字位置
+    texts = []
+    if text:
+        ypos += module_height
+        if not guard_starts:
+            ypos += BARCODE_TEXT_DISTANCE
+            blocks = [(quiet_zone + (xpos - quiet_zone) / 2.0, text)]
+        else:
+            # 护卫条之间分块书写
+            positions = [quiet_zone - 4 * module_width]
+            positions += [e + (s - e) / 2 for s, e in zip(guard_starts[1:], guard_ends)]
+            positions.append(guard_ends[-1] + 4 * module_width)
+            ypos += _pt2mm(BARCODE_FONT_SIZE)
+            blocks = list(zip(positions, text.split(" ")))
+        for block_x, block_text in blocks:
+            line_y = ypos
+            for line in block_text.split("\n"):
+                texts.append((block_x, line_y, line))
+                line_y += _pt2mm(BARCODE_FONT_SIZE) / 2 + BARCODE_TEXT_LINE_DISTANCE
+    
+    return BarcodeGeometry(width=width, height=height, bars=tuple(bars), texts=tuple(texts))
+
+
+@functools.lru_cache(maxsize=1024)
+def barcode_layout(
+    pattern: str,
+    text: str,
+    module_width: float,
+    module_height: float,
+    quiet_zone: float
+) -> BarcodeLayout:
+    """条形码几何换算为像素版面（取整方式与 ImageWriter 相同）"""
+    geometry = barcode_geometry(pattern, text, module_width, module_height, quiet_zone)
+    return BarcodeLayout(
+        size=(int(_mm2px(geometry.width)), int(_mm2px(geometry.height))),
+        bars=tuple(
+            (int(_mm2px(x)), int(_mm2px(y)), int(_mm2px(x + w) - 1), int(_mm2px(y + h)))
+            for x, y, w, h in geometry.bars
+        ),
+        texts=tuple((_mm2px(x), _mm2px(y), line) for x, y, line in geometry.texts),
+        font_size=int(_mm2px(_pt2mm(BARCODE_FONT_SIZE)))
+    )
+
+
+def build_barcode_pattern(config: CodeGeneratorConfig) -> Tuple[str, str]:
+    """计算条形码模块图案与下方文字（不绘制）"""
+    bc = barcode.get_barcode_class(_barcode_format(config))(config.content)
+    code_list = bc.build()
+    if len(code_list) != 1:
+        raise ValueError("条形码图案必须只有一行")
+    text = bc.get_fullcode() if config.barcode_write_text else ""
+    return code_list[0], text
+
+
+def render_barcode_raster(config: CodeGeneratorConfig) -> Image.Image:
+    """
+    直接绘制原始条形码图片（灰度图，未调整尺寸）
+    条按一行像素生成后整体拉伸到条高，不经过 ImageWriter 的 PNG 编码/解码，字体只加载一次；
+    转为 RGBA 后与 ImageWriter 输出逐像素一致
+    """
+    pattern, text = build_barcode_pattern(config)
+    layout = barcode_layout(
+        pattern, text,
+        float(config.barcode_width), float(config.barcode_height), BARCODE_QUIET_ZONE
+    )
+    width, height = layout.size
+    img = Image.new('L', layout.size, 255)
+    
+    # 相同高度的条合并为一行像素，再拉伸到条高
+    rows: Dict[Tuple[int, int], bytearray] = {}
+    for x0, y0, x1, y1 in layout.bars:
+        row = rows.setdefault((y0, y1), bytearray(b'\xff' * width))
+        x0, x1 = max(0, x0), min(width - 1, x1)
+        if x1 >= x0:
+            row[x0:x1 + 1] = bytes(x1 - x0 + 1)
+    for (y0, y1), row in rows.items():
+        box = (0, max(0, y0), width, min(height, y1 + 1))
+        if box[3] <= box[1]:
+            continue
+        stripe = Image.frombytes('L', (width, 1), bytes(row)).resize(
+            (width, box[3] - box[1]), Image.Resampling.NEAREST
+        )
+        if len(rows) > 1:
+            stripe = ImageChops.darker(img.crop(box), stripe)
+        img.paste(stripe, box)
+    
+    if layout.texts and layout.font_size > 0:
+        draw = ImageDraw.Draw(img)
+        font = _barcode_font(layout.font_size)
+        for x, y, line in layout.texts:
+            draw.text((x, y), line, font=font, fill=0, anchor="md")
+    return img
+
+
+def resize_code(img: Image.Image, config: CodeGeneratorConfig) -> Image.Image:
+    """按输出宽高调整尺寸（只指定一边时保持比例）"""
     if config.output_width and config.output_height:
         img = img.resize((config.output_width, config.output_height), Image.Resampling.LANCZOS)
     elif config.output_width:
@@ -126,128 +503,203 @@ def generate_qrcode(config: CodeGeneratorConfig) -> Image.Image:
     return img
 
 
+def generate_qrcode(config: CodeGeneratorConfig) -> Image.Image:
+    """生成二维码（RGBA）"""
+    return _build_qr_image(config, None, _disabled_cache).convert('RGBA')
+
+
 def generate_barcode(config: CodeGeneratorConfig) -> Image.Image:
-    """生成条形码"""
-    barcode_format = config.barcode_format
-    if barcode_format not in BARCODE_TYPES:
-        barcode_format = 'code128'
-    
-    barcode_class = barcode.get_barcode_class(barcode_format)
-    
-    writer = ImageWriter()
-    # 设置条形码参数
-    writer_options = {
-        'module_width': config.barcode_width,
-        'module_height': config.barcode_height,
-        'write_text': config.barcode_write_text,
-        'quiet_zone': 6.5,
-    }
+    """生成条形码（RGBA）"""
+    return resize_code(render_barcode_raster(config).convert('RGBA'), config)
+
+
+def build_code_image(
+    config: CodeGeneratorConfig,
+    stats: Optional[RenderStats] = None,
+    cache: Optional[RenderCache] = None
+) -> Image.Image:
+    """生成调整尺寸后的码图，逐阶段查询缓存（返回的图片可能被共享，不得原地修改）"""
+    cache = cache or render_cache
+    resized_key = _resized_key(config)
+    img = cache.get("resized", resized_key, stats)
+    if img is not None:
+        return img
     
-    # 创建条形码
-    bc = barcode_class(config.content, writer=writer)
+    if config.code_type == 'qrcode':
+        img = _build_qr_image(config, stats, cache)
+    else:
+        raster_key = _raster_key(config)
+        raster = cache.get("raster", raster_key, stats)
+        if raster is None:
+            raster = render_barcode_raster(config)
+            cache.set("raster", raster_key, raster, image_nbytes(raster))
+        img = resize_code(raster, config)
     
-    # 生成图像到内存
-    buffer = io.BytesIO()
-    bc.write(buffer, options=writer_options)
-    buffer.seek(0)
+    cache.set("resized", resized_key, img, image_nbytes(img))
+    return img
+
+
+def get_qr_matrix(
+    config: CodeGeneratorConfig,
+    stats: Optional[RenderStats],
+    cache: RenderCache
+) -> QRMatrix:
+    """获取二维码模块矩阵（查询 matrix 阶段缓存）"""
+    matrix_key = _matrix_key(config)
+    matrix = cache.get("matrix", matrix_key, stats)
+    if matrix is None:
+        matrix = build_qr_matrix(config)
+        cache.set("matrix", matrix_key, matrix, matrix.size * matrix.size)
+    return matrix
+
+
+def _build_qr_image(
+    config: CodeGeneratorConfig,
+    stats: Optional[RenderStats],
+    cache: RenderCache
+) -> Image.Image:
+    """二维码：矩阵 -> 原始码图（fit 模式下直接按目标尺寸选择模块大小）-> 调整尺寸"""
+    matrix = get_qr_matrix(config, stats, cache)
     
-    img = Image.open(buffer).convert('RGBA')
+    target = None
+    box_size = config.qr_box_size
+    if config.qr_resize_mode == 'fit':
+        box_size, target = _qr_fit(matrix, config)
     
-    # 调整尺寸
-    if config.output_width and config.output_height:
-        img = img.resize((config.output_width, config.output_height), Image.Resampling.LANCZOS)
-    elif config.output_width:
-        ratio = config.output_width / img.width
-        new_height = int(img.height * ratio)
-        img = img.resize((config.output_width, new_height), Image.Resampling.LANCZOS)
-    elif config.output_height:
-        ratio = config.output_height / img.height
-        new_width = int(img.width * ratio)
-        img = img.resize((new_width, config.output_height), Image.Resampling.LANCZOS)
+    raster_key = _raster_key(config, box_size)
+    raster = cache.get("raster", raster_key, stats)
+    if raster is None:
+        raster = render_qr_raster(matrix, config, box_size)
+        cache.set("raster", raster_key, raster, image_nbytes(raster))
     
-    return img
+    if config.qr_resize_mode == 'fit':
+        return _qr_fit_image(raster, target) if target else raster
+    # stretch：按旧方式平滑缩放（先转为 RGBA）
+    if config.output_width or config.output_height:
+        return resize_code(raster.convert('RGBA'), config)
+    return raster
 
 
 def merge_with_template(code_img: Image.Image, config: CodeGeneratorConfig) -> Image.Image:
-    """将生成的码合成到模板图片上"""
+    """将生成的码合成到模板图片上（模板只解码一次，合成在副本上进行）"""
     # 获取模板图片
-    if config.template_base64:
-        template_data = base64.b64decode(config.template_base64)
-        template_img = Image.open(io.BytesIO(template_data)).convert('RGBA')
+    if config.template_id:
+        template_img = template_registry.get_image(config.template_id)
+    elif config.template_base64:
+        template_id = template_registry.register_base64(config.template_base64)
+        template_img = template_registry.get_image(template_id)
     elif config.template_path and os.path.exists(config.template_path):
-        template_img = Image.open(config.template_path).convert('RGBA')
+        template_img = template_registry.get_path_image(config.template_path)
     else:
         raise ValueError("模板图片未提供或不存在")
     
-    # 在指定位置粘贴码图片
+    # 在指定位置粘贴码图片（1 位图/调色板图在合成时才转为 RGBA）
+    if code_img.mode != 'RGBA':
+        code_img = code_img.convert('RGBA')
+    template_img = template_img.copy()
     template_img.paste(code_img, (config.position_x, config.position_y), code_img)
     
     return template_img
 
 
-def save_image(img: Image.Image, config: CodeGeneratorConfig) -> Dict[str, Any]:
-    """保存图片并返回结果"""
+def build_final_image(
+    config: CodeGeneratorConfig,
+    stats: Optional[RenderStats] = None,
+    cache: Optional[RenderCache] = None
+) -> Image.Image:
+    """生成最终图片（码图 + 可选的模板合成）"""
+    code_img = build_code_image(config, stats, cache)
+    if config.use_template:
+        return merge_with_template(code_img, config)
+    return code_img
+
+
+def encode_image(img: Image.Image, config: CodeGeneratorConfig) -> bytes:
+    """按输出格式与编码配置编码图片（返回内容与输出文件共用）"""
+    return encode(img, config.output_format, config.output_quality, config.output_profile)
+
+
+def write_image_file(data: bytes, config: CodeGeneratorConfig) -> Dict[str, Any]:
+    """
+    把已编码的图片字节写入 output_path，返回保存路径和文件大小
+    文件内容与返回给调用方的图片相同，不再单独编码一次
+    """
+    # 确保目录存在
+    output_dir = os.path.dirname(config.output_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+    
+    with open(config.output_path, 'wb') as f:
+        f.write(data)
+    return {
+        "saved_path": config.output_path,
+        "file_size": len(data)
+    }
+
+
+def render_code(
+    config: CodeGeneratorConfig,
+    stats: Optional[RenderStats] = None,
+    cache: Optional[RenderCache] = None
+) -> EncodedImage:
+    """渲染并编码条码/二维码，逐阶段查询缓存"""
+    cache = cache or render_cache
+    encoded_key = encoded_cache_key(config)
+    encoded = cache.get("encoded", encoded_key, stats)
+    if encoded is None:
+        if config.output_format in VECTOR_OUTPUT_FORMATS:
+            # 矢量格式（避免循环导入，延迟导入）
+            from app.tools import code_vector
+            encoded = code_vector.render_vector(config, stats, cache)
+        else:
+            final_img = build_final_image(config, stats, cache)
+            encoded = EncodedImage(encode_image(final_img, config), final_img.width, final_img.height)
+        cache.set("encoded", encoded_key, encoded, len(encoded.data))
+    return encoded
+
+
+def code_result(
+    config: CodeGeneratorConfig,
+    encoded: EncodedImage,
+    file_info: Optional[Dict[str, Any]] = None,
+    binary: bool = False
+) -> Dict[str, Any]:
+    """组装生成结果（binary 为 True 时以 data 字段返回原始字节，不生成 base64）"""
     result = {
-        "width": img.width,
-        "height": img.height,
+        "width": encoded.width,
+        "height": encoded.height,
         "format": config.output_format,
         "quality": config.output_quality,
     }
+    if file_info:
+        result.update(file_info)
     
-    # 转换为适合保存的模式
-    if config.output_format == 'JPEG':
-        img = img.convert('RGB')
-    
-    # 保存到文件
-    if config.output_path:
-        # 确保目录存在
-        output_dir = os.path.dirname(config.output_path)
-        if output_dir and not os.path.exists(output_dir):
-            os.makedirs(output_dir, exist_ok=True)
-        
-        save_kwargs = {}
-        if config.output_format in ['JPEG', 'WEBP']:
-            save_kwargs['quality'] = config.output_quality
-        if config.output_format == 'PNG':
-            # PNG使用压缩级别 (0-9)
-            save_kwargs['compress_level'] = min(9, max(0, (100 - config.output_quality) // 10))
-        
-        img.save(config.output_path, format=config.output_format, **save_kwargs)
-        result["saved_path"] = config.output_path
-        result["file_size"] = os.path.getsize(config.output_path)
-    
-    # 生成base64用于预览
-    buffer = io.BytesIO()
-    save_kwargs = {}
-    if config.output_format in ['JPEG', 'WEBP']:
-        save_kwargs['quality'] = config.output_quality
-    img.save(buffer, format=config.output_format, **save_kwargs)
-    buffer.seek(0)
-    result["base64"] = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    
+    if binary:
+        result["data"] = encoded.data
+    else:
+        # 生成base64用于预览
+        result["base64"] = base64.b64encode(encoded.data).decode('utf-8')
+    result["success"] = True
+    result["content"] = config.content
     return result
 
 
-def generate_single_code(config: CodeGeneratorConfig) -> Dict[str, Any]:
+def generate_single_code(
+    config: CodeGeneratorConfig,
+    stats: Optional[RenderStats] = None,
+    cache: Optional[RenderCache] = None,
+    binary: bool = False
+) -> Dict[str, Any]:
     """生成单个条形码/二维码（同步）"""
     try:
-        # 生成码
-        if config.code_type == 'qrcode':
-            code_img = generate_qrcode(config)
-        else:
-            code_img = generate_barcode(config)
+        encoded = render_code(config, stats, cache)
         
-        # 如果需要合成模板
-        if config.use_template:
-            final_img = merge_with_template(code_img, config)
-        else:
-            final_img = code_img
+        # 保存到文件（直接写入已编码的数据）
+        file_info = None
+        if config.output_path:
+            file_info = write_image_file(encoded.data, config)
         
-        # 保存并返回结果
-        result = save_image(final_img, config)
-        result["success"] = True
-        result["content"] = config.content
-        return result
+        return code_result(config, encoded, file_info, binary)
         
     except Exception as e:
         return {
@@ -257,38 +709,83 @@ def generate_single_code(config: CodeGeneratorConfig) -> Dict[str, Any]:
         }
 
 
-async def generate_code(params: Dict[str, Any]) -> Dict[str, Any]:
+async def generate_code(
+    params: Dict[str, Any],
+    stats: Optional[RenderStats] = None,
+    cache: Optional[RenderCache] = None,
+    binary: bool = False
+) -> Dict[str, Any]:
     """生成条形码/二维码（异步接口）"""
     config = CodeGeneratorConfig(**params)
     
-    # 在线程池中执行
-    loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(_executor, generate_single_code, config)
+    if settings.CODE_GENERATOR_BACKEND == 'process':
+        # 多进程后端（避免循环导入，延迟导入）
+        from app.tools import code_render_pool
+        with span("execute"):
+            return await code_render_pool.render(params, config, stats, cache, binary)
     
-    return result
+    # 在线程池中执行（记录排队与执行耗时）
+    return await timing.run_in_executor(get_executor(), generate_single_code, config, stats, cache, binary)
+
+
+def _hashable(value: Any) -> Any:
+    """将配置值转换为可哈希的形式"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+def config_signature(config_dict: Dict[str, Any]) -> tuple:
+    """配置签名：完全相同的配置产生完全相同的输出"""
+    return tuple(sorted((k, _hashable(v)) for k, v in config_dict.items()))
 
 
 async def generate_codes_batch(params: Dict[str, Any]) -> Dict[str, Any]:
-    """批量生成条形码/二维码（支持并发）"""
+    """批量生成条形码/二维码（支持并发，重复项只生成一次）"""
     items = params.get('items', [])
     common_config = params.get('common_config', {})
     max_concurrent = params.get('max_concurrent', 10)
+    cache = render_cache if params.get('use_cache', True) else _disabled_cache
     
     if not items:
         return {"success": False, "error": "没有提供要生成的内容"}
     
+    # 合并通用配置和单项配置，并在调度前合并重复项
+    unique_configs: List[Dict[str, Any]] = []
+    positions: Dict[tuple, int] = {}
+    item_slots: List[int] = []
+    for item in items:
+        config_dict = {**common_config, **item}
+        signature = config_signature(config_dict)
+        slot = positions.get(signature)
+        if slot is None:
+            slot = positions[signature] = len(unique_configs)
+            unique_configs.append(config_dict)
+        item_slots.append(slot)
+    
     # 限制并发数
     semaphore = asyncio.Semaphore(max_concurrent)
+    stats = RenderStats()
     
-    async def process_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    async def process_item(config_dict: Dict[str, Any]) -> Dict[str, Any]:
         async with semaphore:
-            # 合并通用配置和单项配置
-            config_dict = {**common_config, **item}
-            return await generate_code(config_dict)
+            return await generate_code(config_dict, stats=stats, cache=cache)
     
     # 并发处理
-    tasks = [process_item(item) for item in items]
-    results = await asyncio.gather(*tasks)
+    tasks = [process_item(config_dict) for config_dict in unique_configs]
+    unique_results = await asyncio.gather(*tasks)
+    
+    # 按原顺序展开结果（重复项使用结果副本）
+    results = []
+    emitted = set()
+    for slot in item_slots:
+        if slot in emitted:
+            results.append(dict(unique_results[slot]))
+        else:
+            emitted.add(slot)
+            results.append(unique_results[slot])
     
     # 统计结果
     success_count = sum(1 for r in results if r.get('success'))
@@ -299,7 +796,153 @@ async def generate_codes_batch(params: Dict[str, Any]) -> Dict[str, Any]:
         "total": len(results),
         "success_count": success_count,
         "fail_count": fail_count,
-        "results": results
+        "results": results,
+        "dedup": {
+            "unique": len(unique_configs),
+            "duplicates": len(results) - len(unique_configs)
+        },
+        "cache_stats": stats.to_dict()
+    }
+
+
+class BatchProgress:
+    """流式批量生成的进度与汇总"""
+    
+    def __init__(self):
+        self.total = 0
+        self.success_count = 0
+        self.fail_count = 0
+        self.duplicates = 0
+        self.stats = RenderStats()
+    
+    def record(self, result: Dict[str, Any]) -> None:
+        self.total += 1
+        if result.get('success'):
+            self.success_count += 1
+        else:
+            self.fail_count += 1
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "success_count": self.success_count,
+            "fail_count": self.fail_count,
+            "dedup": {
+                "unique": self.total - self.duplicates,
+                "duplicates": self.duplicates
+            },
+            "cache_stats": self.stats.to_dict()
+        }
+
+
+async def _aiter_items(items: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]]):
+    """统一同步/异步的条目来源"""
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def _generate_item(
+    config_dict: Dict[str, Any],
+    stats: RenderStats,
+    cache: RenderCache,
+    binary: bool
+) -> Dict[str, Any]:
+    """生成单项，配置错误也作为该项的失败结果返回"""
+    try:
+        return await generate_code(config_dict, stats=stats, cache=cache, binary=binary)
+    except Exception as e:
+        return {"success": False, "content": config_dict.get('content'), "error": str(e)}
+
+
+async def iter_codes_batch(
+    items: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+    common_config: Optional[Dict[str, Any]] = None,
+    max_concurrent: int = 10,
+    use_cache: bool = True,
+    binary: bool = False,
+    progress: Optional[BatchProgress] = None
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    流式批量生成：按完成顺序逐个产出 (序号, 结果)
+    条目按需读取，同时在途的任务不超过 max_concurrent，内存占用与批量大小无关；
+    与在途任务配置相同的条目直接复用其结果，之后再出现的重复项由渲染缓存命中；
+    条目来源可以产出异常对象表示该条目解析失败（见 code_batch_source）
+    """
+    common_config = common_config or {}
+    cache = render_cache if use_cache else _disabled_cache
+    progress = progress or BatchProgress()
+    max_concurrent = max(1, max_concurrent)
+    
+    pending: Dict[asyncio.Future, Tuple[tuple, List[int]]] = {}
+    inflight: Dict[tuple, asyncio.Future] = {}
+    
+    def finished(done: set) -> List[Tuple[int, Dict[str, Any]]]:
+        completed = []
+        for task in done:
+            signature, indexes = pending.pop(task)
+            inflight.pop(signature, None)
+            result = task.result()
+            for index in indexes:
+                item_result = {**result, "index": index}
+                progress.record(item_result)
+                completed.append((index, item_result))
+        completed.sort(key=lambda pair: pair[0])
+        return completed
+    
+    try:
+        index = 0
+        async for item in _aiter_items(items):
+            if isinstance(item, Exception):
+                # 来源解析失败的条目（如上传内容文件中的无效行）直接作为失败结果
+                item_result = {
+                    "success": False,
+                    "content": getattr(item, 'content', None),
+                    "error": str(item),
+                    "index": index
+                }
+                progress.record(item_result)
+                yield index, item_result
+                index += 1
+                continue
+            
+            config_dict = {**common_config, **item} if common_config else item
+            signature = config_signature(config_dict)
+            task = inflight.get(signature)
+            if task is not None:
+                pending[task][1].append(index)
+                progress.duplicates += 1
+                index += 1
+                continue
+            
+            while len(pending) >= max_concurrent:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for pair in finished(done):
+                    yield pair
+            
+            task = asyncio.ensure_future(_generate_item(config_dict, progress.stats, cache, binary))
+            pending[task] = (signature, [index])
+            inflight[signature] = task
+            index += 1
+        
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for pair in finished(done):
+                yield pair
+    finally:
+        # 调用方提前结束（如客户端断开）时取消剩余任务
+        for task in pending:
+            task.cancel()
+
+
+def get_render_cache_stats() -> Dict[str, Any]:
+    """获取渲染缓存与模板缓存统计"""
+    return {
+        "render": render_cache.get_stats(),
+        "templates": template_registry.get_stats()
     }
 
 
@@ -308,5 +951,20 @@ def get_supported_formats() -> Dict[str, List[str]]:
     return {
         "barcode_formats": BARCODE_TYPES,
         "qrcode_error_correct": list(ERROR_CORRECT_MAP.keys()),
-        "output_formats": ["PNG", "JPEG", "WEBP", "BMP", "GIF"]
+        "output_formats": list(OUTPUT_MEDIA_TYPES.keys()),
+        "output_profiles": list(ENCODING_PROFILES.keys())
     }
+
+
+def warm_up() -> None:
+    """
+    预热（服务启动后在后台调用）：创建线程池，导入批量/拼版/矢量输出模块，
+    各渲染一个二维码和条形码以初始化 Pillow 编码器与条形码字体（不写入渲染缓存）
+    """
+    from app.tools import code_batch_source, code_batch_stream, code_sheet, code_vector  # noqa: F401
+    get_executor()
+    for config in (
+        CodeGeneratorConfig(content="warm-up"),
+        CodeGeneratorConfig(content="warm-up", code_type="barcode"),
+    ):
+        render_code(config, None, _disabled_cache)
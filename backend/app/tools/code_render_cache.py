@@ -0,0 +1,94 @@
+"""
+条码分阶段渲染缓存
+按渲染流程分为四个阶段分别缓存，部分命中时复用已有的中间结果：
+    - matrix：二维码模块矩阵（内容 + 版本 + 纠错级别）
+    - raster：原始码图（矩阵/条码内容 + 绘制参数）
+    - resized：调整尺寸后的码图（原始码图 + 输出宽高）
+    - encoded：编码后的最终图片字节（码图 + 模板合成 + 输出格式/质量）
+缓存的图片对象在多个请求间共享，使用方不得原地修改
+"""
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# 渲染阶段
+RENDER_STAGES = ("matrix", "raster", "resized", "encoded")
+
+
+def image_nbytes(img: "Image.Image") -> int:
+    """估算图片占用的内存"""
+    return img.width * img.height * len(img.getbands())
+
+
+class RenderStats:
+    """单次请求（或批量任务）的各阶段缓存命中统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {stage: {"hits": 0, "misses": 0} for stage in RENDER_STAGES}
+
+    def record(self, stage: str, hit: bool) -> None:
+        with self._lock:
+            self.counts[stage]["hits" if hit else "misses"] += 1
+
+    def merge(self, counts: Dict[str, Dict[str, int]]) -> None:
+        """合并其他统计（如子进程返回的统计）"""
+        with self._lock:
+            for stage, values in counts.items():
+                for name, value in values.items():
+                    self.counts[stage][name] += value
+
+    def to_dict(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {stage: dict(values) for stage, values in self.counts.items()}
+
+
+class RenderCache:
+    """分阶段渲染缓存（每个阶段一个有界 LRU）"""
+
+    def __init__(
+        self,
+        max_items: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.enabled = settings.CODE_RENDER_CACHE_ENABLED if enabled is None else enabled
+        self._stages = {
+            stage: LRUCache(
+                max_items=max_items or settings.CODE_RENDER_CACHE_ITEMS,
+                max_bytes=max_bytes or settings.CODE_RENDER_CACHE_MAX_BYTES
+            )
+            for stage in RENDER_STAGES
+        }
+
+    def get(self, stage: str, key: Any, stats: Optional[RenderStats] = None) -> Any:
+        """读取阶段缓存，同时记录命中情况"""
+        value = self._stages[stage].get(key) if self.enabled else None
+        if stats is not None:
+            stats.record(stage, value is not None)
+        return value
+
+    def set(self, stage: str, key: Any, value: Any, size: int = 0) -> None:
+        """写入阶段缓存"""
+        if self.enabled:
+            self._stages[stage].set(key, value, size=size)
+
+    def clear(self) -> None:
+        """清空全部阶段"""
+        for cache in self._stages.values():
+            cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各阶段缓存统计"""
+        return {
+            "enabled": self.enabled,
+            "stages": {stage: cache.get_stats() for stage, cache in self._stages.items()}
+        }
+
+
+render_cache = RenderCache()
@@ -0,0 +1,210 @@
+"""
+条码多进程渲染后端
+qrcode 矩阵计算与 python-barcode 编码基本是纯 Python 代码，持有 GIL，
+线程池在多核机器上只能用满一个核心；多进程后端把渲染放到常驻工作进程中：
+    - 工作进程启动时预加载 PIL、qrcode、barcode 并渲染一次样例（加载字体与编码器）
+    - 大于 INLINE_RESULT_MAX 的渲染结果（图片字节）通过共享内存传回，不经过 pickle；
+      常见条码图片只有几 KB，直接随返回值传回（共享内存的创建/映射/删除在 1.5MB 以下比 pickle 更慢，
+      见 benchmarks/README.md）
+    - base64 模板在主进程注册后以模板ID传给工作进程，工作进程从模板目录按内容哈希读取
+    - 主进程先查询 encoded 阶段缓存，命中时不再派发
+每个工作进程有各自的渲染缓存，主进程只缓存最终编码结果
+"""
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.tools import code_generator
+from app.tools.code_generator import CodeGeneratorConfig, EncodedImage
+from app.tools.code_render_cache import RenderCache, RenderStats, render_cache
+from app.tools.code_templates import template_registry
+
+logger = logging.getLogger(__name__)
+
+# 小于该大小的结果直接随返回值传回（字节），实测在 1.5MB~2MB 之间两种方式耗时持平
+INLINE_RESULT_MAX = 2 * 1024 * 1024
+
+# 进程池创建后大小固定（默认工作进程数），运行期间不重建，只在异常或关闭服务时丢弃
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# 不使用缓存时的占位缓存（工作进程内）
+_disabled_cache = RenderCache(max_items=1, enabled=False)
+
+
+def default_workers() -> int:
+    """默认工作进程数（CPU 核心数）"""
+    return settings.CODE_GENERATOR_WORKERS or os.cpu_count() or 1
+
+
+def _init_worker() -> None:
+    """工作进程初始化：预加载依赖并渲染样例"""
+    from PIL import Image
+    Image.init()
+    code_generator.render_code(CodeGeneratorConfig(content="warmup"))
+    code_generator.render_code(CodeGeneratorConfig(content="warmup", code_type="barcode"))
+    render_cache.clear()
+
+
+def _export_bytes(data: bytes, inline_max: int = INLINE_RESULT_MAX) -> Tuple[str, Any]:
+    """
+    导出渲染结果：小结果直接返回，大结果写入共享内存并返回名称
+    工作进程与主进程共用主进程的资源跟踪器：这里创建时登记，主进程读取后 unlink 时注销，
+    主进程异常退出时由跟踪器回收未读取的共享内存
+    """
+    if len(data) < inline_max:
+        return ("inline", data)
+    shm = shared_memory.SharedMemory(create=True, size=len(data))
+    try:
+        shm.buf[:len(data)] = data
+    finally:
+        shm.close()
+    return ("shm", shm.name)
+
+
+def _import_bytes(payload: Tuple[str, Any], size: int) -> bytes:
+    """读取渲染结果并释放共享内存"""
+    kind, value = payload
+    if kind == "inline":
+        return value
+    shm = shared_memory.SharedMemory(name=value)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _discard_result(future: Future) -> None:
+    """调用方已取消时释放工作进程返回的共享内存"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    meta = future.result()
+    if meta.get("payload"):
+        try:
+            _import_bytes(meta["payload"], 0)
+        except FileNotFoundError:
+            pass
+
+
+def render_in_worker(params: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+    """在工作进程中渲染并编码，按需写入输出文件"""
+    stats = RenderStats()
+    cache = None if use_cache else _disabled_cache
+    try:
+        config = CodeGeneratorConfig(**params)
+        encoded = code_generator.render_code(config, stats, cache)
+        file_info = {}
+        if config.output_path:
+            file_info = code_generator.write_image_file(encoded.data, config)
+        return {
+            "success": True,
+            "width": encoded.width,
+            "height": encoded.height,
+            "size": len(encoded.data),
+            "payload": _export_bytes(encoded.data),
+            "file": file_info,
+            "stats": stats.to_dict()
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e), "stats": stats.to_dict()}
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """获取（必要时创建）进程池"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # 先在主进程启动资源跟踪器，工作进程继承同一个跟踪器
+                resource_tracker.ensure_running()
+                _pool = ProcessPoolExecutor(max_workers=default_workers(), initializer=_init_worker)
+    return _pool
+
+
+def warm_up() -> int:
+    """预先启动全部工作进程（每个进程完成初始化后返回），返回进程数"""
+    pool = get_pool()
+    futures = [pool.submit(os.getpid) for _ in range(default_workers() * 2)]
+    pids = {future.result() for future in futures}
+    logger.info(f"条码渲染进程池已就绪: {len(pids)} 个工作进程")
+    return len(pids)
+
+
+def shutdown(wait: bool = True) -> None:
+    """关闭进程池"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait, cancel_futures=True)
+            _pool = None
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """丢弃已损坏的进程池（其他请求已经重建的新进程池不受影响）"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _worker_params(params: Dict[str, Any], config: CodeGeneratorConfig) -> Dict[str, Any]:
+    """派发给工作进程的参数：base64 模板替换为模板ID，避免每项都传输整张模板"""
+    if config.use_template and config.template_base64 and not config.template_id:
+        params = dict(params)
+        params["template_id"] = template_registry.register_base64(config.template_base64)
+        params["template_base64"] = None
+    return params
+
+
+async def render(
+    params: Dict[str, Any],
+    config: CodeGeneratorConfig,
+    stats: Optional[RenderStats] = None,
+    cache: Optional[RenderCache] = None,
+    binary: bool = False
+) -> Dict[str, Any]:
+    """使用进程池生成单个条码，返回与 generate_single_code 相同结构的结果"""
+    cache = cache or render_cache
+    try:
+        encoded_key = None
+        if not config.output_path:
+            encoded_key = code_generator.encoded_cache_key(config)
+            encoded = cache.get("encoded", encoded_key)
+            if encoded is not None:
+                if stats is not None:
+                    stats.record("encoded", True)
+                return code_generator.code_result(config, encoded, binary=binary)
+        worker_params = _worker_params(params, config)
+    except Exception as e:
+        return {"success": False, "content": config.content, "error": str(e)}
+
+    pool = get_pool()
+    future = pool.submit(render_in_worker, worker_params, cache.enabled)
+    try:
+        meta = await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(_discard_result)
+        raise
+    except BrokenProcessPool:
+        # 工作进程异常退出，丢弃进程池，下次调用时重建
+        logger.error("条码渲染进程池异常，已重置")
+        _discard_pool(pool)
+        return {"success": False, "content": config.content, "error": "渲染进程异常退出"}
+
+    if stats is not None:
+        stats.merge(meta["stats"])
+    if not meta["success"]:
+        return {"success": False, "content": config.content, "error": meta["error"]}
+
+    encoded = EncodedImage(_import_bytes(meta["payload"], meta["size"]), meta["width"], meta["height"])
+    if encoded_key is not None:
+        cache.set("encoded", encoded_key, encoded, len(encoded.data))
+    return code_generator.code_result(config, encoded, meta["file"], binary)
@@ -0,0 +1,406 @@
+"""
+条码拼版（标签打印）
+把一批条码直接绘制到整页画布上，按页输出 PNG（ZIP 归档）或多页 PDF：
+    - 版面：纸张尺寸、行列数、页边距、单元格间距与内边距（毫米），按 dpi 换算为像素
+    - 单元格模板只解码、缩放一次，预先铺满一张页面底图，每页从底图复制
+    - 条码在线程池中生成原始码图后直接粘贴到对应单元格，不再逐个编码与传输
+    - 条目按需读取，同时在途的任务不超过 max_concurrent；一页的单元格全部完成后立即编码输出，
+      内存中只保留正在填充的页面
+条目第 i 个放在第 i // 每页数量 页的第 i % 每页数量 个单元格（先行后列）；失败的条目单元格留空
+"""
+import asyncio
+import time
+import zipfile
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+from PIL import Image
+
+from app.core import jsonlib
+from app.core.config import settings
+from app.tools import code_generator
+from app.tools.code_batch_stream import _ChunkWriter
+from app.tools.code_encoding import encode, resolve_profile
+from app.tools.code_generator import BatchProgress, CodeGeneratorConfig
+from app.tools.code_render_cache import RenderCache, RenderStats, render_cache
+from app.tools.code_templates import template_registry
+from app.tools.code_vector import PDFWriter
+
+# 常用纸张尺寸（毫米，纵向）
+PAGE_SIZES = {
+    "A3": (297.0, 420.0),
+    "A4": (210.0, 297.0),
+    "A5": (148.0, 210.0),
+    "A6": (105.0, 148.0),
+    "LETTER": (215.9, 279.4),
+    "LEGAL": (215.9, 355.6),
+}
+
+# 拼版输出格式
+SHEET_FORMATS = ["PNG", "PDF"]
+
+SHEET_MEDIA_TYPES = {
+    "PNG": "application/zip",
+    "PDF": "application/pdf",
+}
+
+# 单页像素上限（避免误配置的 dpi 创建超大画布）
+MAX_PAGE_PIXELS = 100_000_000
+
+
+class SheetSpec:
+    """拼版配置（长度单位均为毫米）"""
+
+    def __init__(
+        self,
+        page_size: str = "A4",
+        page_width: Optional[float] = None,
+        page_height: Optional[float] = None,
+        landscape: bool = False,
+        dpi: int = 300,
+        columns: int = 3,
+        rows: int = 8,
+        margin_top: float = 10.0,
+        margin_right: float = 10.0,
+        margin_bottom: float = 10.0,
+        margin_left: float = 10.0,
+        gap_x: float = 0.0,
+        gap_y: float = 0.0,
+        padding: float = 2.0,
+        template_id: Optional[str] = None,
+        code_x: Optional[float] = None,
+        code_y: Optional[float] = None,
+        code_width: Optional[float] = None,
+        code_height: Optional[float] = None,
+        background_color: str = "white",
+        output_format: str = "PNG",
+        output_profile: Optional[str] = None,
+    ):
+        if page_width and page_height:
+            width, height = float(page_width), float(page_height)
+        else:
+            size = PAGE_SIZES.get(str(page_size).upper())
+            if size is None:
+                raise ValueError(f"不支持的纸张尺寸: {page_size}，可选: {', '.join(PAGE_SIZES)}")
+            width, height = size
+        if landscape:
+            width, height = height, width
+        self.page_width = width
+        self.page_height = height
+        self.dpi = int(dpi)
+        self.columns = int(columns)
+        self.rows = int(rows)
+        self.margin_top = float(margin_top)
+        self.margin_right = float(margin_right)
+        self.margin_bottom = float(margin_bottom)
+        self.margin_left = float(margin_left)
+        self.gap_x = float(gap_x)
+        self.gap_y = float(gap_y)
+        self.padding = float(padding)
+        self.template_id = template_id
+        self.code_x = code_x
+        self.code_y = code_y
+        self.code_width = code_width
+        self.code_height = code_height
+        self.background_color = background_color
+        self.output_format = str(output_format).upper()
+        self.output_profile = resolve_profile(output_profile or settings.CODE_OUTPUT_PROFILE)
+
+        if self.output_format not in SHEET_FORMATS:
+            raise ValueError(f"不支持的拼版输出格式: {output_format}，可选: {', '.join(SHEET_FORMATS)}")
+        if self.dpi <= 0 or self.columns <= 0 or self.rows <= 0:
+            raise ValueError("dpi、行数与列数必须为正数")
+        if self.cell_width <= 0 or self.cell_height <= 0:
+            raise ValueError("页边距与间距过大，单元格尺寸不足")
+        if self.px(self.page_width) * self.px(self.page_height) > MAX_PAGE_PIXELS:
+            raise ValueError(f"页面像素过多（上限 {MAX_PAGE_PIXELS}），请降低 dpi")
+        if self.template_id:
+            # 提前确认模板存在（需要解码模板，在事件循环中应放到线程池执行）
+            template_registry.get_image(self.template_id)
+
+    @property
+    def cell_width(self) -> float:
+        usable = self.page_width - self.margin_left - self.margin_right
+        return (usable - self.gap_x * (self.columns - 1)) / self.columns
+
+    @property
+    def cell_height(self) -> float:
+        usable = self.page_height - self.margin_top - self.margin_bottom
+        return (usable - self.gap_y * (self.rows - 1)) / self.rows
+
+    @property
+    def per_page(self) -> int:
+        return self.columns * self.rows
+
+    def px(self, mm: float) -> int:
+        """毫米换算为像素"""
+        return int(round(mm * self.dpi / 25.4))
+
+
+class SheetLayout:
+    """拼版版面（像素）：页面底图、单元格位置与码图区域"""
+
+    def __init__(self, spec: SheetSpec, mode: str):
+        self.spec = spec
+        self.mode = mode
+        self.page_size = (spec.px(spec.page_width), spec.px(spec.page_height))
+        self.cell_size = (spec.px(spec.cell_width), spec.px(spec.cell_height))
+        self.cells = [
+            (
+                spec.px(spec.margin_left + column * (spec.cell_width + spec.gap_x)),
+                spec.px(spec.margin_top + row * (spec.cell_height + spec.gap_y)),
+            )
+            for row in range(spec.rows)
+            for column in range(spec.columns)
+        ]
+        # 码图区域（相对单元格）：未指定时为去掉内边距后的区域
+        if spec.code_width and spec.code_height:
+            width, height = spec.px(spec.code_width), spec.px(spec.code_height)
+        else:
+            width = self.cell_size[0] - 2 * spec.px(spec.padding)
+            height = self.cell_size[1] - 2 * spec.px(spec.padding)
+        x = spec.px(spec.code_x) if spec.code_x is not None else (self.cell_size[0] - width) // 2
+        y = spec.px(spec.code_y) if spec.code_y is not None else (self.cell_size[1] - height) // 2
+        self.code_box = (x, y, max(1, width), max(1, height))
+        self.background = self._build_background()
+
+    def _build_background(self) -> Image.Image:
+        """页面底图：背景色 + 每个单元格的模板（模板只缩放一次）"""
+        page = Image.new(self.mode, self.page_size, self.spec.background_color)
+        if self.spec.template_id:
+            template = template_registry.get_image(self.spec.template_id)
+            template = template.resize(self.cell_size, Image.Resampling.LANCZOS)
+            mask = template if template.mode == 'RGBA' else None
+            template = template.convert(self.mode)
+            for cell in self.cells:
+                page.paste(template, cell, mask)
+        return page
+
+    def new_page(self) -> Image.Image:
+        return self.background.copy()
+
+    def code_config(self, config_dict: Dict[str, Any]) -> CodeGeneratorConfig:
+        """单元格内的码配置：输出尺寸取码图区域，不做模板合成"""
+        config_dict = dict(config_dict)
+        config_dict["use_template"] = False
+        box_width, box_height = self.code_box[2], self.code_box[3]
+        if config_dict.get("code_type", "qrcode") == "qrcode":
+            # 二维码为区域内最大的正方形（背景不覆盖区域外的模板）
+            config_dict["output_width"] = config_dict["output_height"] = min(box_width, box_height)
+            config_dict["qr_resize_mode"] = "fit"
+        else:
+            # 条形码只限定宽度（保持比例，过高时粘贴前再按高度缩小）
+            config_dict["output_width"] = box_width
+            config_dict["output_height"] = None
+        config_dict.pop("output_path", None)
+        return CodeGeneratorConfig(**config_dict)
+
+    def paste(self, page: Image.Image, cell_index: int, img: Image.Image) -> None:
+        """把码图粘贴到单元格的码图区域中央"""
+        box_x, box_y, box_width, box_height = self.code_box
+        if img.width > box_width or img.height > box_height:
+            ratio = min(box_width / img.width, box_height / img.height)
+            size = (max(1, int(img.width * ratio)), max(1, int(img.height * ratio)))
+            img = img.resize(size, Image.Resampling.LANCZOS)
+        mask = None
+        if img.mode == 'RGBA' or (img.mode == 'P' and 'transparency' in img.info):
+            img = img.convert('RGBA')
+            mask = img
+        if mask is None and img.mode != self.mode:
+            img = img.convert(self.mode)
+        cell_x, cell_y = self.cells[cell_index]
+        position = (
+            cell_x + box_x + (box_width - img.width) // 2,
+            cell_y + box_y + (box_height - img.height) // 2,
+        )
+        page.paste(img, position, mask)
+
+
+# 灰度画布能无损表示的码图颜色配置（其他颜色需要 RGB 画布）
+_GRAY_COLORS = (("qr_fill_color", "black"), ("qr_back_color", "white"))
+
+
+def _sheet_mode(
+    spec: SheetSpec,
+    common_config: Dict[str, Any],
+    items: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]]
+) -> str:
+    """
+    画布模式：有模板、彩色背景或任一条目（合并公共配置后）为彩色配置时为 RGB，否则为灰度
+    条目按需读取（非列表）时无法预先检查，使用 RGB
+    """
+    if spec.template_id or str(spec.background_color).lower() not in ("white", "#fff", "#ffffff"):
+        return 'RGB'
+    if not isinstance(items, (list, tuple)):
+        return 'RGB'
+    for key, default in _GRAY_COLORS:
+        common_value = common_config.get(key, default)
+        if str(common_value).lower() != default:
+            return 'RGB'
+        for item in items:
+            if str(item.get(key, common_value)).lower() != default:
+                return 'RGB'
+    return 'L'
+
+
+def _render_cell(
+    layout: SheetLayout,
+    config_dict: Dict[str, Any],
+    page: Image.Image,
+    cell_index: int,
+    stats: RenderStats,
+    cache: RenderCache
+) -> Dict[str, Any]:
+    """生成码图并粘贴到页面（在线程池中执行，各单元格互不重叠）"""
+    content = config_dict.get("content")
+    try:
+        config = layout.code_config(config_dict)
+        layout.paste(page, cell_index, code_generator.build_code_image(config, stats, cache))
+        return {"success": True, "content": content}
+    except Exception as e:
+        return {"success": False, "content": content, "error": str(e)}
+
+
+async def iter_sheet_pages(
+    items: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+    spec: SheetSpec,
+    common_config: Optional[Dict[str, Any]] = None,
+    max_concurrent: int = 10,
+    use_cache: bool = True,
+    progress: Optional[BatchProgress] = None,
+    errors: Optional[List[Dict[str, Any]]] = None
+) -> AsyncIterator[Tuple[int, Image.Image]]:
+    """按页码顺序逐页产出 (页码, 页面图片)，一页全部单元格完成后立即产出"""
+    common_config = common_config or {}
+    cache = render_cache if use_cache else code_generator._disabled_cache
+    progress = progress or BatchProgress()
+    max_concurrent = max(1, max_concurrent)
+    loop = asyncio.get_running_loop()
+    layout = await loop.run_in_executor(
+        code_generator.get_executor(), SheetLayout, spec, _sheet_mode(spec, common_config, items)
+    )
+
+    pages: Dict[int, Image.Image] = {}
+    remaining: Dict[int, int] = {}
+    pending: Dict[asyncio.Future, Tuple[int, int]] = {}
+    next_page = 0
+    submitted_page = -1
+
+    def finished(done: set) -> None:
+        for task in done:
+            page_no, index = pending.pop(task)
+            result = {**task.result(), "index": index}
+            progress.record(result)
+            if not result["success"] and errors is not None:
+                errors.append({"index": index, "content": result.get("content"), "error": result.get("error")})
+            remaining[page_no] -= 1
+
+    def ready(closed_page: int) -> List[Tuple[int, Image.Image]]:
+        """已全部提交（页码不超过 closed_page）且全部完成的页面，按页码顺序取出"""
+        nonlocal next_page
+        completed = []
+        while next_page <= closed_page and remaining.get(next_page) == 0:
+            completed.append((next_page, pages.pop(next_page)))
+            remaining.pop(next_page)
+            next_page += 1
+        return completed
+
+    try:
+        index = 0
+        async for item in code_generator._aiter_items(items):
+            page_no, cell_index = divmod(index, spec.per_page)
+            if page_no not in pages:
+                pages[page_no] = layout.new_page()
+                remaining[page_no] = 0
+                submitted_page = page_no
+            remaining[page_no] += 1
+
+            while len(pending) >= max_concurrent:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                finished(done)
+                for pair in ready(submitted_page - 1):
+                    yield pair
+
+            task = loop.run_in_executor(
+                code_generator.get_executor(), _render_cell,
+                layout, {**common_config, **item}, pages[page_no], cell_index, progress.stats, cache
+            )
+            pending[task] = (page_no, index)
+            index += 1
+
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            finished(done)
+            for pair in ready(submitted_page - 1):
+                yield pair
+        for pair in ready(submitted_page):
+            yield pair
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def _encode_png(page: Image.Image, spec: SheetSpec) -> bytes:
+    return encode(page, 'PNG', 95, spec.output_profile)
+
+
+async def iter_sheet_zip(
+    pages: AsyncIterator[Tuple[int, Image.Image]],
+    spec: SheetSpec,
+    progress: BatchProgress,
+    errors: List[Dict[str, Any]]
+) -> AsyncIterator[bytes]:
+    """PNG 页面写入 ZIP（不压缩），最后写入 manifest.json"""
+    loop = asyncio.get_running_loop()
+    writer = _ChunkWriter()
+    archive = zipfile.ZipFile(writer, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True)
+    page_count = 0
+    async for page_no, page in pages:
+        data = await loop.run_in_executor(code_generator.get_executor(), _encode_png, page, spec)
+        info = zipfile.ZipInfo(f"page_{page_no + 1:04d}.png", date_time=time.localtime()[:6])
+        archive.writestr(info, data)
+        page_count += 1
+        yield writer.take()
+
+    manifest = {**progress.to_dict(), "pages": page_count, "errors": errors}
+    archive.writestr("manifest.json", jsonlib.dumps(manifest, indent=2))
+    archive.close()
+    yield writer.take()
+
+
+async def iter_sheet_pdf(
+    pages: AsyncIterator[Tuple[int, Image.Image]],
+    spec: SheetSpec,
+    progress: BatchProgress,
+    errors: List[Dict[str, Any]]
+) -> AsyncIterator[bytes]:
+    """多页 PDF（每页一张整页图片，页面尺寸为纸张尺寸；图片与 PNG 输出编码方式相同）"""
+    loop = asyncio.get_running_loop()
+    writer = PDFWriter()
+    width = spec.page_width * 72 / 25.4
+    height = spec.page_height * 72 / 25.4
+    yield writer.begin()
+    async for _, page in pages:
+        data = await loop.run_in_executor(code_generator.get_executor(), _encode_png, page, spec)
+        yield writer.add_image_page(width, height, data)
+    yield writer.end()
+
+
+SHEET_ENCODERS = {
+    "PNG": iter_sheet_zip,
+    "PDF": iter_sheet_pdf,
+}
+
+
+def iter_sheet(
+    items: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+    spec: SheetSpec,
+    common_config: Optional[Dict[str, Any]] = None,
+    max_concurrent: int = 10,
+    use_cache: bool = True,
+    progress: Optional[BatchProgress] = None
+) -> AsyncIterator[bytes]:
+    """拼版并按输出格式逐块产出响应数据"""
+    progress = progress or BatchProgress()
+    errors: List[Dict[str, Any]] = []
+    pages = iter_sheet_pages(items, spec, common_config, max_concurrent, use_cache, progress, errors)
+    return SHEET_ENCODERS[spec.output_format](pages, spec, progress, errors)
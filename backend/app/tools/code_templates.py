@@ -0,0 +1,239 @@
+"""
+条码模板注册表
+模板上传一次后按内容哈希得到 template_id，原图保存在模板目录，
+解码后的 RGBA 图片放在有界 LRU 缓存中，合成时只需复制（不再重复解码）
+模板目录按数量与总大小限制，超出时删除最久未上传的模板
+"""
+import base64
+import binascii
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+# 模板ID长度（sha256 十六进制前缀）
+TEMPLATE_ID_LENGTH = 32
+
+
+class TemplateNotFound(ValueError):
+    """模板不存在"""
+
+
+def _image_size(img: Image.Image) -> int:
+    """估算解码后图片占用的内存（RGBA 每像素 4 字节）"""
+    return img.width * img.height * 4
+
+
+class TemplateRegistry:
+    """
+    模板注册表
+    用法:
+        info = template_registry.register(data)
+        img = template_registry.get_image(info["template_id"])  # 共享对象，修改前需 copy()
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_items: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        dir_max_items: Optional[int] = None,
+        dir_max_bytes: Optional[int] = None
+    ):
+        self.directory = directory or settings.CODE_TEMPLATE_DIR or os.path.join(
+            tempfile.gettempdir(), "aetheris", "templates"
+        )
+        self.dir_max_items = dir_max_items or settings.CODE_TEMPLATE_DIR_MAX_ITEMS
+        self.dir_max_bytes = dir_max_bytes or settings.CODE_TEMPLATE_DIR_MAX_BYTES
+        self._images = LRUCache(
+            max_items=max_items or settings.CODE_TEMPLATE_CACHE_ITEMS,
+            max_bytes=max_bytes or settings.CODE_TEMPLATE_CACHE_MAX_BYTES,
+            sizeof=_image_size
+        )
+        self._lock = threading.Lock()
+        # 最近使用的 base64 字符串 -> 模板ID（按对象身份匹配，批量任务共享同一字符串时无需重复哈希）
+        self._base64_alias: List[Tuple[str, str]] = []
+        self._base64_alias_size = 8
+
+    @staticmethod
+    def content_id(data: bytes) -> str:
+        """根据内容计算模板ID"""
+        return hashlib.sha256(data).hexdigest()[:TEMPLATE_ID_LENGTH]
+
+    def _path(self, template_id: str) -> str:
+        if len(template_id) != TEMPLATE_ID_LENGTH or not all(c in "0123456789abcdef" for c in template_id):
+            raise TemplateNotFound(f"模板不存在: {template_id}")
+        return os.path.join(self.directory, f"{template_id}.bin")
+
+    @staticmethod
+    def _decode(data: bytes) -> Image.Image:
+        """解码为 RGBA 图片"""
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                return img.convert('RGBA')
+        except (OSError, Image.DecompressionBombError) as e:
+            raise ValueError(f"模板图片无法解析: {str(e)}")
+
+    def register(self, data: bytes) -> Dict[str, Any]:
+        """注册模板（相同内容返回相同ID），返回模板信息"""
+        if not data:
+            raise ValueError("模板图片内容为空")
+        if self.dir_max_bytes and len(data) > self.dir_max_bytes:
+            raise ValueError(f"模板图片超过大小限制: {self.dir_max_bytes} 字节")
+        template_id = self.content_id(data)
+        img = self._images.get(template_id)
+        if img is None:
+            img = self._decode(data)
+            self._images.set(template_id, img)
+
+        path = self._path(template_id)
+        try:
+            # 重复上传时刷新修改时间，清理目录时按修改时间从旧到新删除
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(self.directory, exist_ok=True)
+            # 先写临时文件再改名，避免多进程同时读到不完整的文件
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._prune(keep=template_id)
+
+        return self._info(template_id, img.size, len(data))
+
+    def _prune(self, keep: str) -> None:
+        """模板目录超过数量或总大小上限时，删除最久未上传的模板（不删除 keep）"""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".bin"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, entry.name[:-4], stat.st_size))
+                total += stat.st_size
+        count = len(entries)
+        if count <= self.dir_max_items and total <= self.dir_max_bytes:
+            return
+        for _, template_id, size in sorted(entries):
+            if count <= self.dir_max_items and total <= self.dir_max_bytes:
+                break
+            if template_id == keep:
+                continue
+            self.delete(template_id)
+            count -= 1
+            total -= size
+
+    def register_base64(self, template_base64: str) -> str:
+        """注册 base64 编码的模板，返回模板ID"""
+        with self._lock:
+            for text, template_id in self._base64_alias:
+                if text is template_base64:
+                    if template_id in self._images or os.path.exists(self._path(template_id)):
+                        return template_id
+        try:
+            data = base64.b64decode(template_base64)
+        except (binascii.Error, ValueError) as e:
+            raise ValueError(f"模板图片base64解码失败: {str(e)}")
+        template_id = self.register(data)["template_id"]
+        with self._lock:
+            self._base64_alias.append((template_base64, template_id))
+            del self._base64_alias[:-self._base64_alias_size]
+        return template_id
+
+    def get_image(self, template_id: str) -> Image.Image:
+        """获取解码后的模板图片（共享对象，调用方不得原地修改）"""
+        img = self._images.get(template_id)
+        if img is not None:
+            return img
+        path = self._path(template_id)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise TemplateNotFound(f"模板不存在: {template_id}")
+        img = self._decode(data)
+        self._images.set(template_id, img)
+        return img
+
+    def exists(self, template_id: str) -> bool:
+        """模板是否已注册"""
+        if self._images.peek(template_id) is not None:
+            return True
+        try:
+            return os.path.exists(self._path(template_id))
+        except TemplateNotFound:
+            return False
+
+    def get_path_image(self, path: str) -> Image.Image:
+        """获取本地模板文件的解码图片（按路径、修改时间和大小缓存）"""
+        stat = os.stat(path)
+        key = ("path", os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        img = self._images.get(key)
+        if img is None:
+            with Image.open(path) as opened:
+                img = opened.convert('RGBA')
+            self._images.set(key, img)
+        return img
+
+    def delete(self, template_id: str) -> bool:
+        """删除模板，返回是否存在"""
+        path = self._path(template_id)
+        self._images.delete(template_id)
+        with self._lock:
+            self._base64_alias = [a for a in self._base64_alias if a[1] != template_id]
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def list_templates(self) -> List[Dict[str, Any]]:
+        """列出已注册的模板"""
+        if not os.path.isdir(self.directory):
+            return []
+        templates = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".bin"):
+                continue
+            template_id = name[:-4]
+            path = os.path.join(self.directory, name)
+            try:
+                size = os.path.getsize(path)
+                img = self._images.peek(template_id)
+                if img is None:
+                    # 未缓存时只读取图片头部获取尺寸，不解码
+                    with Image.open(path) as opened:
+                        dimensions = opened.size
+                else:
+                    dimensions = img.size
+            except OSError:
+                continue
+            templates.append(self._info(template_id, dimensions, size))
+        return templates
+
+    def _info(self, template_id: str, dimensions: Tuple[int, int], size: int) -> Dict[str, Any]:
+        return {
+            "template_id": template_id,
+            "width": dimensions[0],
+            "height": dimensions[1],
+            "size": size,
+            "cached": template_id in self._images
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """解码缓存统计"""
+        return self._images.get_stats()
+
+
+template_registry = TemplateRegistry()
@@ -0,0 +1,401 @@
+"""
+条码矢量输出（SVG / PDF）
+直接由模块数据生成几何图形，不经过栅格化与缩放：
+    - 二维码：每行相邻的深色模块合并为一段，上下相邻行中相同的段再合并为一个矩形
+    - 条形码：使用 barcode_geometry 的条（连续相同的模块已合并），文字使用等宽字体
+    - SVG：全部矩形写入一个 path；PDF：手写的最小 PDF（内容流 Flate 压缩，文字使用内置 Courier 字体）
+指定输出宽高时只改变显示尺寸（像素按 96 dpi 换算）：两边都指定时拉伸（二维码 fit 模式为等比居中），
+只指定一边时等比缩放；未指定时二维码按 qr_box_size 像素，条形码按毫米尺寸输出
+多码 PDF 由 PDFWriter 逐页写出，适合流式输出
+"""
+import functools
+import re
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from PIL import ImageColor
+
+from app.tools import code_generator
+from app.tools.code_generator import CodeGeneratorConfig, EncodedImage
+from app.tools.code_render_cache import RenderCache, RenderStats, render_cache
+
+# 每单位对应的 PDF 点数
+_POINTS_PER_UNIT = {"px": 0.75, "mm": 72 / 25.4}
+
+# 条形码文字字体（SVG 使用与栅格图相同的字体族，PDF 使用内置 Courier，字宽 0.6 em）
+_SVG_FONT_FAMILY = "DejaVu Sans Mono, monospace"
+_PDF_CHAR_WIDTH = 0.6
+
+_PDF_PAGE = re.compile(rb"/MediaBox \[0 0 ([\d.]+) ([\d.]+)\]")
+_PDF_STREAM = re.compile(rb"<< /Length (\d+) /Filter /FlateDecode >>\nstream\n")
+
+Color = Tuple[int, int, int]
+
+
+class VectorCode(NamedTuple):
+    """矢量码图：用户坐标下的尺寸、矩形 (x, y, 宽, 高)、文字 (中心 x, 基线 y, 文本) 与原始显示尺寸"""
+    width: float
+    height: float
+    rects: Tuple[Tuple[float, float, float, float], ...]
+    texts: Tuple[Tuple[float, float, str], ...]
+    font_size: float
+    foreground: Color
+    background: Optional[Color]
+    display_width: float
+    display_height: float
+    unit: str
+
+
+class Viewport(NamedTuple):
+    """显示区域：viewBox 与显示尺寸，stretch 为 True 时不保持比例"""
+    x: float
+    y: float
+    width: float
+    height: float
+    display_width: float
+    display_height: float
+    unit: str
+    stretch: bool
+
+
+def _fmt(value: float) -> str:
+    """数值格式化（最多 4 位小数，去掉多余的 0）"""
+    text = f"{value:.4f}".rstrip("0").rstrip(".")
+    return text if text not in ("", "-0") else "0"
+
+
+def _hex(color: Color) -> str:
+    return "#%02x%02x%02x" % color
+
+
+def qr_rects(rows: Tuple[bytes, ...], border: int) -> Tuple[Tuple[int, int, int, int], ...]:
+    """二维码矩阵合并为矩形：每行的连续深色模块为一段，上下相邻行中相同的段合并"""
+    rects = []
+    open_spans: Dict[Tuple[int, int], int] = {}
+    for y, row in enumerate(rows + (b"",)):
+        spans = [match.span() for match in re.finditer(b"\x01+", row)]
+        current = set(spans)
+        for span in [span for span in open_spans if span not in current]:
+            start = open_spans.pop(span)
+            rects.append((span[0] + border, start + border, span[1] - span[0], y - start))
+        for span in spans:
+            open_spans.setdefault(span, y)
+    return tuple(rects)
+
+
+def qr_vector(
+    config: CodeGeneratorConfig,
+    stats: Optional[RenderStats] = None,
+    cache: Optional[RenderCache] = None
+) -> VectorCode:
+    """二维码矢量图（用户单位为模块）"""
+    matrix = code_generator.get_qr_matrix(config, stats, cache or render_cache)
+    modules = matrix.size + config.qr_border * 2
+    back_color = str(config.qr_back_color).lower()
+    return VectorCode(
+        width=modules,
+        height=modules,
+        rects=qr_rects(matrix.rows, config.qr_border),
+        texts=(),
+        font_size=0,
+        foreground=ImageColor.getrgb(config.qr_fill_color)[:3],
+        background=None if back_color == 'transparent' else ImageColor.getrgb(back_color)[:3],
+        display_width=modules * config.qr_box_size,
+        display_height=modules * config.qr_box_size,
+        unit="px"
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _descent_ratio() -> float:
+    """条形码字体下沿到基线的距离（相对字号）"""
+    size = 100
+    return code_generator._barcode_font(size).getmetrics()[1] / size
+
+
+def barcode_vector(config: CodeGeneratorConfig) -> VectorCode:
+    """条形码矢量图（用户单位为毫米）"""
+    pattern, text = code_generator.build_barcode_pattern(config)
+    geometry = code_generator.barcode_geometry(
+        pattern, text,
+        float(config.barcode_width), float(config.barcode_height), code_generator.BARCODE_QUIET_ZONE
+    )
+    font_size = code_generator._pt2mm(code_generator.BARCODE_FONT_SIZE)
+    descent = _descent_ratio() * font_size
+    return VectorCode(
+        width=geometry.width,
+        height=geometry.height,
+        rects=geometry.bars,
+        texts=tuple((x, y - descent, line) for x, y, line in geometry.texts),
+        font_size=font_size,
+        foreground=(0, 0, 0),
+        background=(255, 255, 255),
+        display_width=geometry.width,
+        display_height=geometry.height,
+        unit="mm"
+    )
+
+
+def build_vector(
+    config: CodeGeneratorConfig,
+    stats: Optional[RenderStats] = None,
+    cache: Optional[RenderCache] = None
+) -> VectorCode:
+    """生成矢量码图（不支持模板合成）"""
+    if config.use_template:
+        raise ValueError("矢量格式（SVG/PDF）不支持模板合成")
+    if config.code_type == 'qrcode':
+        return qr_vector(config, stats, cache)
+    return barcode_vector(config)
+
+
+def viewport(code: VectorCode, config: CodeGeneratorConfig) -> Viewport:
+    """按输出宽高计算显示区域（规则与栅格图调整尺寸相同）"""
+    width, height = config.output_width, config.output_height
+    if not width and not height:
+        return Viewport(0, 0, code.width, code.height, code.display_width, code.display_height, code.unit, False)
+    if width and height:
+        if config.code_type == 'qrcode' and config.qr_resize_mode == 'fit':
+            # 等比居中：扩大 viewBox，背景铺满整个显示区域
+            scale = min(width / code.width, height / code.height)
+            view_width, view_height = width / scale, height / scale
+            return Viewport(
+                (code.width - view_width) / 2, (code.height - view_height) / 2,
+                view_width, view_height, width, height, "px", False
+            )
+        return Viewport(0, 0, code.width, code.height, width, height, "px", True)
+    if width:
+        return Viewport(0, 0, code.width, code.height, width, width * code.height / code.width, "px", False)
+    return Viewport(0, 0, code.width, code.height, height * code.width / code.height, height, "px", False)
+
+
+def to_svg(code: VectorCode, view: Viewport) -> bytes:
+    """生成 SVG（全部矩形合并为一个 path）"""
+    unit = "mm" if view.unit == "mm" else ""
+    attrs = [
+        'xmlns="http://www.w3.org/2000/svg"',
+        'version="1.1"',
+        f'width="{_fmt(view.display_width)}{unit}"',
+        f'height="{_fmt(view.display_height)}{unit}"',
+        f'viewBox="{_fmt(view.x)} {_fmt(view.y)} {_fmt(view.width)} {_fmt(view.height)}"',
+    ]
+    if view.stretch:
+        attrs.append('preserveAspectRatio="none"')
+    parts = [f'<svg {" ".join(attrs)} shape-rendering="crispEdges">']
+    if code.background is not None:
+        parts.append(
+            f'<rect x="{_fmt(view.x)}" y="{_fmt(view.y)}" width="{_fmt(view.width)}" '
+            f'height="{_fmt(view.height)}" fill="{_hex(code.background)}"/>'
+        )
+    path = "".join(
+        f"M{_fmt(x)} {_fmt(y)}h{_fmt(w)}v{_fmt(h)}h{_fmt(-w)}z" for x, y, w, h in code.rects
+    )
+    parts.append(f'<path fill="{_hex(code.foreground)}" d="{path}"/>')
+    for x, y, line in code.texts:
+        parts.append(
+            f'<text x="{_fmt(x)}" y="{_fmt(y)}" font-family="{_SVG_FONT_FAMILY}" '
+            f'font-size="{_fmt(code.font_size)}" text-anchor="middle" '
+            f'fill="{_hex(code.foreground)}">{escape(line)}</text>'
+        )
+    parts.append("</svg>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def _pdf_string(text: str) -> str:
+    """PDF 字符串转义"""
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def to_pdf_page(code: VectorCode, view: Viewport) -> Tuple[float, float, bytes]:
+    """生成 PDF 页面（返回页面宽高与未压缩的内容流）"""
+    points = _POINTS_PER_UNIT[view.unit]
+    page_width, page_height = view.display_width * points, view.display_height * points
+    # 用户坐标（左上角为原点）到页面坐标（左下角为原点）
+    scale_x = page_width / view.width
+    scale_y = page_height / view.height
+    offset_x = -view.x * scale_x
+    offset_y = page_height + view.y * scale_y
+
+    ops = []
+    if code.background is not None:
+        ops.append("%s %s %s rg" % tuple(_fmt(c / 255) for c in code.background))
+        ops.append(f"0 0 {_fmt(page_width)} {_fmt(page_height)} re f")
+    ops.append("q")
+    ops.append(f"{_fmt(scale_x)} 0 0 {_fmt(-scale_y)} {_fmt(offset_x)} {_fmt(offset_y)} cm")
+    ops.append("%s %s %s rg" % tuple(_fmt(c / 255) for c in code.foreground))
+    ops.extend(f"{_fmt(x)} {_fmt(y)} {_fmt(w)} {_fmt(h)} re" for x, y, w, h in code.rects)
+    ops.append("f")
+    ops.append("Q")
+    if code.texts:
+        ops.append("%s %s %s rg" % tuple(_fmt(c / 255) for c in code.foreground))
+        ops.append("BT /F1 1 Tf")
+        for x, y, line in code.texts:
+            left = x - _PDF_CHAR_WIDTH * code.font_size * len(line) / 2
+            ops.append(
+                f"{_fmt(code.font_size * scale_x)} 0 0 {_fmt(code.font_size * scale_y)} "
+                f"{_fmt(offset_x + left * scale_x)} {_fmt(offset_y - y * scale_y)} Tm "
+                f"({_pdf_string(line)}) Tj"
+            )
+        ops.append("ET")
+    return page_width, page_height, "\n".join(ops).encode("latin-1", "replace")
+
+
+class PDFWriter:
+    """
+    增量写出 PDF：页面逐个写出（适合流式输出），结束时写出页面树与交叉引用表
+    对象编号：1 目录、2 页面树、3 字体，页面从 4 开始
+    """
+
+    def __init__(self):
+        self._offset = 0
+        self._offsets: Dict[int, int] = {}
+        self._page_ids: List[int] = []
+        self._next_id = 4
+
+    def _emit(self, data: bytes) -> bytes:
+        self._offset += len(data)
+        return data
+
+    def _object(self, number: int, body: bytes) -> bytes:
+        self._offsets[number] = self._offset
+        return self._emit(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    def begin(self) -> bytes:
+        """文件头与共享字体"""
+        return self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n") + self._object(
+            3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>"
+        )
+
+    def _stream(self, number: int, dictionary: str, data: bytes, compressed: bool = False) -> bytes:
+        """写出 Flate 压缩的流对象（compressed 为 True 时 data 已是 zlib 数据）"""
+        stream = data if compressed else zlib.compress(data)
+        header = f"<< {dictionary}/Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode("ascii")
+        return self._object(number, header + stream + b"\nendstream")
+
+    def _page(self, width: float, height: float, content: bytes, xobjects: str = "") -> bytes:
+        content_id, page_id = self._next_id, self._next_id + 1
+        self._next_id += 2
+        self._page_ids.append(page_id)
+        data = self._stream(content_id, "", content)
+        page = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_fmt(width)} {_fmt(height)}] "
+            f"/Resources << /Font << /F1 3 0 R >>{xobjects} >> /Contents {content_id} 0 R >>"
+        )
+        return data + self._object(page_id, page.encode("ascii"))
+
+    def add_page(self, width: float, height: float, content: bytes) -> bytes:
+        """写出一页（内容流为未压缩的绘图指令）"""
+        return self._page(width, height, content)
+
+    def add_image_page(self, width: float, height: float, png: bytes) -> bytes:
+        """
+        写出一页整页图片：直接使用 PNG 的 IDAT 数据（带 PNG 预测器的 zlib 流），不重新压缩
+        支持灰度（含 1/2/4 位）、RGB 与调色板 PNG，不支持透明通道
+        """
+        header, palette, idat = _read_png(png)
+        image_width, image_height, bits, color_type = header
+        if color_type == 0:
+            color_space, colors = "/DeviceGray", 1
+        elif color_type == 2:
+            color_space, colors = "/DeviceRGB", 3
+        elif color_type == 3:
+            color_space, colors = f"[/Indexed /DeviceRGB {len(palette) // 3 - 1} <{palette.hex()}>]", 1
+        else:
+            raise ValueError("PDF 页面图片不支持透明通道")
+        image_id = self._next_id
+        self._next_id += 1
+        data = self._stream(
+            image_id,
+            f"/Type /XObject /Subtype /Image /Width {image_width} /Height {image_height} "
+            f"/ColorSpace {color_space} /BitsPerComponent {bits} "
+            f"/DecodeParms << /Predictor 15 /Colors {colors} /BitsPerComponent {bits} "
+            f"/Columns {image_width} >> ",
+            idat,
+            compressed=True
+        )
+        content = f"q {_fmt(width)} 0 0 {_fmt(height)} 0 0 cm /Im1 Do Q".encode("ascii")
+        return data + self._page(width, height, content, f" /XObject << /Im1 {image_id} 0 R >>")
+
+    def end(self) -> bytes:
+        """页面树、目录、交叉引用表与文件尾"""
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        data = self._object(
+            2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>".encode("ascii")
+        )
+        data += self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref_offset = self._offset
+        size = self._next_id
+        xref = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        xref.extend(f"{self._offsets.get(number, 0):010d} 00000 n \n" for number in range(1, size))
+        xref.append(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        return data + self._emit("".join(xref).encode("ascii"))
+
+
+def _read_png(data: bytes) -> Tuple[Tuple[int, int, int, int], bytes, bytes]:
+    """读取 PNG 的 (宽, 高, 位深, 颜色类型)、调色板与合并后的 IDAT 数据（不支持隔行扫描）"""
+    if not data.startswith(b"\x89PNG\r\n\x1a\n"):
+        raise ValueError("不是 PNG 数据")
+    header = None
+    palette = b""
+    idat = []
+    position = 8
+    while position < len(data):
+        length = int.from_bytes(data[position:position + 4], "big")
+        kind = data[position + 4:position + 8]
+        chunk = data[position + 8:position + 8 + length]
+        position += 12 + length
+        if kind == b"IHDR":
+            if chunk[12] != 0:
+                raise ValueError("不支持隔行扫描的 PNG")
+            header = (
+                int.from_bytes(chunk[0:4], "big"), int.from_bytes(chunk[4:8], "big"), chunk[8], chunk[9]
+            )
+        elif kind == b"PLTE":
+            palette = chunk
+        elif kind == b"IDAT":
+            idat.append(chunk)
+        elif kind == b"IEND":
+            break
+    if header is None:
+        raise ValueError("PNG 缺少 IHDR")
+    return header, palette, b"".join(idat)
+
+
+def read_pdf_page(data: bytes) -> Tuple[float, float, bytes]:
+    """读取单页 PDF（由 PDFWriter 生成）的页面宽高与内容流，用于合并为多页 PDF"""
+    stream = _PDF_STREAM.search(data)
+    page = _PDF_PAGE.search(data)
+    if stream is None or page is None:
+        raise ValueError("无法识别的 PDF 数据")
+    start = stream.end()
+    content = zlib.decompress(data[start:start + int(stream.group(1))])
+    return float(page.group(1)), float(page.group(2)), content
+
+
+def _pixel_size(view: Viewport) -> Tuple[int, int]:
+    """显示尺寸换算为像素（毫米按 300 dpi，与条形码栅格图一致）"""
+    if view.unit == "mm":
+        return int(code_generator._mm2px(view.display_width)), int(code_generator._mm2px(view.display_height))
+    return int(round(view.display_width)), int(round(view.display_height))
+
+
+def render_vector(
+    config: CodeGeneratorConfig,
+    stats: Optional[RenderStats] = None,
+    cache: Optional[RenderCache] = None
+) -> EncodedImage:
+    """生成 SVG 或单页 PDF"""
+    code = build_vector(config, stats, cache)
+    view = viewport(code, config)
+    if config.output_format == 'SVG':
+        data = to_svg(code, view)
+    else:
+        writer = PDFWriter()
+        data = writer.begin() + writer.add_page(*to_pdf_page(code, view)) + writer.end()
+    width, height = _pixel_size(view)
+    return EncodedImage(data, width, height)
@@ -0,0 +1,268 @@
+"""
+JSON 字段聚合工具
+在字段提取过程中直接完成聚合计算，只返回聚合结果
+支持 count、count_distinct、sum、min、max、avg 以及 group_by（Top-N）
+"""
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 支持的聚合操作
+AGGREGATE_OPS = ["count", "count_distinct", "sum", "min", "max", "avg", "group_by"]
+
+# group_by 中可用的数值聚合操作
+GROUP_VALUE_OPS = ["count", "sum", "min", "max", "avg"]
+
+# 默认上限：去重集合与分组数量（保证内存有界）
+DEFAULT_MAX_DISTINCT = 100000
+DEFAULT_MAX_GROUPS = 100000
+DEFAULT_TOP_N = 10
+
+# 超出分组上限后归入的分组键
+OTHER_GROUP_KEY = "__other__"
+
+
+def is_number(value: Any) -> bool:
+    """判断是否为可参与数值计算的值（排除布尔值）"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def value_key(value: Any) -> str:
+    """将任意 JSON 值转换为可哈希的分组/去重键"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return str(value)
+
+
+class NumericAccumulator:
+    """数值累加器：一次遍历同时维护 count/sum/min/max"""
+
+    __slots__ = ("count", "total", "minimum", "maximum", "skipped")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        self.skipped = 0
+
+    def add(self, value: Any) -> None:
+        if value is None:
+            return
+        if not is_number(value):
+            self.skipped += 1
+            return
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def result(self, op: str) -> Any:
+        if op == "count":
+            return self.count
+        if op == "sum":
+            return self.total
+        if op == "min":
+            return self.minimum
+        if op == "max":
+            return self.maximum
+        if op == "avg":
+            return self.total / self.count if self.count else None
+        raise ValueError(f"不支持的聚合操作: {op}")
+
+
+class Aggregation:
+    """单个聚合操作"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        op = spec.get("op")
+        if op not in AGGREGATE_OPS:
+            raise ValueError(f"不支持的聚合操作: {op}，可选: {', '.join(AGGREGATE_OPS)}")
+
+        self.op = op
+        self.field: Optional[str] = spec.get("field")
+        if op != "count" and not self.field:
+            raise ValueError(f"聚合操作 {op} 需要指定 field")
+
+        self.name = spec.get("alias") or (f"{op}({self.field})" if self.field else op)
+
+        # count_distinct
+        self.max_distinct = int(spec.get("max_distinct", DEFAULT_MAX_DISTINCT))
+        self._distinct = set()
+        self._distinct_truncated = False
+
+        # sum/min/max/avg
+        self._numeric = NumericAccumulator()
+
+        # count
+        self._count = 0
+
+        # group_by
+        self.top_n = int(spec.get("top_n", DEFAULT_TOP_N))
+        self.max_groups = int(spec.get("max_groups", DEFAULT_MAX_GROUPS))
+        self.value_field: Optional[str] = spec.get("value_field")
+        self.value_op: str = spec.get("value_op", "sum" if self.value_field else "count")
+        if op == "group_by":
+            if self.value_op not in GROUP_VALUE_OPS:
+                raise ValueError(
+                    f"不支持的分组聚合操作: {self.value_op}，可选: {', '.join(GROUP_VALUE_OPS)}"
+                )
+            if self.value_op != "count" and not self.value_field:
+                raise ValueError(f"分组聚合操作 {self.value_op} 需要指定 value_field")
+        self._groups: Dict[str, List[Any]] = {}
+
+    def required_fields(self) -> List[str]:
+        """聚合依赖的字段路径"""
+        fields = [self.field] if self.field else []
+        if self.op == "group_by" and self.value_field:
+            fields.append(self.value_field)
+        return fields
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """消费一行提取结果"""
+        op = self.op
+
+        if op == "count":
+            if self.field is None or row.get(self.field) is not None:
+                self._count += 1
+            return
+
+        value = row.get(self.field)
+
+        if op == "count_distinct":
+            if value is None:
+                return
+            key = value_key(value)
+            if key in self._distinct:
+                return
+            if len(self._distinct) >= self.max_distinct:
+                self._distinct_truncated = True
+                return
+            self._distinct.add(key)
+            return
+
+        if op == "group_by":
+            key = value_key(value) if value is not None else None
+            group = self._groups.get(key)
+            if group is None:
+                if len(self._groups) >= self.max_groups:
+                    key = OTHER_GROUP_KEY
+                    group = self._groups.get(key)
+                if group is None:
+                    group = [0, NumericAccumulator() if self.value_field else None]
+                    self._groups[key] = group
+            group[0] += 1
+            if group[1] is not None:
+                group[1].add(row.get(self.value_field))
+            return
+
+        self._numeric.add(value)
+
+    def result(self) -> Dict[str, Any]:
+        """输出聚合结果"""
+        op = self.op
+        result: Dict[str, Any] = {"op": op, "field": self.field}
+
+        if op == "count":
+            result["value"] = self._count
+        elif op == "count_distinct":
+            result["value"] = len(self._distinct)
+            result["truncated"] = self._distinct_truncated
+        elif op == "group_by":
+            result.update(self._group_result())
+        else:
+            result["value"] = self._numeric.result(op)
+            result["numeric_count"] = self._numeric.count
+            result["skipped_non_numeric"] = self._numeric.skipped
+
+        return result
+
+    def _group_result(self) -> Dict[str, Any]:
+        """分组结果：按指标降序取 Top-N"""
+        def metric(item: Tuple[Any, List[Any]]) -> Any:
+            count, acc = item[1]
+            if self.value_op == "count" or acc is None:
+                return count
+            value = acc.result(self.value_op)
+            return value if value is not None else float("-inf")
+
+        total_groups = len(self._groups)
+        groups = sorted(self._groups.items(), key=metric, reverse=True)
+        if self.top_n > 0:
+            groups = groups[:self.top_n]
+
+        top = []
+        for key, (count, acc) in groups:
+            group = {"key": key, "count": count}
+            if acc is not None:
+                group["value"] = acc.result(self.value_op)
+            top.append(group)
+
+        return {
+            "value_field": self.value_field,
+            "value_op": self.value_op,
+            "top_n": self.top_n,
+            "total_groups": total_groups,
+            "truncated": OTHER_GROUP_KEY in self._groups,
+            "groups": top,
+        }
+
+
+def build_aggregations(specs: Any) -> List[Aggregation]:
+    """解析聚合配置，支持单个字典或字典列表"""
+    if isinstance(specs, dict):
+        specs = [specs]
+    if not isinstance(specs, list):
+        raise ValueError("aggregations 必须是聚合配置列表")
+    for index, spec in enumerate(specs):
+        if not isinstance(spec, dict):
+            raise ValueError(f"aggregations[{index}] 必须是聚合配置对象")
+    return [Aggregation(spec) for spec in specs]
+
+
+def aggregation_fields(aggregations: List[Aggregation]) -> List[str]:
+    """汇总所有聚合依赖的字段（保持顺序、去重）"""
+    fields: List[str] = []
+    for aggregation in aggregations:
+        for field in aggregation.required_fields():
+            if field not in fields:
+                fields.append(field)
+    return fields
+
+
+def run_aggregations(
+    rows: Iterable[Dict[str, Any]],
+    aggregations: List[Aggregation],
+    fields: List[str]
+) -> Dict[str, Any]:
+    """
+    单次遍历提取行，同时完成所有聚合与字段统计
+    行数据用完即弃，内存只与聚合状态相关
+    """
+    total_records = 0
+    fields_found = {field: 0 for field in fields}
+
+    for row in rows:
+        total_records += 1
+        for field in fields:
+            if row.get(field) is not None:
+                fields_found[field] += 1
+        for aggregation in aggregations:
+            aggregation.add(row)
+
+    return {
+        "aggregations": {agg.name: agg.result() for agg in aggregations},
+        "stats": {
+            "total_records": total_records,
+            "fields_count": len(fields),
+            "fields_found": fields_found,
+            "fields_missing": {
+                field: total_records - count for field, count in fields_found.items()
+            }
+        }
+    }
@@ -6,9 +6,13 @@ JSON 字段提取工具
 """
 import json
 import re
-from typing import Any, List, Dict, Optional, Union
+from typing import Any, List, Dict, Iterable, Iterator, Optional, Union
 import logging
 
+from app.core import jsonlib
+from app.tools.json_aggregator import build_aggregations, aggregation_fields, run_aggregations
+from app.tools.ndjson import NDJSONStats, iter_ndjson, parse_batch_lines, parse_workers
+
 logger = logging.getLogger(__name__)
 
 # 特殊标记：表示数组遍历
@@ -114,20 +118,21 @@ def has_array_iterate(field_path: str) -> bool:
     return '[]' in field_path
 
 
-def extract_with_array_iterate(data: Any, field_paths: List[str]) -> List[Dict[str, Any]]:
+def iter_extracted_rows(data: Any, field_paths: List[str]) -> Iterator[Dict[str, Any]]:
     """
-    支持数组遍历的字段提取
+    逐行产出字段提取结果（支持数组遍历）
+    与 extract_with_array_iterate 结果一致，但不在内存中构建完整结果列表
     """
     # 检查是否有数组遍历字段
     iterate_fields = [f for f in field_paths if has_array_iterate(f)]
-    normal_fields = [f for f in field_paths if not has_array_iterate(f)]
     
     if not iterate_fields:
         # 没有数组遍历，使用普通提取
-        return extract_fields(data, field_paths)
-    
-    # 有数组遍历字段
-    results = []
+        parsed_paths = [(field, parse_field_path(field)) for field in field_paths]
+        items = data if isinstance(data, list) else [data]
+        for item in items:
+            yield {field: get_nested_value(item, parts) for field, parts in parsed_paths}
+        return
     
     # 获取每个字段的值列表
     field_values = {}
@@ -152,9 +157,27 @@ def extract_with_array_iterate(data: Any, field_paths: List[str]) -> List[Dict[s
                     row[field] = values[0]  # 非遍历字段重复第一个值
                 else:
                     row[field] = None
-        results.append(row)
-    
-    return results
+        yield row
+
+
+def extract_with_array_iterate(data: Any, field_paths: List[str]) -> List[Dict[str, Any]]:
+    """
+    支持数组遍历的字段提取
+    """
+    return list(iter_extracted_rows(data, field_paths))
+
+
+def iter_ndjson_rows(records: Iterable[Any], field_paths: List[str]) -> Iterator[Dict[str, Any]]:
+    """
+    NDJSON 模式：逐条记录提取字段
+    每条记录等价于 JSON 数组中的一个元素，记录用完即弃
+    """
+    iterate = any(has_array_iterate(f) for f in field_paths)
+    for record in records:
+        if iterate:
+            yield from iter_extracted_rows(record, field_paths)
+        else:
+            yield from iter_extracted_rows([record], field_paths)
 
 
 def extract_fields_from_item(item: Any, field_paths: List[str]) -> Dict[str, Any]:
@@ -261,15 +284,25 @@ async def extract_json_fields(params: dict) -> dict:
     JSON 字段提取主函数
     
     参数：
-        json_input: JSON 字符串
+        json_input: JSON 字符串（也可以是 bytes 或 mmap 缓冲区）
         fields: 字段列表，支持嵌套路径如 "user.name", "data.list[0].id"
         output_format: 输出格式 "csv" 或 "txt"
         txt_separator: TXT 格式的分隔符，默认为制表符
+        input_mode: 输入模式 "json"（默认）或 "ndjson"（每行一个 JSON 记录）
+        on_error: NDJSON 坏行处理 "skip"（默认，只计数）或 "report"（返回坏行明细）
+        parallel: NDJSON 是否按批次并行解析（默认 False）
+        parallel_workers: 并行解析进程数（默认 CPU 核数）
+        batch_lines: 并行解析每批行数
+        aggregations: 聚合配置列表（可选），指定后只返回聚合结果，例如
+            [{"op": "count"}, {"op": "sum", "field": "order.amount"},
+             {"op": "group_by", "field": "user.city", "top_n": 5,
+              "value_field": "order.amount", "value_op": "sum"}]
     
     返回：
         success: 是否成功
-        results: 提取结果列表
+        results: 提取结果列表（聚合模式下为空）
         output: 格式化输出
+        aggregations: 聚合结果（仅聚合模式）
         stats: 统计信息
         error: 错误信息（如果失败）
     """
@@ -277,9 +310,11 @@ async def extract_json_fields(params: dict) -> dict:
     fields = params.get("fields", [])
     output_format = params.get("output_format", "csv")
     txt_separator = params.get("txt_separator", "\t")
+    aggregation_specs = params.get("aggregations")
+    input_mode = params.get("input_mode", "json")
     
     # 验证输入
-    if not json_input or not json_input.strip():
+    if jsonlib.is_blank(json_input):
         return {
             "success": False,
             "error": "请输入 JSON 内容",
@@ -288,7 +323,20 @@ async def extract_json_fields(params: dict) -> dict:
             "stats": None
         }
     
-    if not fields:
+    aggregations = None
+    if aggregation_specs:
+        try:
+            aggregations = build_aggregations(aggregation_specs)
+        except (ValueError, TypeError) as e:
+            return {
+                "success": False,
+                "error": f"聚合配置错误: {str(e)}",
+                "results": [],
+                "output": "",
+                "stats": None
+            }
+    
+    if not fields and not aggregations:
         return {
             "success": False,
             "error": "请指定要提取的字段",
@@ -300,22 +348,55 @@ async def extract_json_fields(params: dict) -> dict:
     # 确保 fields 是列表
     if isinstance(fields, str):
         fields = [f.strip() for f in fields.split(",") if f.strip()]
+    fields = list(fields or [])
     
-    try:
-        # 解析 JSON
-        data = json.loads(json_input)
-    except json.JSONDecodeError as e:
-        return {
-            "success": False,
-            "error": f"JSON 格式错误: {str(e)}",
-            "results": [],
-            "output": "",
-            "stats": None
-        }
+    if aggregations:
+        for field in aggregation_fields(aggregations):
+            if field not in fields:
+                fields.append(field)
+    
+    ndjson_stats = None
+    if input_mode == "ndjson":
+        try:
+            ndjson_stats = NDJSONStats(on_error=params.get("on_error", "skip"))
+            parse_workers(params.get("parallel_workers"))
+            batch_lines = parse_batch_lines(params.get("batch_lines"))
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "results": [],
+                "output": "",
+                "stats": None
+            }
+        records = iter_ndjson(
+            json_input,
+            stats=ndjson_stats,
+            parallel=params.get("parallel", False),
+            workers=params.get("parallel_workers"),
+            batch_lines=batch_lines
+        )
+        rows = iter_ndjson_rows(records, fields)
+    else:
+        try:
+            # 解析 JSON
+            data = jsonlib.loads(json_input)
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": f"JSON 格式错误: {str(e)}",
+                "results": [],
+                "output": "",
+                "stats": None
+            }
+        rows = iter_extracted_rows(data, fields)
+    
+    if aggregations:
+        return _aggregate_fields(rows, fields, aggregations, ndjson_stats)
     
     try:
         # 提取字段（支持数组遍历）
-        results = extract_with_array_iterate(data, fields)
+        results = list(rows)
         
         # 统计信息
         total_records = len(results)
@@ -338,12 +419,12 @@ async def extract_json_fields(params: dict) -> dict:
             "results": results,
             "output": output,
             "output_format": output_format,
-            "stats": {
+            "stats": _with_ndjson_stats({
                 "total_records": total_records,
                 "fields_count": len(fields),
                 "fields_found": fields_found,
                 "fields_missing": fields_missing
-            },
+            }, ndjson_stats),
             "error": None
         }
     
@@ -356,3 +437,42 @@ async def extract_json_fields(params: dict) -> dict:
             "output": "",
             "stats": None
         }
+
+
+def _aggregate_fields(
+    rows: Iterable[Dict[str, Any]],
+    fields: List[str],
+    aggregations: list,
+    ndjson_stats: Optional[NDJSONStats] = None
+) -> dict:
+    """
+    聚合模式：在提取过程中逐行聚合，只返回聚合结果
+    """
+    try:
+        aggregated = run_aggregations(rows, aggregations, fields)
+        return {
+            "success": True,
+            "results": [],
+            "output": json.dumps(aggregated["aggregations"], ensure_ascii=False, indent=2),
+            "output_format": "json",
+            "aggregations": aggregated["aggregations"],
+            "stats": _with_ndjson_stats(aggregated["stats"], ndjson_stats),
+            "error": None
+        }
+    
+    except Exception as e:
+        logger.error(f"字段聚合失败: {str(e)}")
+        return {
+            "success": False,
+            "error": f"字段聚合失败: {str(e)}",
+            "results": [],
+            "output": "",
+            "stats": None
+        }
+
+
+def _with_ndjson_stats(stats: dict, ndjson_stats: Optional[NDJSONStats]) -> dict:
+    """附加 NDJSON 解析统计"""
+    if ndjson_stats is not None:
+        stats["ndjson"] = ndjson_stats.to_dict()
+    return stats
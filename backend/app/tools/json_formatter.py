@@ -2,7 +2,26 @@
 JSON格式化工具
 """
 import json
-from typing import Dict, Any
+from typing import Dict, Any, List
+
+from app.core import jsonlib
+from app.tools.ndjson import NDJSONStats, iter_ndjson, parse_batch_lines, parse_workers
+from app.tools.json_stream_formatter import JSONStreamError, JSONStreamFormatter
+
+# 可选的输出项
+OUTPUT_OPTIONS = ["formatted", "compressed", "stats"]
+
+
+def normalize_outputs(outputs: Any) -> List[str]:
+    """解析需要的输出项，默认全部输出"""
+    if not outputs:
+        return list(OUTPUT_OPTIONS)
+    if isinstance(outputs, str):
+        outputs = [o.strip() for o in outputs.split(",") if o.strip()]
+    unknown = [o for o in outputs if o not in OUTPUT_OPTIONS]
+    if unknown:
+        raise ValueError(f"不支持的输出项: {', '.join(unknown)}，可选: {', '.join(OUTPUT_OPTIONS)}")
+    return list(outputs)
 
 
 async def format_json(params: Dict[str, Any]) -> Dict[str, Any]:
@@ -10,16 +29,24 @@ async def format_json(params: Dict[str, Any]) -> Dict[str, Any]:
     JSON格式化工具
     
     参数:
-        - input: 待格式化的JSON字符串
+        - input: 待格式化的JSON字符串（也可以是 bytes 或 mmap 缓冲区）
         - indent: 缩进空格数（默认2）
         - sort_keys: 是否排序键（默认False）
         - ensure_ascii: 是否确保ASCII（默认False）
+        - outputs: 需要的输出项，可选 formatted/compressed/stats（默认全部）
+        - fast: 是否使用 orjson 加速（默认True，未安装时自动回退）
+        - input_mode: 输入模式 "json"（默认）或 "ndjson"（每行一个 JSON 记录）
+        - on_error: NDJSON 坏行处理 "skip"（默认）或 "report"
+        - parallel: NDJSON 是否按批次并行解析（默认False）
+        - parallel_workers: 并行解析进程数
+        - batch_lines: 并行解析每批行数
     """
     try:
         input_text = params.get("input", "")
         indent = params.get("indent", 2)
         sort_keys = params.get("sort_keys", False)
         ensure_ascii = params.get("ensure_ascii", False)
+        fast = params.get("fast", True)
         
         if not input_text:
             return {
@@ -27,41 +54,56 @@ async def format_json(params: Dict[str, Any]) -> Dict[str, Any]:
                 "error": "输入内容不能为空"
             }
         
+        try:
+            outputs = normalize_outputs(params.get("outputs"))
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        
+        if params.get("input_mode", "json") == "ndjson":
+            return format_ndjson(params, outputs)
+        
         # 解析JSON
         try:
-            data = json.loads(input_text)
-        except json.JSONDecodeError as e:
+            data = jsonlib.loads(input_text, fast=fast)
+        except ValueError as e:
             return {
                 "success": False,
                 "error": f"JSON解析错误: {str(e)}"
             }
+        except RecursionError:
+            # 嵌套过深无法构建对象树，改用流式格式化
+            return format_json_streaming(input_text, outputs, indent)
+        
+        result = {"success": True}
+        stats = {"original_length": len(input_text)}
         
         # 格式化JSON
-        formatted = json.dumps(
-            data,
-            indent=indent,
-            sort_keys=sort_keys,
-            ensure_ascii=ensure_ascii
-        )
+        if "formatted" in outputs:
+            formatted = jsonlib.dumps(
+                data,
+                indent=indent,
+                sort_keys=sort_keys,
+                ensure_ascii=ensure_ascii,
+                fast=fast
+            )
+            result["formatted"] = formatted
+            stats["formatted_length"] = len(formatted)
         
         # 压缩JSON
-        compressed = json.dumps(
-            data,
-            separators=(',', ':'),
-            ensure_ascii=ensure_ascii
-        )
+        if "compressed" in outputs:
+            compressed = jsonlib.dumps(data, ensure_ascii=ensure_ascii, fast=fast)
+            result["compressed"] = compressed
+            stats["compressed_length"] = len(compressed)
         
-        return {
-            "success": True,
-            "formatted": formatted,
-            "compressed": compressed,
-            "stats": {
-                "original_length": len(input_text),
-                "formatted_length": len(formatted),
-                "compressed_length": len(compressed),
-                "keys_count": count_keys(data)
-            }
-        }
+        # 结构统计（单次非递归遍历）
+        if "stats" in outputs:
+            stats.update(collect_stats(data))
+        
+        result["stats"] = stats
+        return result
         
     except Exception as e:
         return {
@@ -70,19 +112,173 @@ async def format_json(params: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
+def format_ndjson(params: Dict[str, Any], outputs: List[str]) -> Dict[str, Any]:
+    """
+    NDJSON格式化：逐行解析并格式化
+    formatted 为每条记录的格式化结果（以空行分隔），compressed 为规范化后的 NDJSON
+    """
+    input_text = params.get("input", "")
+    indent = params.get("indent", 2)
+    sort_keys = params.get("sort_keys", False)
+    ensure_ascii = params.get("ensure_ascii", False)
+    fast = params.get("fast", True)
+    
+    try:
+        ndjson_stats = NDJSONStats(on_error=params.get("on_error", "skip"))
+        parse_workers(params.get("parallel_workers"))
+        batch_lines = parse_batch_lines(params.get("batch_lines"))
+    except ValueError as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+    
+    formatted_parts = []
+    compressed_parts = []
+    structure = StructureStats()
+    
+    for record in iter_ndjson(
+        input_text,
+        stats=ndjson_stats,
+        parallel=params.get("parallel", False),
+        workers=params.get("parallel_workers"),
+        batch_lines=batch_lines
+    ):
+        if "formatted" in outputs:
+            formatted_parts.append(jsonlib.dumps(
+                record,
+                indent=indent,
+                sort_keys=sort_keys,
+                ensure_ascii=ensure_ascii,
+                fast=fast
+            ))
+        if "compressed" in outputs:
+            compressed_parts.append(jsonlib.dumps(record, ensure_ascii=ensure_ascii, fast=fast))
+        if "stats" in outputs:
+            structure.add(record)
+    
+    if not ndjson_stats.records and ndjson_stats.bad_lines:
+        return {
+            "success": False,
+            "error": "NDJSON 中没有可解析的记录",
+            "stats": {"ndjson": ndjson_stats.to_dict()}
+        }
+    
+    result = {"success": True}
+    stats = {"original_length": len(input_text)}
+    
+    if "formatted" in outputs:
+        formatted = "\n\n".join(formatted_parts)
+        result["formatted"] = formatted
+        stats["formatted_length"] = len(formatted)
+    
+    if "compressed" in outputs:
+        compressed = "\n".join(compressed_parts)
+        result["compressed"] = compressed
+        stats["compressed_length"] = len(compressed)
+    
+    if "stats" in outputs:
+        stats.update(structure.to_dict())
+    
+    stats["ndjson"] = ndjson_stats.to_dict()
+    result["stats"] = stats
+    return result
+
+
+def _iter_source_chunks(source: Any, chunk_size: int = 1024 * 1024):
+    """按块读取输入（str 先编码为 UTF-8）"""
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    for start in range(0, len(source), chunk_size):
+        yield source[start:start + chunk_size]
+
+
+def format_json_streaming(input_text: Any, outputs: List[str], indent: int = 2) -> Dict[str, Any]:
+    """
+    流式格式化（不构建对象树，不受嵌套深度限制）
+    不支持 sort_keys、ensure_ascii 与结构统计，字符串和数字按原样输出
+    """
+    result = {"success": True, "streamed": True}
+    stats = {"original_length": len(input_text)}
+    
+    try:
+        for name, mode in (("formatted", "pretty"), ("compressed", "compact")):
+            if name not in outputs:
+                continue
+            formatter = JSONStreamFormatter(mode=mode, indent=indent)
+            parts = [formatter.feed(chunk) for chunk in _iter_source_chunks(input_text)]
+            parts.append(formatter.close())
+            text = b"".join(parts).decode("utf-8")
+            result[name] = text
+            stats[f"{name}_length"] = len(text)
+            stats["max_depth"] = formatter.max_depth
+    except (JSONStreamError, UnicodeDecodeError) as e:
+        return {
+            "success": False,
+            "error": f"JSON解析错误: {str(e)}"
+        }
+    
+    result["stats"] = stats
+    return result
+
+
+class StructureStats:
+    """JSON结构统计：使用显式栈遍历，不受递归深度限制"""
+    
+    def __init__(self):
+        self.keys_count = 0
+        self.objects = 0
+        self.arrays = 0
+        self.scalars = 0
+        self.max_depth = 0
+    
+    def add(self, obj: Any) -> None:
+        """遍历一个JSON值并累计统计"""
+        if not isinstance(obj, (dict, list)):
+            self.scalars += 1
+            return
+        
+        stack = [(obj, 1)]
+        while stack:
+            node, depth = stack.pop()
+            if depth > self.max_depth:
+                self.max_depth = depth
+            
+            if isinstance(node, dict):
+                self.objects += 1
+                self.keys_count += len(node)
+                children = node.values()
+            else:
+                self.arrays += 1
+                children = node
+            
+            for child in children:
+                if isinstance(child, (dict, list)):
+                    stack.append((child, depth + 1))
+                else:
+                    self.scalars += 1
+    
+    def to_dict(self) -> Dict[str, int]:
+        """转换为字典"""
+        return {
+            "keys_count": self.keys_count,
+            "objects_count": self.objects,
+            "arrays_count": self.arrays,
+            "values_count": self.scalars,
+            "max_depth": self.max_depth
+        }
+
+
+def collect_stats(obj: Any) -> Dict[str, int]:
+    """统计JSON结构信息（键数量、对象/数组/标量数量、最大嵌套深度）"""
+    structure = StructureStats()
+    structure.add(obj)
+    return structure.to_dict()
+
+
 def count_keys(obj: Any) -> int:
-    """递归计算JSON对象中的键数量"""
-    if isinstance(obj, dict):
-        count = len(obj)
-        for value in obj.values():
-            count += count_keys(value)
-        return count
-    elif isinstance(obj, list):
-        count = 0
-        for item in obj:
-            count += count_keys(item)
-        return count
-    return 0
+    """计算JSON对象中的键数量（非递归实现）"""
+    return collect_stats(obj)["keys_count"]
 
 
 async def validate_json(params: Dict[str, Any]) -> Dict[str, Any]:
@@ -0,0 +1,328 @@
+"""
+JSON 流式格式化工具
+直接在输入字节流上按词法单元重写空白与缩进，不构建对象树
+    - pretty：与 json.dumps(indent=N) 相同的排版（空容器输出为 {} / []）
+    - compact：去除全部多余空白，与 json.dumps(separators=(',', ':')) 相同
+处理过程中同时校验语法，内存占用只与嵌套深度相关，与文档大小无关
+字符串与数字按原样输出（不重新转义，不做键排序）
+"""
+import re
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List
+
+# 支持的格式化模式
+STREAM_MODES = ["pretty", "compact"]
+
+# 默认输出块大小（字节）
+DEFAULT_FLUSH_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+_STRING_CHARS = re.compile(rb'[^"\\\x00-\x1f]*')
+_FULL_STRING = re.compile(rb'"(?:[^"\\\x00-\x1f]|\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4}))*"')
+_ESCAPE = re.compile(rb'\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})')
+_NUMBER = re.compile(rb"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?")
+_NUMBER_CHARS = re.compile(rb"[0-9+\-.eE]*")
+_LITERALS = {ord("t"): b"true", ord("f"): b"false", ord("n"): b"null"}
+
+# 语法状态
+_EXPECT_VALUE = 0
+_EXPECT_KEY = 1
+_EXPECT_COLON = 2
+_AFTER_VALUE = 3
+_END = 4
+
+_OBJECT = ord("{")
+_ARRAY = ord("[")
+_QUOTE = ord('"')
+_BACKSLASH = ord("\\")
+_COMMA = ord(",")
+_COLON = ord(":")
+_CLOSERS = {ord("}"): _OBJECT, ord("]"): _ARRAY}
+_NUMBER_START = frozenset(b"-0123456789")
+
+# 缓存换行缩进的最大层级（更深的层级每次现算）
+_NEWLINE_CACHE_DEPTH = 64
+
+
+class JSONStreamError(ValueError):
+    """流式格式化过程中发现的语法错误"""
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(f"{message}（字节位置 {offset}）")
+        self.offset = offset
+
+
+class JSONStreamFormatter:
+    """
+    增量式 JSON 重排版器
+    用法:
+        formatter = JSONStreamFormatter(mode="pretty", indent=2)
+        for chunk in chunks:
+            out.write(formatter.feed(chunk))
+        out.write(formatter.close())
+    """
+
+    def __init__(self, mode: str = "pretty", indent: int = 2):
+        if mode not in STREAM_MODES:
+            raise ValueError(f"不支持的格式化模式: {mode}，可选: {', '.join(STREAM_MODES)}")
+        self.pretty = mode == "pretty"
+        self._indent = b" " * max(0, int(indent))
+        self._newlines: List[bytes] = []
+        self._stack = bytearray()
+        self._state = _EXPECT_VALUE
+        self._allow_close = False
+        self._pending_open = False
+        self._in_string = False
+        self._string_is_key = False
+        self._carry = b""
+        self._offset = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.max_depth = 0
+
+    def feed(self, chunk: bytes) -> bytes:
+        """输入一块数据，返回可以立即输出的格式化结果"""
+        self.bytes_in += len(chunk)
+        data = self._carry + chunk if self._carry else bytes(chunk)
+        self._carry = b""
+        return self._run(data, final=False)
+
+    def close(self) -> bytes:
+        """结束输入，校验文档完整性并返回剩余输出"""
+        data, self._carry = self._carry, b""
+        output = self._run(data, final=True)
+        if self._in_string:
+            raise JSONStreamError("字符串未结束", self._offset)
+        if self._state != _END:
+            empty = self._state == _EXPECT_VALUE and not self._stack
+            message = "JSON 内容为空" if empty else "JSON 内容不完整"
+            raise JSONStreamError(message, self._offset)
+        return output
+
+    def _newline(self, depth: int) -> bytes:
+        """
+        换行并缩进到指定层级
+        只缓存较浅的层级：按层级全部缓存时内存随深度平方增长，超深嵌套下不可接受
+        """
+        if depth < _NEWLINE_CACHE_DEPTH:
+            while len(self._newlines) <= depth:
+                self._newlines.append(b"\n" + self._indent * len(self._newlines))
+            return self._newlines[depth]
+        return b"\n" + self._indent * depth
+
+    def _value_done(self) -> None:
+        self._state = _AFTER_VALUE if self._stack else _END
+
+    def _run(self, data: bytes, final: bool) -> bytes:
+        out: List[bytes] = []
+        pos = self._process(data, final, out)
+        if pos < len(data):
+            self._carry = data[pos:]
+        self._offset += pos
+        output = b"".join(out)
+        self.bytes_out += len(output)
+        return output
+
+    def _error(self, message: str, pos: int) -> JSONStreamError:
+        return JSONStreamError(message, self._offset + pos)
+
+    def _process(self, data: bytes, final: bool, out: List[bytes]) -> int:
+        """处理数据，返回已消费的字节数（未消费部分留待下一块）"""
+        pretty = self.pretty
+        stack = self._stack
+        size = len(data)
+        pos = 0
+
+        while pos < size:
+            # 字符串内部：整段复制，逐个校验转义
+            if self._in_string:
+                end = _STRING_CHARS.match(data, pos).end()
+                if end > pos:
+                    out.append(data[pos:end])
+                    pos = end
+                if pos >= size:
+                    break
+                char = data[pos]
+                if char == _QUOTE:
+                    out.append(b'"')
+                    pos += 1
+                    self._in_string = False
+                    if self._string_is_key:
+                        self._state = _EXPECT_COLON
+                    else:
+                        self._value_done()
+                elif char == _BACKSLASH:
+                    match = _ESCAPE.match(data, pos)
+                    if match:
+                        out.append(match.group())
+                        pos = match.end()
+                    elif not final and size - pos < 6:
+                        break
+                    else:
+                        raise self._error("非法的转义序列", pos)
+                else:
+                    raise self._error("字符串中包含未转义的控制字符", pos)
+                continue
+
+            pos = _WHITESPACE.match(data, pos).end()
+            if pos >= size:
+                break
+
+            char = data[pos]
+            state = self._state
+
+            if state == _END:
+                raise self._error("JSON 结束后存在多余内容", pos)
+
+            # 容器结束
+            if char in _CLOSERS:
+                if not stack or stack[-1] != _CLOSERS[char]:
+                    raise self._error("括号不匹配", pos)
+                if state != _AFTER_VALUE and not self._allow_close:
+                    raise self._error("容器结束前缺少值（可能存在多余的逗号）", pos)
+                stack.pop()
+                if self._pending_open:
+                    self._pending_open = False
+                elif pretty:
+                    out.append(self._newline(len(stack)))
+                out.append(data[pos:pos + 1])
+                self._allow_close = False
+                self._value_done()
+                pos += 1
+                continue
+
+            # 非空容器的第一个元素：先换行缩进
+            if self._pending_open:
+                out.append(self._newline(len(stack)))
+                self._pending_open = False
+            self._allow_close = False
+
+            if char == _COMMA:
+                if state != _AFTER_VALUE:
+                    raise self._error("意外的逗号", pos)
+                out.append(b",")
+                if pretty:
+                    out.append(self._newline(len(stack)))
+                self._state = _EXPECT_KEY if stack[-1] == _OBJECT else _EXPECT_VALUE
+                pos += 1
+
+            elif char == _COLON:
+                if state != _EXPECT_COLON:
+                    raise self._error("意外的冒号", pos)
+                out.append(b": " if pretty else b":")
+                self._state = _EXPECT_VALUE
+                pos += 1
+
+            elif char == _QUOTE:
+                if state not in (_EXPECT_VALUE, _EXPECT_KEY):
+                    raise self._error("缺少逗号或冒号", pos)
+                # 快速路径：完整的字符串一次匹配输出；跨块或有错误时逐段处理
+                match = _FULL_STRING.match(data, pos)
+                if match:
+                    out.append(match.group())
+                    pos = match.end()
+                    if state == _EXPECT_KEY:
+                        self._state = _EXPECT_COLON
+                    else:
+                        self._value_done()
+                    continue
+                self._string_is_key = state == _EXPECT_KEY
+                self._in_string = True
+                out.append(b'"')
+                pos += 1
+
+            elif state == _EXPECT_KEY:
+                raise self._error("对象键必须是字符串", pos)
+
+            elif state != _EXPECT_VALUE:
+                raise self._error("缺少逗号或冒号", pos)
+
+            elif char == _OBJECT or char == _ARRAY:
+                stack.append(char)
+                if len(stack) > self.max_depth:
+                    self.max_depth = len(stack)
+                out.append(data[pos:pos + 1])
+                self._state = _EXPECT_KEY if char == _OBJECT else _EXPECT_VALUE
+                self._allow_close = True
+                self._pending_open = pretty
+                pos += 1
+
+            elif char in _NUMBER_START:
+                end = _NUMBER_CHARS.match(data, pos).end()
+                if end >= size and not final:
+                    break
+                match = _NUMBER.match(data, pos)
+                if not match or match.end() != end:
+                    raise self._error("非法的数字", pos)
+                out.append(data[pos:end])
+                self._value_done()
+                pos = end
+
+            elif char in _LITERALS:
+                literal = _LITERALS[char]
+                if data.startswith(literal, pos):
+                    out.append(literal)
+                    self._value_done()
+                    pos += len(literal)
+                elif not final and literal.startswith(data[pos:]):
+                    break
+                else:
+                    raise self._error("非法的字面量", pos)
+
+            else:
+                raise self._error(f"意外的字符 {chr(char)!r}", pos)
+
+        return pos
+
+
+def iter_reformat(
+    chunks: Iterable[bytes],
+    mode: str = "pretty",
+    indent: int = 2,
+    flush_size: int = DEFAULT_FLUSH_SIZE
+) -> Iterator[bytes]:
+    """同步流式格式化：输入字节块迭代器，按 flush_size 聚合输出"""
+    formatter = JSONStreamFormatter(mode=mode, indent=indent)
+    buffer: List[bytes] = []
+    buffered = 0
+    for chunk in chunks:
+        output = formatter.feed(chunk)
+        if output:
+            buffer.append(output)
+            buffered += len(output)
+            if buffered >= flush_size:
+                yield b"".join(buffer)
+                buffer, buffered = [], 0
+    buffer.append(formatter.close())
+    tail = b"".join(buffer)
+    if tail:
+        yield tail
+
+
+async def aiter_reformat(
+    chunks: AsyncIterable[bytes],
+    mode: str = "pretty",
+    indent: int = 2,
+    flush_size: int = DEFAULT_FLUSH_SIZE
+) -> AsyncIterator[bytes]:
+    """异步流式格式化：输入异步字节块迭代器（如请求体），按 flush_size 聚合输出"""
+    formatter = JSONStreamFormatter(mode=mode, indent=indent)
+    buffer: List[bytes] = []
+    buffered = 0
+    async for chunk in chunks:
+        output = formatter.feed(chunk)
+        if output:
+            buffer.append(output)
+            buffered += len(output)
+            if buffered >= flush_size:
+                yield b"".join(buffer)
+                buffer, buffered = [], 0
+    buffer.append(formatter.close())
+    tail = b"".join(buffer)
+    if tail:
+        yield tail
+
+
+def reformat(data: bytes, mode: str = "pretty", indent: int = 2) -> bytes:
+    """一次性格式化完整字节串（用于深层嵌套等无法构建对象树的场景）"""
+    formatter = JSONStreamFormatter(mode=mode, indent=indent)
+    return formatter.feed(data) + formatter.close()
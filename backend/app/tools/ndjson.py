@@ -0,0 +1,206 @@
+"""
+JSON Lines / NDJSON 解析工具
+逐行解析，坏行跳过或记录而不中断整体处理
+支持按行分批并行解析（多进程），适合大文件
+输入可以是 str、bytes 或其他支持 find/切片的缓冲区（如 mmap）
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+import logging
+
+from app.core import jsonlib
+
+logger = logging.getLogger(__name__)
+
+# 坏行处理策略：skip 只计数，report 同时返回错误明细
+ON_ERROR_MODES = ["skip", "report"]
+
+# 默认最多返回的坏行明细数量
+DEFAULT_MAX_ERRORS = 100
+
+# 并行解析默认每批行数
+DEFAULT_BATCH_LINES = 5000
+
+# 并行解析进程池（按需创建，固定为 CPU 核数；各请求的 parallel_workers 只限制自己的在途批次数）
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+
+class NDJSONStats:
+    """NDJSON 解析统计"""
+
+    def __init__(self, on_error: str = "skip", max_errors: int = DEFAULT_MAX_ERRORS):
+        if on_error not in ON_ERROR_MODES:
+            raise ValueError(f"不支持的坏行处理方式: {on_error}，可选: {', '.join(ON_ERROR_MODES)}")
+        self.on_error = on_error
+        self.max_errors = max_errors
+        self.total_lines = 0
+        self.blank_lines = 0
+        self.records = 0
+        self.bad_lines = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def record_error(self, line_no: int, message: str) -> None:
+        """记录坏行"""
+        self.bad_lines += 1
+        if self.on_error == "report" and len(self.errors) < self.max_errors:
+            self.errors.append({"line": line_no, "error": message})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        result = {
+            "total_lines": self.total_lines,
+            "blank_lines": self.blank_lines,
+            "records": self.records,
+            "bad_lines": self.bad_lines,
+        }
+        if self.on_error == "report":
+            result["errors"] = self.errors
+            result["errors_truncated"] = self.bad_lines > len(self.errors)
+        return result
+
+
+def iter_lines(source: Union[str, bytes, Any]) -> Iterator[Tuple[int, Union[str, bytes]]]:
+    """
+    逐行切分输入，返回 (行号, 行内容)
+    使用 find 定位换行，不会一次性 split 整个输入
+    """
+    newline = "\n" if isinstance(source, str) else b"\n"
+    size = len(source)
+    start = 0
+    line_no = 0
+
+    while start < size:
+        end = source.find(newline, start)
+        if end == -1:
+            end = size
+        line_no += 1
+        yield line_no, source[start:end]
+        start = end + 1
+
+
+def _parse_line(line: Union[str, bytes]) -> Any:
+    """解析单行 JSON"""
+    return jsonlib.loads(line)
+
+
+def _parse_batch(lines: List[Tuple[int, Union[str, bytes]]]) -> List[Tuple[int, bool, Any]]:
+    """解析一批行（在子进程中执行），返回 (行号, 是否成功, 值或错误信息)"""
+    parsed = []
+    for line_no, line in lines:
+        try:
+            parsed.append((line_no, True, _parse_line(line)))
+        except ValueError as e:
+            parsed.append((line_no, False, str(e)))
+    return parsed
+
+
+def parse_workers(workers: Any) -> int:
+    """校验并行解析进程数：未指定时为 CPU 核数，超过 CPU 核数时按 CPU 核数"""
+    cpus = os.cpu_count() or 1
+    if workers is None:
+        return cpus
+    if isinstance(workers, bool) or not isinstance(workers, int) or workers < 1:
+        raise ValueError("parallel_workers 必须是正整数")
+    return min(workers, cpus)
+
+
+def parse_batch_lines(batch_lines: Any) -> int:
+    """校验并行解析每批行数：未指定时为 DEFAULT_BATCH_LINES"""
+    if batch_lines is None:
+        return DEFAULT_BATCH_LINES
+    if isinstance(batch_lines, bool) or not isinstance(batch_lines, int) or batch_lines < 1:
+        raise ValueError("batch_lines 必须是正整数")
+    return batch_lines
+
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    """获取并行解析进程池（进程生命周期内只创建一次，不会在其他请求使用时被关闭）"""
+    global _parse_pool
+    if _parse_pool is None:
+        with _parse_pool_lock:
+            if _parse_pool is None:
+                _parse_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    return _parse_pool
+
+
+def _iter_batches(
+    lines: Iterator[Tuple[int, Union[str, bytes]]],
+    stats: NDJSONStats,
+    batch_lines: int
+) -> Iterator[List[Tuple[int, Union[str, bytes]]]]:
+    """将非空行按批次分组"""
+    batch = []
+    for line_no, line in lines:
+        stats.total_lines += 1
+        if not line.strip():
+            stats.blank_lines += 1
+            continue
+        batch.append((line_no, line))
+        if len(batch) >= batch_lines:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_ndjson(
+    source: Union[str, bytes, Any],
+    stats: Optional[NDJSONStats] = None,
+    parallel: bool = False,
+    workers: Optional[int] = None,
+    batch_lines: int = DEFAULT_BATCH_LINES
+) -> Iterator[Any]:
+    """
+    逐条产出 NDJSON 记录
+
+    参数:
+        source: NDJSON 文本或字节缓冲区
+        stats: 解析统计（坏行、空行等），可选
+        parallel: 是否按批次并行解析
+        workers: 并行进程数（默认 CPU 核数，不超过 CPU 核数）
+        batch_lines: 并行解析时每批行数
+    """
+    if stats is None:
+        stats = NDJSONStats()
+
+    lines = iter_lines(source)
+
+    if not parallel:
+        for line_no, line in lines:
+            stats.total_lines += 1
+            if not line.strip():
+                stats.blank_lines += 1
+                continue
+            try:
+                record = _parse_line(line)
+            except ValueError as e:
+                stats.record_error(line_no, str(e))
+                continue
+            stats.records += 1
+            yield record
+        return
+
+    # 并行解析：保持最多 workers * 2 个批次在途，按顺序产出
+    pool = _get_parse_pool()
+    window = max(2, parse_workers(workers) * 2)
+    pending = []
+
+    def drain(future) -> Iterator[Any]:
+        for line_no, ok, value in future.result():
+            if ok:
+                stats.records += 1
+                yield value
+            else:
+                stats.record_error(line_no, value)
+
+    for batch in _iter_batches(lines, stats, max(1, batch_lines)):
+        pending.append(pool.submit(_parse_batch, batch))
+        if len(pending) >= window:
+            yield from drain(pending.pop(0))
+
+    while pending:
+        yield from drain(pending.pop(0))
+
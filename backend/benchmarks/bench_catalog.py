@@ -0,0 +1,112 @@
+"""
+导航树 / 工具列表响应基准
+对比每次请求重建并序列化（旧实现：to_dict + success_response + FastAPI 序列化）与预先序列化的快照（200 / 304），
+分别测量处理函数本身的耗时与经 TestClient 的完整请求耗时
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_catalog
+    python -m benchmarks.bench_catalog --tools 200 --json
+"""
+import argparse
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app.core.response import cached_response, success_response
+from app.main import app
+from app.services.tool_registry import ToolMetadata, tool_registry
+
+CATALOGS = {
+    "tools": ("/api/tools/", tool_registry.get_all_tools),
+    "navigation": ("/api/system/navigation", tool_registry.get_navigation_tree),
+}
+
+
+def _request(if_none_match: str = "") -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""})
+
+
+def legacy_handler(build: Callable[[], Any]) -> bytes:
+    """旧实现：每次重建字典，经 ResponseModel 与 jsonable_encoder 后序列化（与 FastAPI 默认路径相同）"""
+    content = jsonable_encoder(success_response(data=build()))
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _timed(func: Callable[[], Any], min_time: float) -> float:
+    """重复运行至少 min_time 秒，返回每次平均耗时（微秒）"""
+    count = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / count * 1e6
+
+
+def run(extra_tools: int, min_time: float) -> List[Dict[str, Any]]:
+    for i in range(extra_tools):
+        tool_registry.register_tool(ToolMetadata(
+            f"bench_tool_{i}", f"基准工具{i}", "基准测试用工具", f"分类{i % 8}", keywords=["基准", "测试"]
+        ))
+    client = TestClient(app)
+    rows = []
+    for name, (url, build) in CATALOGS.items():
+        snapshot = tool_registry.get_catalog_snapshot(name)
+        cases = {
+            "legacy": (lambda: legacy_handler(build), None),
+            "snapshot_200": (
+                lambda: cached_response(_request(), snapshot.body, snapshot.etag),
+                lambda: client.get(url),
+            ),
+            "snapshot_304": (
+                lambda: cached_response(_request(snapshot.etag), snapshot.body, snapshot.etag),
+                lambda: client.get(url, headers={"If-None-Match": snapshot.etag}),
+            ),
+        }
+        for case, (handler, request) in cases.items():
+            rows.append({
+                "catalog": name, "case": case, "tools": len(tool_registry.get_all_tools()),
+                "body_bytes": len(snapshot.body),
+                "handler_us": round(_timed(handler, min_time), 1),
+                # 旧实现已不在路由中，只测处理函数
+                "request_us": round(_timed(request, min_time), 1) if request else None,
+            })
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    """以 Markdown 表格输出"""
+    print("| 目录 | 工具数 | 用例 | 响应体(字节) | 处理耗时(µs) | 完整请求(µs) |")
+    print("|---|---:|---|---:|---:|---:|")
+    for row in rows:
+        request_us = "-" if row["request_us"] is None else row["request_us"]
+        print(
+            f"| {row['catalog']} | {row['tools']} | {row['case']} | {row['body_bytes']} | "
+            f"{row['handler_us']} | {request_us} |"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="导航树 / 工具列表响应基准")
+    parser.add_argument("--tools", type=int, default=0, help="额外注册的工具数（模拟插件较多时）")
+    parser.add_argument("--min-time", type=float, default=1.0, help="每项最少计时（秒）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rows = run(args.tools, args.min_time)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+条码渲染后端扩展性基准
+对比线程池后端与不同进程数的多进程后端的批量生成吞吐（关闭渲染缓存，内容互不相同）
+--transfer：对比工作进程结果随返回值（pickle）传回与通过共享内存传回的单次耗时，用于确定 INLINE_RESULT_MAX
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_code_backend
+    python -m benchmarks.bench_code_backend --items 2000 --workers 1,2,4,8,16,32 --code-type barcode
+    python -m benchmarks.bench_code_backend --transfer
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+from typing import Any, Dict, List
+
+from app.core.config import settings
+from app.tools import code_generator, code_render_pool
+
+
+def run_batch(items: int, code_type: str, max_concurrent: int) -> float:
+    """执行一次批量生成，返回耗时（秒）"""
+    params = {
+        "items": [{"content": f"AETHERIS-{i:08d}"} for i in range(items)],
+        "common_config": {"code_type": code_type},
+        "max_concurrent": max_concurrent,
+        "use_cache": False,
+    }
+    start = time.perf_counter()
+    result = asyncio.run(code_generator.generate_codes_batch(params))
+    elapsed = time.perf_counter() - start
+    if result["success_count"] != items:
+        raise RuntimeError(f"生成失败: {result['fail_count']} 项")
+    return elapsed
+
+
+def run(items: int, workers: List[int], code_type: str) -> List[Dict[str, Any]]:
+    """执行基准并返回结果行"""
+    rows = []
+
+    settings.CODE_GENERATOR_BACKEND = "thread"
+    elapsed = run_batch(items, code_type, max_concurrent=10)
+    rows.append({"backend": "thread", "workers": 10, "seconds": elapsed})
+
+    settings.CODE_GENERATOR_BACKEND = "process"
+    for count in workers:
+        settings.CODE_GENERATOR_WORKERS = count
+        code_render_pool.shutdown()
+        code_render_pool.warm_up()
+        # 并发数与进程数匹配，保证每个进程都有任务
+        elapsed = run_batch(items, code_type, max_concurrent=count * 4)
+        rows.append({"backend": "process", "workers": count, "seconds": elapsed})
+    code_render_pool.shutdown()
+
+    base = rows[0]["seconds"]
+    for row in rows:
+        row["items_per_s"] = round(items / row["seconds"], 1)
+        row["speedup"] = round(base / row["seconds"], 2)
+        row["seconds"] = round(row["seconds"], 3)
+    return rows
+
+
+def _export_case(size: int, inline: bool) -> Any:
+    """工作进程内：导出 size 字节的结果"""
+    return code_render_pool._export_bytes(bytes(size), inline_max=size + 1 if inline else 0)
+
+
+def run_transfer(sizes: List[int], number: int = 200) -> List[Dict[str, Any]]:
+    """单次派发并取回结果的耗时（µs，多轮取最快），两种方式交替测量"""
+    rows = []
+    # 与 code_render_pool 相同：工作进程共用主进程的资源跟踪器
+    resource_tracker.ensure_running()
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        pool.submit(os.getpid).result()
+        for size in sizes:
+            best = {True: float("inf"), False: float("inf")}
+            for _ in range(5):
+                for inline in (True, False):
+                    start = time.perf_counter()
+                    for _ in range(number):
+                        payload = pool.submit(_export_case, size, inline).result()
+                        code_render_pool._import_bytes(payload, size)
+                    best[inline] = min(best[inline], (time.perf_counter() - start) / number * 1e6)
+            rows.append({"size": size, "inline_us": round(best[True], 1), "shm_us": round(best[False], 1)})
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]], items: int, code_type: str) -> None:
+    """以 Markdown 表格输出"""
+    print(f"CPU 核心数: {os.cpu_count()}，条目数: {items}，类型: {code_type}")
+    print("| 后端 | 线程/进程数 | 耗时(s) | 吞吐(个/s) | 相对线程池 |")
+    print("|---|---:|---:|---:|---:|")
+    for row in rows:
+        print(
+            f"| {row['backend']} | {row['workers']} | {row['seconds']} | "
+            f"{row['items_per_s']} | {row['speedup']}x |"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="条码渲染后端扩展性基准")
+    parser.add_argument("--items", type=int, default=1000, help="批量条目数")
+    parser.add_argument("--workers", default=None,
+                        help="逗号分隔的进程数，默认 1,2,4... 直到 CPU 核心数")
+    parser.add_argument("--code-type", default="qrcode", choices=["qrcode", "barcode"])
+    parser.add_argument("--transfer", action="store_true", help="只测量结果传回方式（返回值 / 共享内存）的耗时")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    if args.transfer:
+        sizes = [4 * 1024, 32 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024]
+        rows = run_transfer(sizes)
+        if args.json:
+            print(json.dumps(rows, ensure_ascii=False, indent=2))
+            return
+        print("| 结果大小 | 返回值(µs) | 共享内存(µs) |\n|---:|---:|---:|")
+        for row in rows:
+            print(f"| {row['size'] // 1024}KB | {row['inline_us']} | {row['shm_us']} |")
+        return
+
+    if args.workers:
+        workers = [int(w) for w in args.workers.split(",") if w]
+    else:
+        cpu_count = os.cpu_count() or 1
+        workers = [1]
+        while workers[-1] * 2 <= cpu_count:
+            workers.append(workers[-1] * 2)
+        if workers[-1] != cpu_count:
+            workers.append(cpu_count)
+
+    rows = run(args.items, workers, args.code_type)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print_table(rows, args.items, args.code_type)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+批量条目来源基准
+对比 JSON 请求体（BatchCodeGenerateRequest 校验 + 逐项合并通用配置）与流式 CSV/NDJSON 条目来源
+解析全部条目的耗时与峰值内存（tracemalloc），只测解析，不生成条码
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_code_batch_source
+    python -m benchmarks.bench_code_batch_source --rows 10000 100000 1000000 --json
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from typing import Any, AsyncIterator, Callable, Dict, List
+
+from app.api.endpoints.tools import BatchCodeGenerateRequest
+from app.tools.code_batch_source import CodeItemSource
+
+COMMON_CONFIG = {"code_type": "qrcode", "qr_box_size": 4, "output_format": "PNG"}
+CHUNK_SIZE = 64 * 1024
+
+
+def make_bodies(rows: int) -> Dict[str, bytes]:
+    """同一批条目的三种请求体"""
+    contents = [f"AETHERIS-{i:08d}" for i in range(rows)]
+    return {
+        "json": json.dumps({
+            "items": [{"content": c, "qr_border": 2} for c in contents],
+            "common_config": COMMON_CONFIG
+        }).encode(),
+        "csv": ("content,qr_border\n" + "".join(f"{c},2\n" for c in contents)).encode(),
+        "ndjson": "".join(f'{{"content":"{c}","qr_border":2}}\n' for c in contents).encode(),
+    }
+
+
+async def _chunks(body: bytes) -> AsyncIterator[bytes]:
+    """模拟按块到达的请求体"""
+    for start in range(0, len(body), CHUNK_SIZE):
+        yield body[start:start + CHUNK_SIZE]
+
+
+def parse_json(body: bytes) -> int:
+    request = BatchCodeGenerateRequest.model_validate_json(body)
+    count = 0
+    for item in request.items:
+        {**request.common_config, **item}
+        count += 1
+    return count
+
+
+def parse_source(source_format: str) -> Callable[[bytes], int]:
+    def parse(body: bytes) -> int:
+        async def consume() -> int:
+            count = 0
+            async for _ in CodeItemSource(_chunks(body), source_format, common_config=COMMON_CONFIG):
+                count += 1
+            return count
+        return asyncio.run(consume())
+    return parse
+
+
+def measure(parse: Callable[[bytes], int], body: bytes) -> Dict[str, Any]:
+    """解析耗时与峰值内存（不含请求体本身；tracemalloc 会拖慢解析，耗时单独测量）"""
+    start = time.perf_counter()
+    count = parse(body)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    parse(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"items": count, "seconds": round(elapsed, 3), "peak_mb": round(peak / 1024 / 1024, 2)}
+
+
+def run(row_counts: List[int]) -> List[Dict[str, Any]]:
+    rows = []
+    parsers = {"json": parse_json, "csv": parse_source("csv"), "ndjson": parse_source("ndjson")}
+    for count in row_counts:
+        bodies = make_bodies(count)
+        for name, parse in parsers.items():
+            result = measure(parse, bodies[name])
+            rows.append({"rows": count, "source": name, "body_mb": round(len(bodies[name]) / 1024 / 1024, 1), **result})
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    """以 Markdown 表格输出"""
+    print("| 条目数 | 来源 | 请求体(MB) | 解析耗时(s) | 峰值内存(MB) | 每万条耗时(ms) |")
+    print("|---:|---|---:|---:|---:|---:|")
+    for row in rows:
+        per_10k = row["seconds"] / row["rows"] * 10000 * 1000
+        print(
+            f"| {row['rows']} | {row['source']} | {row['body_mb']} | {row['seconds']} | "
+            f"{row['peak_mb']} | {per_10k:.1f} |"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量条目来源基准")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 500000], help="条目数")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    rows = run(args.rows)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
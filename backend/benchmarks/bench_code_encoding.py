@@ -0,0 +1,116 @@
+"""
+条码图片编码配置基准
+对比 RGBA PNG（原输出方式，zlib 6 级）与各编码配置的编码耗时和文件大小
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_code_encoding
+    python -m benchmarks.bench_code_encoding --repeat 50 --format WEBP --json
+"""
+import argparse
+import io
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+from PIL import Image, ImageDraw
+
+from app.tools import code_encoding, code_generator
+from app.tools.code_generator import CodeGeneratorConfig
+
+
+def _template() -> Image.Image:
+    """纯色块组成的标签模板（颜色数少，可转为调色板）"""
+    img = Image.new('RGB', (800, 500), '#f4f1e8')
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, 800, 80), fill='#1a4d8f')
+    draw.rectangle((20, 420, 780, 480), outline='#333333', width=3)
+    return img
+
+
+def cases() -> Dict[str, Image.Image]:
+    """基准用例：最终输出图片（未编码）"""
+    buffer = io.BytesIO()
+    _template().save(buffer, format='PNG')
+    template_id = code_generator.template_registry.register(buffer.getvalue())["template_id"]
+    configs = {
+        "二维码 黑白": CodeGeneratorConfig(content="https://example.com/aetheris/" + "x" * 60),
+        "二维码 彩色": CodeGeneratorConfig(
+            content="https://example.com/aetheris", qr_fill_color="#1a4d8f", qr_back_color="#fff8e0"
+        ),
+        "条形码 code128": CodeGeneratorConfig(content="AETHERIS-000001", code_type="barcode"),
+        "条形码 缩放 600x200": CodeGeneratorConfig(
+            content="AETHERIS-000001", code_type="barcode", output_width=600, output_height=200
+        ),
+        "模板合成 800x500": CodeGeneratorConfig(
+            content="AETHERIS-000001", use_template=True, template_id=template_id,
+            position_x=500, position_y=150
+        ),
+    }
+    return {
+        name: code_generator.build_final_image(config, None, code_generator._disabled_cache)
+        for name, config in configs.items()
+    }
+
+
+def measure(encode: Callable[[], bytes], repeat: int) -> Dict[str, Any]:
+    """多次编码取平均耗时"""
+    data = encode()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encode()
+    return {"ms": (time.perf_counter() - start) / repeat * 1000, "bytes": len(data)}
+
+
+def run(repeat: int, output_format: str) -> List[Dict[str, Any]]:
+    """执行基准并返回结果行"""
+    rows = []
+    for name, img in cases().items():
+        rgba = img.convert('RGBA') if output_format != 'JPEG' else img.convert('RGB')
+
+        def encode_rgba() -> bytes:
+            buffer = io.BytesIO()
+            rgba.save(buffer, format=output_format, quality=95)
+            return buffer.getvalue()
+
+        base = measure(encode_rgba, repeat)
+        rows.append({"case": name, "profile": "RGBA（原方式）", **base})
+        for profile in code_encoding.ENCODING_PROFILES:
+            result = measure(
+                lambda: code_encoding.encode(img, output_format, 95, profile), repeat
+            )
+            rows.append({"case": name, "profile": profile, **result})
+        for row in rows[-len(code_encoding.ENCODING_PROFILES) - 1:]:
+            row["size_ratio"] = round(base["bytes"] / row["bytes"], 1)
+            row["speedup"] = round(base["ms"] / row["ms"], 1)
+            row["ms"] = round(row["ms"], 3)
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]], output_format: str) -> None:
+    """以 Markdown 表格输出"""
+    print(f"输出格式: {output_format}")
+    print("| 用例 | 编码配置 | 编码耗时(ms) | 大小(字节) | 缩小倍数 | 编码加速 |")
+    print("|---|---|---:|---:|---:|---:|")
+    for row in rows:
+        print(
+            f"| {row['case']} | {row['profile']} | {row['ms']} | {row['bytes']} | "
+            f"{row['size_ratio']}x | {row['speedup']}x |"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="条码图片编码配置基准")
+    parser.add_argument("--repeat", type=int, default=30, help="每项编码次数")
+    parser.add_argument("--format", default="PNG", choices=list(code_generator.OUTPUT_MEDIA_TYPES))
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    rows = run(args.repeat, args.format)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print_table(rows, args.format)
+
+
+if __name__ == "__main__":
+    main()
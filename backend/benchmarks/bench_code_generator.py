@@ -0,0 +1,377 @@
+"""
+条码生成渲染路径基准套件
+覆盖二维码（不同版本与纠错级别）、全部条形码格式、缩放、模板合成、全部输出格式，
+以及不同批量大小与 max_concurrent 的批量生成；报告 ops/s、p50/p99 延迟、峰值 RSS 与输出大小。
+单项用例直接调用 generate_single_code（关闭渲染缓存，测的是完整渲染+编码）；
+批量用例经 iter_codes_batch 调度，延迟为条目从提交到完成的时间。
+
+结果可保存为 JSON 基线，之后与基线对比，耗时增加超过阈值或输出大小变化时以非 0 退出：
+    python -m benchmarks.bench_code_generator --save benchmarks/baselines/code_generator.json
+    python -m benchmarks.bench_code_generator --compare benchmarks/baselines/code_generator.json
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_code_generator                     # 单项用例 + 批量 1~1000
+    python -m benchmarks.bench_code_generator --full              # 批量包含 10000
+    python -m benchmarks.bench_code_generator --only qr_ barcode_ --repeat 100
+"""
+import argparse
+import asyncio
+import functools
+import io
+import json
+import math
+import os
+import platform
+import sys
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import PIL
+from PIL import Image, ImageDraw
+
+from app.core.config import settings
+from app.core.memory import PeakRSSTracker
+from app.tools import code_generator
+from app.tools.code_generator import CodeGeneratorConfig
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "code_generator.json")
+
+QR_VERSIONS = [1, 5, 10, 20, 40]
+QR_ERROR_CORRECT = ["L", "M", "Q", "H"]
+BATCH_SIZES = [1, 10, 100, 1000]
+FULL_BATCH_SIZES = BATCH_SIZES + [10000]
+BATCH_CONCURRENCY = [1, 10, 50]
+
+# 各条形码格式的有效示例内容（不含校验位的格式由库补齐）
+BARCODE_CONTENTS = {
+    "code128": "AETHERIS-000001",
+    "code39": "AETHERIS1",
+    "ean13": "590123412345",
+    "ean8": "9638507",
+    "upca": "03600029145",
+    "isbn13": "978030640615",
+    "isbn10": "0306406152",
+    "issn": "0378595",
+    "pzn": "123456",
+}
+
+
+def _register_template() -> str:
+    """注册基准用的标签模板（纯色块，800x500）"""
+    img = Image.new('RGB', (800, 500), '#f4f1e8')
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, 800, 80), fill='#1a4d8f')
+    draw.rectangle((20, 420, 780, 480), outline='#333333', width=3)
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return code_generator.template_registry.register(buffer.getvalue())["template_id"]
+
+
+def single_cases() -> Dict[str, Dict[str, Any]]:
+    """单项用例：名称 -> 配置"""
+    cases: Dict[str, Dict[str, Any]] = {}
+    for version in QR_VERSIONS:
+        for level in QR_ERROR_CORRECT:
+            cases[f"qr_v{version}_{level}"] = {
+                "content": "https://example.com/aetheris", "qr_version": version,
+                "qr_error_correct": level, "qr_box_size": 4,
+            }
+    for barcode_format in code_generator.BARCODE_TYPES:
+        cases[f"barcode_{barcode_format}"] = {
+            "content": BARCODE_CONTENTS[barcode_format], "code_type": "barcode",
+            "barcode_format": barcode_format,
+        }
+    cases["resize_qr_fit_600"] = {
+        "content": "https://example.com/aetheris", "output_width": 600, "output_height": 600,
+    }
+    cases["resize_qr_stretch_600x300"] = {
+        "content": "https://example.com/aetheris", "output_width": 600, "output_height": 300,
+        "qr_resize_mode": "stretch",
+    }
+    cases["resize_barcode_600x200"] = {
+        "content": "AETHERIS-000001", "code_type": "barcode", "output_width": 600, "output_height": 200,
+    }
+    template_id = _register_template()
+    cases["template_qr_800x500"] = {
+        "content": "https://example.com/aetheris", "use_template": True, "template_id": template_id,
+        "position_x": 500, "position_y": 150,
+    }
+    cases["template_barcode_800x500"] = {
+        "content": "AETHERIS-000001", "code_type": "barcode", "use_template": True,
+        "template_id": template_id, "position_x": 100, "position_y": 200,
+    }
+    for output_format in code_generator.OUTPUT_MEDIA_TYPES:
+        cases[f"format_qr_{output_format.lower()}"] = {
+            "content": "https://example.com/aetheris", "output_format": output_format,
+        }
+        cases[f"format_barcode_{output_format.lower()}"] = {
+            "content": "AETHERIS-000001", "code_type": "barcode", "output_format": output_format,
+        }
+    return cases
+
+
+def calibrate(repeat: int = 20) -> float:
+    """
+    固定参考负载的最短耗时（毫秒），与条码代码无关：Python 循环 + Pillow 缩放 + zlib 压缩
+    记录在基线环境信息中，用于判断两次运行时机器整体快慢是否相近（实测按其逐项折算反而放大噪声，对比不使用）
+    """
+    img = Image.linear_gradient('L').resize((400, 400))
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        total = 0
+        for i in range(20000):
+            total += i * i % 7
+        data = img.resize((800, 800), Image.Resampling.NEAREST).tobytes()
+        zlib.compress(data, 6)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _cost(row: Dict[str, Any]) -> float:
+    """
+    用于对比的耗时（毫秒）：
+    单项用例取最短耗时（受偶发争用影响最小），批量用例取每项平均耗时（p50 主要是排队时间）
+    """
+    return row["min_ms"] if row["kind"] == "single" else 1000 / row["ops_per_s"]
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """最近秩百分位数"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def _summary(latencies: List[float], elapsed: float, tracker: PeakRSSTracker) -> Dict[str, Any]:
+    memory = tracker.to_dict()
+    peak = memory.get("rss_peak")
+    start = memory.get("rss_start")
+    return {
+        "ops": len(latencies),
+        "ops_per_s": round(len(latencies) / elapsed, 1),
+        "min_ms": round(min(latencies) * 1000, 3),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+        "peak_rss_mb": round(peak / 1024 / 1024, 1) if peak else None,
+        "rss_delta_mb": round((peak - start) / 1024 / 1024, 1) if peak and start else None,
+    }
+
+
+def run_single(name: str, params: Dict[str, Any], repeat: int, min_time: float) -> Dict[str, Any]:
+    """单项用例：预热一次后重复生成，逐次计时（至少 repeat 次且至少 min_time 秒）"""
+    config = CodeGeneratorConfig(**params)
+    cache = code_generator._disabled_cache
+    result = code_generator.generate_single_code(config, None, cache, binary=True)
+    if not result.get("success"):
+        raise RuntimeError(f"{name} 生成失败: {result.get('error')}")
+
+    latencies = []
+    with PeakRSSTracker() as tracker:
+        start = time.perf_counter()
+        while len(latencies) < repeat or time.perf_counter() - start < min_time:
+            began = time.perf_counter()
+            code_generator.generate_single_code(config, None, cache, binary=True)
+            latencies.append(time.perf_counter() - began)
+        elapsed = time.perf_counter() - start
+    return {"case": name, "kind": "single", **_summary(latencies, elapsed, tracker),
+            "output_bytes": len(result["data"])}
+
+
+async def _run_batch(size: int, max_concurrent: int, code_type: str) -> Tuple[List[float], int, int]:
+    submitted: Dict[int, float] = {}
+
+    async def items():
+        for index in range(size):
+            submitted[index] = time.perf_counter()
+            yield {"content": f"AETHERIS-{index:08d}"}
+
+    latencies = []
+    output_bytes = 0
+    failures = 0
+    async for index, result in code_generator.iter_codes_batch(
+        items(), common_config={"code_type": code_type}, max_concurrent=max_concurrent,
+        use_cache=False, binary=True
+    ):
+        latencies.append(time.perf_counter() - submitted.pop(index))
+        if result.get("success"):
+            output_bytes += len(result["data"])
+        else:
+            failures += 1
+    return latencies, output_bytes, failures
+
+
+def run_batch(size: int, max_concurrent: int, code_type: str) -> Dict[str, Any]:
+    """批量用例：内容互不相同、关闭渲染缓存"""
+    with PeakRSSTracker() as tracker:
+        start = time.perf_counter()
+        latencies, output_bytes, failures = asyncio.run(_run_batch(size, max_concurrent, code_type))
+        elapsed = time.perf_counter() - start
+    if failures:
+        raise RuntimeError(f"批量生成失败: {failures} 项")
+    return {"case": f"batch_{code_type}_{size}_c{max_concurrent}", "kind": "batch",
+            **_summary(latencies, elapsed, tracker), "output_bytes": output_bytes}
+
+
+def run(
+    repeat: int,
+    min_time: float,
+    rounds: int,
+    batch_sizes: List[int],
+    concurrency: List[int],
+    only: Optional[List[str]] = None,
+    log: Callable[[str], None] = lambda message: None
+) -> List[Dict[str, Any]]:
+    """执行基准并返回结果行"""
+    def selected(name: str) -> bool:
+        return not only or any(name.startswith(prefix) for prefix in only)
+
+    runners: Dict[str, Callable[[], Dict[str, Any]]] = {}
+    for name, params in single_cases().items():
+        runners[name] = functools.partial(run_single, name, params, repeat, min_time)
+    for code_type in ("qrcode", "barcode"):
+        for size in batch_sizes:
+            for max_concurrent in concurrency:
+                if max_concurrent > size and max_concurrent != concurrency[0]:
+                    continue
+                runners[f"batch_{code_type}_{size}_c{max_concurrent}"] = functools.partial(
+                    run_batch, size, max_concurrent, code_type
+                )
+
+    # 全部用例分多轮交替运行，每个用例取耗时最小的一轮（排除共享 CPU 的阶段性降频/争用）
+    best: Dict[str, Dict[str, Any]] = {}
+    for round_no in range(rounds):
+        for name, runner in runners.items():
+            if not selected(name):
+                continue
+            log(f"{name}（第 {round_no + 1}/{rounds} 轮）")
+            row = runner()
+            if name not in best or _cost(row) < _cost(best[name]):
+                best[name] = row
+    return list(best.values())
+
+
+def environment() -> Dict[str, Any]:
+    """基线的运行环境（不同机器的基线不可直接比较）"""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pillow": PIL.__version__,
+        "backend": settings.CODE_GENERATOR_BACKEND,
+        "calibration_ms": round(calibrate(), 3),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(
+    rows: List[Dict[str, Any]],
+    baseline: Dict[str, Any],
+    threshold: float
+) -> List[Dict[str, Any]]:
+    """
+    与基线对比：耗时（见 _cost）增加超过阈值或输出大小变化记为回归
+    """
+    base_rows = {row["case"]: row for row in baseline.get("results", [])}
+    report = []
+    for row in rows:
+        base = base_rows.get(row["case"])
+        if base is None:
+            report.append({"case": row["case"], "status": "new"})
+            continue
+        change = _cost(row) / _cost(base) - 1
+        status = "ok"
+        if change > threshold:
+            status = "slower"
+        elif change < -threshold:
+            status = "faster"
+        if row["output_bytes"] != base["output_bytes"]:
+            status = "output_changed" if status in ("ok", "faster") else status + "+output_changed"
+        report.append({
+            "case": row["case"], "status": status,
+            "cost": round(_cost(row), 3), "baseline_cost": round(_cost(base), 3),
+            "change": round(change * 100, 1),
+            "output_bytes": row["output_bytes"], "baseline_output_bytes": base["output_bytes"],
+        })
+    return report
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    """以 Markdown 表格输出"""
+    print("| 用例 | ops/s | 最短(ms) | p50(ms) | p99(ms) | 峰值RSS(MB) | RSS增量(MB) | 输出(字节) |")
+    print("|---|---:|---:|---:|---:|---:|---:|---:|")
+    for row in rows:
+        print(
+            f"| {row['case']} | {row['ops_per_s']} | {row['min_ms']} | {row['p50_ms']} | {row['p99_ms']} | "
+            f"{row['peak_rss_mb']} | {row['rss_delta_mb']} | {row['output_bytes']} |"
+        )
+
+
+def print_report(report: List[Dict[str, Any]], threshold: float) -> None:
+    """输出与基线的对比"""
+    print(f"\n与基线对比（耗时变化阈值 ±{threshold * 100:.0f}%）:")
+    print("| 用例 | 状态 | 耗时(ms) | 基线耗时(ms) | 变化(%) | 输出(字节) | 基线输出(字节) |")
+    print("|---|---|---:|---:|---:|---:|---:|")
+    for item in report:
+        if item["status"] == "new":
+            print(f"| {item['case']} | new | | | | | |")
+            continue
+        print(
+            f"| {item['case']} | {item['status']} | {item['cost']} | {item['baseline_cost']} | "
+            f"{item['change']} | {item['output_bytes']} | {item['baseline_output_bytes']} |"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="条码生成渲染路径基准套件")
+    parser.add_argument("--repeat", type=int, default=30, help="单项用例的最少生成次数")
+    parser.add_argument("--min-time", type=float, default=0.3, help="单项用例每轮的最少计时（秒）")
+    parser.add_argument("--rounds", type=int, default=3, help="轮数（每个用例取耗时最小的一轮）")
+    parser.add_argument("--full", action="store_true", help="批量大小包含 10000")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=None, help="批量大小")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=BATCH_CONCURRENCY,
+                        help="批量的 max_concurrent")
+    parser.add_argument("--only", nargs="+", default=None, help="只运行名称以这些前缀开头的用例")
+    parser.add_argument("--save", nargs="?", const=DEFAULT_BASELINE, default=None, help="保存为 JSON 基线")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, default=None, help="与 JSON 基线对比")
+    parser.add_argument("--threshold", type=float, default=0.5, help="耗时增加超过该比例记为回归")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    batch_sizes = args.batch_sizes or (FULL_BATCH_SIZES if args.full else BATCH_SIZES)
+    rows = run(
+        args.repeat, args.min_time, args.rounds, batch_sizes, args.concurrency, args.only,
+        log=lambda name: print(f"运行 {name} ...", file=sys.stderr)
+    )
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print_table(rows)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "repeat": args.repeat, "min_time": args.min_time,
+                       "rounds": args.rounds, "results": rows},
+                      f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\n基线已保存: {args.save}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        report = compare(rows, baseline, args.threshold)
+        base_calibration = baseline.get("environment", {}).get("calibration_ms")
+        if base_calibration:
+            print(f"\n参考负载: 本次 {calibrate():.2f}ms，基线 {base_calibration}ms"
+                  "（相差较大时说明机器整体快慢不同，对比结果不可靠）", file=sys.stderr)
+        print_report(report, args.threshold)
+        regressions = [item for item in report if item["status"] not in ("ok", "faster", "new")]
+        if regressions:
+            print(f"\n发现 {len(regressions)} 项回归", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
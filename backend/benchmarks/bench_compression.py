@@ -0,0 +1,122 @@
+"""
+响应压缩基准
+对典型的大响应（批量条码 JSON（base64 图片）、格式化 JSON、CSV、NDJSON 流）测量各编码/级别的压缩率与压缩速度，
+以及流式响应逐块同步刷新相对一次性压缩的损失
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_compression
+    python -m benchmarks.bench_compression --size 20 --json
+"""
+import argparse
+import base64
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+from app.core import compression
+from app.core.compression import StreamEncoder
+
+# 每种编码测试的级别（中间件默认值为 gzip 1、br 4、zstd 3）
+LEVELS = {"gzip": [1, 6, 9], "br": [1, 4, 6], "zstd": [1, 3, 9]}
+STREAM_CHUNK = 4 * 1024
+
+
+def make_payloads(size_mb: int) -> Dict[str, bytes]:
+    """约 size_mb MB 的各类响应体"""
+    target = size_mb * 1024 * 1024
+    # 批量结果：base64 的 PNG 本身已压缩，只有 base64 字符集的冗余
+    items, total = [], 0
+    while total < target:
+        png = os.urandom(1500)
+        item = {"success": True, "content": f"AETHERIS-{len(items):08d}", "format": "PNG",
+                "image_base64": base64.b64encode(png).decode(), "size": len(png)}
+        items.append(item)
+        total += 2100
+    records = [{"id": i, "name": f"用户{i}", "email": f"user{i}@example.com", "score": i * 0.5}
+               for i in range(target // 140)]
+    return {
+        "batch_json": json.dumps({"code": 0, "data": {"results": items}}).encode(),
+        "formatted_json": json.dumps(records, ensure_ascii=False, indent=2).encode(),
+        "csv": ("id,name,email,score\n" + "".join(
+            f"{r['id']},{r['name']},{r['email']},{r['score']}\n" for r in records)).encode(),
+        "ndjson_stream": "".join(json.dumps(item) + "\n" for item in items).encode(),
+    }
+
+
+def _factory(encoding: str, level: int) -> StreamEncoder:
+    return {
+        "gzip": compression._gzip_encoder,
+        "br": compression._brotli_encoder,
+        "zstd": compression._zstd_encoder,
+    }[encoding](level)
+
+
+def compress_once(encoding: str, level: int, body: bytes) -> int:
+    encoder = _factory(encoding, level)
+    return len(encoder.compress(body) + encoder.finish())
+
+
+def compress_chunked(encoding: str, level: int, body: bytes) -> int:
+    """流式：每块压缩后同步刷新（与中间件处理流式响应相同）"""
+    encoder = _factory(encoding, level)
+    size = 0
+    for start in range(0, len(body), STREAM_CHUNK):
+        size += len(encoder.compress(body[start:start + STREAM_CHUNK]) + encoder.flush())
+    return size + len(encoder.finish())
+
+
+def run(size_mb: int) -> List[Dict[str, Any]]:
+    rows = []
+    encodings = compression.available_encodings()
+    for name, body in make_payloads(size_mb).items():
+        compress = compress_chunked if name == "ndjson_stream" else compress_once
+        for encoding in encodings:
+            for level in LEVELS[encoding]:
+                start = time.thread_time()
+                size = compress(encoding, level, body)
+                cpu = time.thread_time() - start
+                rows.append({
+                    "payload": name, "encoding": encoding, "level": level,
+                    "mb_in": round(len(body) / 1024 / 1024, 2), "ratio": round(size / len(body), 3),
+                    "mb_per_s": round(len(body) / 1024 / 1024 / cpu, 1) if cpu else None,
+                    "cpu_ms": round(cpu * 1000, 1),
+                })
+        if name == "ndjson_stream":
+            # 逐块刷新相对一次性压缩的压缩率损失
+            for encoding in encodings:
+                level = LEVELS[encoding][1]
+                rows.append({
+                    "payload": "ndjson_once", "encoding": encoding, "level": level,
+                    "mb_in": round(len(body) / 1024 / 1024, 2),
+                    "ratio": round(compress_once(encoding, level, body) / len(body), 3),
+                    "mb_per_s": None, "cpu_ms": None,
+                })
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    """以 Markdown 表格输出"""
+    print("| 内容 | 编码 | 级别 | 大小(MB) | 压缩率 | 速度(MB/s) | CPU(ms) |")
+    print("|---|---|---:|---:|---:|---:|---:|")
+    for row in rows:
+        speed = "-" if row["mb_per_s"] is None else row["mb_per_s"]
+        cpu = "-" if row["cpu_ms"] is None else row["cpu_ms"]
+        print(f"| {row['payload']} | {row['encoding']} | {row['level']} | {row['mb_in']} | {row['ratio']} | {speed} | {cpu} |")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="响应压缩基准")
+    parser.add_argument("--size", type=int, default=10, help="每类内容的大小（MB，约数）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    rows = run(args.size)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
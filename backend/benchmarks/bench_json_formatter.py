@@ -0,0 +1,155 @@
+"""
+JSON格式化性能基准
+对比旧实现（标准库 json，总是输出 formatted + compressed，递归统计键数量）
+与新实现（orjson 加速、按需输出、非递归统计）
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_json_formatter
+    python -m benchmarks.bench_json_formatter --sizes 1KB,1MB,100MB,500MB --repeat 3
+"""
+import argparse
+import asyncio
+import json
+import random
+import string
+import time
+from typing import Any, Dict, List
+
+from app.core import jsonlib
+from app.core.memory import PeakRSSTracker
+from app.tools.json_formatter import format_json
+from app.tools.json_stream_formatter import iter_reformat
+
+SIZE_UNITS = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    """解析 1KB / 10MB 之类的大小"""
+    text = text.strip().upper()
+    for unit, factor in SIZE_UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def make_document(target_size: int, seed: int = 42) -> str:
+    """生成接近目标大小的典型业务 JSON（对象数组、嵌套对象、字符串与数字混合）"""
+    rng = random.Random(seed)
+
+    def record(i: int) -> Dict[str, Any]:
+        return {
+            "id": i,
+            "name": "".join(rng.choices(string.ascii_letters, k=12)),
+            "price": round(rng.random() * 1000, 2),
+            "active": rng.random() > 0.5,
+            "tags": [rng.choice(["a", "b", "c", "中文", "emoji"]) for _ in range(3)],
+            "owner": {"city": rng.choice(["北京", "上海", "广州"]), "level": rng.randint(1, 9)},
+        }
+
+    sample = json.dumps(record(0), ensure_ascii=False)
+    count = max(1, target_size // (len(sample.encode("utf-8")) + 1))
+    return json.dumps([record(i) for i in range(count)], ensure_ascii=False)
+
+
+def legacy_format(input_text: str) -> Dict[str, Any]:
+    """旧实现：两次标准库编码 + 递归统计"""
+    def count_keys(obj: Any) -> int:
+        if isinstance(obj, dict):
+            return len(obj) + sum(count_keys(v) for v in obj.values())
+        if isinstance(obj, list):
+            return sum(count_keys(v) for v in obj)
+        return 0
+
+    data = json.loads(input_text)
+    formatted = json.dumps(data, indent=2, ensure_ascii=False)
+    compressed = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+    return {"formatted": formatted, "compressed": compressed, "keys_count": count_keys(data)}
+
+
+def stream_reformat(input_text: str, mode: str) -> int:
+    """流式格式化：按 64KB 分块输入，只统计输出字节数"""
+    data = input_text.encode("utf-8")
+    chunks = (data[i:i + 65536] for i in range(0, len(data), 65536))
+    return sum(len(chunk) for chunk in iter_reformat(chunks, mode=mode))
+
+
+def measure(func, repeat: int) -> Dict[str, float]:
+    """多次运行取最好耗时，同时记录峰值内存增量"""
+    best = float("inf")
+    peak_delta = 0
+    for _ in range(repeat):
+        with PeakRSSTracker() as tracker:
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        delta = tracker.to_dict()["rss_peak_delta"] or 0
+        peak_delta = max(peak_delta, delta)
+    return {"seconds": best, "peak_rss_delta_mb": peak_delta / 1024 ** 2}
+
+
+def run(sizes: List[str], repeat: int) -> List[Dict[str, Any]]:
+    """执行基准并返回结果行"""
+    cases = {
+        "legacy(json, both+count)": lambda text: legacy_format(text),
+        "new(all outputs)": lambda text: asyncio.run(format_json({"input": text})),
+        "new(compressed only)": lambda text: asyncio.run(
+            format_json({"input": text, "outputs": ["compressed"]})
+        ),
+        "new(stats only)": lambda text: asyncio.run(
+            format_json({"input": text, "outputs": ["stats"]})
+        ),
+        "new(all, fast=False)": lambda text: asyncio.run(
+            format_json({"input": text, "fast": False})
+        ),
+        "stream(pretty)": lambda text: stream_reformat(text, "pretty"),
+        "stream(compact)": lambda text: stream_reformat(text, "compact"),
+    }
+
+    rows = []
+    for size_text in sizes:
+        text = make_document(parse_size(size_text))
+        actual_mb = len(text.encode("utf-8")) / 1024 ** 2
+        for name, case in cases.items():
+            result = measure(lambda: case(text), repeat)
+            rows.append({
+                "size": size_text,
+                "actual_mb": round(actual_mb, 3),
+                "case": name,
+                "ms": round(result["seconds"] * 1000, 2),
+                "mb_per_s": round(actual_mb / result["seconds"], 1) if result["seconds"] else None,
+                "peak_rss_delta_mb": round(result["peak_rss_delta_mb"], 1),
+            })
+        del text
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    """以 Markdown 表格输出"""
+    print(f"orjson 加速: {'是' if jsonlib.is_accelerated() else '否'}")
+    print("| 大小 | 用例 | 耗时(ms) | 吞吐(MB/s) | 峰值内存增量(MB) |")
+    print("|---|---|---:|---:|---:|")
+    for row in rows:
+        print(
+            f"| {row['size']} | {row['case']} | {row['ms']} | "
+            f"{row['mb_per_s']} | {row['peak_rss_delta_mb']} |"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="JSON格式化性能基准")
+    parser.add_argument("--sizes", default="1KB,100KB,1MB,10MB,100MB",
+                        help="逗号分隔的输入大小，如 1KB,1MB,500MB")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例重复次数（取最好）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    rows = run([s for s in args.sizes.split(",") if s], args.repeat)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
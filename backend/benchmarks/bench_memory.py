@@ -0,0 +1,101 @@
+"""
+内存诊断的开销基准
+    - tracemalloc 未启动 / frames=1 / frames=8 时，分配密集的工作（JSON 解析与格式化、条码渲染）的耗时
+    - 记录快照与按模块汇总差异的耗时
+    - 内存报告中缓存按前缀统计的耗时（与缓存条目数成正比）
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory --entries 20000 --json
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from app.core.cache import MemoryCache
+from app.core.memory import MemoryTracer
+from app.tools.code_generator import CodeGeneratorConfig, generate_single_code
+from app.tools.code_render_cache import RenderCache
+
+REPEAT = 3
+
+
+def _best_ms(func: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _workloads() -> Dict[str, Callable[[], Any]]:
+    records = [{"id": i, "name": f"用户{i}", "tags": ["a", "b", "c"], "score": i * 0.5} for i in range(20000)]
+    text = json.dumps(records, ensure_ascii=False)
+    no_cache = RenderCache(max_items=1, enabled=False)
+    configs = [CodeGeneratorConfig(content=f"AETHERIS-{i:06d}", code_type="qrcode") for i in range(50)]
+    return {
+        "json_roundtrip": lambda: json.dumps(json.loads(text), ensure_ascii=False, indent=2),
+        "qrcode_x50": lambda: [generate_single_code(config, cache=no_cache) for config in configs],
+    }
+
+
+def bench_tracing() -> List[Dict[str, Any]]:
+    rows = []
+    workloads = _workloads()
+    for frames in (0, 1, 8):
+        if frames:
+            tracemalloc.start(frames)
+        for name, func in workloads.items():
+            rows.append({"frames": frames, "workload": name, "ms": round(_best_ms(func), 1)})
+        if frames:
+            tracer = MemoryTracer()
+            tracer.set_baseline()
+            _ = [workloads["json_roundtrip"]() for _ in range(2)]
+            start = time.perf_counter()
+            tracer.set_baseline()
+            baseline_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            tracer.diff(by="app")
+            diff_ms = (time.perf_counter() - start) * 1000
+            rows.append({"frames": frames, "workload": "snapshot / diff(by=app)",
+                         "ms": f"{baseline_ms:.0f} / {diff_ms:.0f}", "traced_mb": round(tracemalloc.get_traced_memory()[0] / 1024 / 1024, 1),
+                         "overhead_mb": round(tracemalloc.get_tracemalloc_memory() / 1024 / 1024, 1)})
+            tracemalloc.stop()
+    base = {row["workload"]: row["ms"] for row in rows if row["frames"] == 0}
+    for row in rows:
+        if row["workload"] in base:
+            row["relative"] = round(row["ms"] / base[row["workload"]], 2)
+    return rows
+
+
+def bench_report(entries: int) -> Dict[str, Any]:
+    cache = MemoryCache()
+    for i in range(entries):
+        prefix = "chat_history" if i % 2 else "tool:json_formatter"
+        cache.set(f"{prefix}:{i:08x}", [{"role": "user", "content": "消息" * 20}] * 10, ttl=3600)
+    return {"entries": entries, "ms": round(_best_ms(cache.memory_report), 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="内存诊断的开销基准")
+    parser.add_argument("--entries", type=int, default=10000, help="内存报告测试的缓存条目数")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    results = {"tracing": bench_tracing(), "report": bench_report(args.entries)}
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print("| frames | 工作 | 耗时(ms) | 相对未跟踪 |\n|---:|---|---:|---:|")
+    for row in results["tracing"]:
+        extra = f"（跟踪 {row['traced_mb']}MB，tracemalloc 自身 {row['overhead_mb']}MB）" if "traced_mb" in row else ""
+        print(f"| {row['frames'] or '未启动'} | {row['workload']}{extra} | {row['ms']} | {row.get('relative', '-')} |")
+    report = results["report"]
+    print(f"\n缓存按前缀统计：{report['entries']} 条 {report['ms']}ms")
+
+
+if __name__ == "__main__":
+    main()
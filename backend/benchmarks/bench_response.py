@@ -0,0 +1,114 @@
+"""
+统一响应序列化基准
+对比现有路径（success_response → ResponseModel 校验 → jsonable_encoder → JSONResponse 标准库编码，即 FastAPI 的默认处理）
+与快速路径 envelope_response（orjson 直接编码）以及拼接预先序列化的 data（raw_data）
+测量生成响应体的耗时与峰值常驻内存增量（不含 data 本身）
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_response
+    python -m benchmarks.bench_response --sizes 1 10 50 --json
+"""
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core import jsonlib
+from app.core.memory import get_process_peak_rss, get_rss
+from app.core.response import envelope_response, success_response
+
+
+def make_payloads(size_mb: int) -> Dict[str, Any]:
+    """约 size_mb MB 的典型结果：字段提取（大量小对象）、JSON 格式化（长字符串）"""
+    rows = size_mb * 1024 * 1024 // 100
+    records = [
+        {"id": i, "name": f"用户{i}", "email": f"user{i}@example.com", "score": i * 0.5, "active": i % 2 == 0}
+        for i in range(rows)
+    ]
+    text = json.dumps(records[:rows // 2], ensure_ascii=False, indent=2)
+    return {
+        "extractor": {"success": True, "data": records, "count": len(records)},
+        "formatter": {"success": True, "formatted": text, "stats": {"formatted_length": len(text)}},
+    }
+
+
+def legacy(data: Any) -> bytes:
+    return JSONResponse(jsonable_encoder(success_response(data=data))).body
+
+
+def fast(data: Any) -> bytes:
+    return envelope_response(data=data).body
+
+
+def _reset_peak_rss() -> bool:
+    """重置内核记录的峰值常驻内存（VmHWM，Linux 4.0+）"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def measure(build: Callable[[], bytes]) -> Dict[str, Any]:
+    """
+    耗时与峰值常驻内存增量
+    不用 tracemalloc：orjson 按字符串长度的数倍预留输出缓冲区，未写入的部分不占用内存，tracemalloc 会严重高估；
+    也不用采样线程：编码期间一直持有 GIL，采样线程无法运行
+    """
+    rss_start = get_rss()
+    peak_supported = _reset_peak_rss()
+    start = time.perf_counter()
+    body = build()
+    elapsed = time.perf_counter() - start
+    peak = get_process_peak_rss() if peak_supported else None
+    size = len(body)
+    del body
+    return {"ms": round(elapsed * 1000, 1), "body_mb": round(size / 1024 / 1024, 1),
+            "peak_mb": round((peak - rss_start) / 1024 / 1024, 1) if peak and rss_start else None}
+
+
+def run(sizes: List[int]) -> List[Dict[str, Any]]:
+    rows = []
+    for size in sizes:
+        for name, data in make_payloads(size).items():
+            raw = jsonlib.dumps_bytes(data)
+            cases = {
+                "success_response": lambda: legacy(data),
+                "envelope_response": lambda: fast(data),
+                "envelope_response(raw_data)": lambda: envelope_response(raw_data=raw).body,
+            }
+            for case, build in cases.items():
+                rows.append({"size_mb": size, "payload": name, "case": case, **measure(build)})
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    """以 Markdown 表格输出"""
+    print("| 大小(MB) | 结果 | 路径 | 耗时(ms) | 响应体(MB) | 峰值内存增量(MB) |")
+    print("|---:|---|---|---:|---:|---:|")
+    for row in rows:
+        print(
+            f"| {row['size_mb']} | {row['payload']} | {row['case']} | {row['ms']} | "
+            f"{row['body_mb']} | {row['peak_mb']} |"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="统一响应序列化基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50], help="结果大小（MB，约数）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    rows = run(args.sizes)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
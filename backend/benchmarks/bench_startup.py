@@ -0,0 +1,137 @@
+"""
+服务启动与工具加载基准
+在新的子进程中测量：
+    - import app.main 的耗时（-X importtime 的累计耗时与实测墙钟时间）以及是否导入了 Pillow/qrcode/barcode
+    - 导入耗时最多的模块
+    - 首个条码请求的延迟（冷启动，执行函数在首次请求时导入）与预热后的延迟
+可指定 git 版本对比（在临时 worktree 中测量该版本）
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 7 --compare-rev HEAD~1
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["PIL.Image", "qrcode", "barcode", "app.tools.code_generator"]
+
+# 子进程中执行的测量脚本
+_IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({"import_ms": elapsed * 1000, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+_REQUEST_SCRIPT = """
+import json, time, logging
+logging.disable(logging.CRITICAL)
+from fastapi.testclient import TestClient
+from app.main import app
+client = TestClient(app)
+timings = []
+for _ in range(3):
+    start = time.perf_counter()
+    response = client.post("/api/tools/code_generator/generate", json={"content": "startup"})
+    assert response.status_code == 200, response.text
+    timings.append((time.perf_counter() - start) * 1000)
+print(json.dumps({"first_request_ms": timings[0], "warm_request_ms": min(timings[1:])}))
+"""
+
+
+def _run(script: str, cwd: str, *args: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": cwd, "PYTHONDONTWRITEBYTECODE": "1"}
+    return subprocess.run(
+        [sys.executable, *args, "-c", script], cwd=cwd, env=env,
+        capture_output=True, text=True, check=True
+    )
+
+
+def import_times(cwd: str, top: int) -> Dict[str, Any]:
+    """-X importtime：app.main 的累计耗时与耗时最多的模块"""
+    result = _run("import app.main", cwd, "-X", "importtime")
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({"module": name.strip(), "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    main = next((m for m in modules if m["module"] == "app.main"), None)
+    top_modules = sorted(modules, key=lambda m: m["self_ms"], reverse=True)[:top]
+    return {"app_main_cumulative_ms": main["cumulative_ms"] if main else None, "top_modules": top_modules}
+
+
+def measure(cwd: str, repeat: int, top: int) -> Dict[str, Any]:
+    """在指定 backend 目录中测量（每项重复 repeat 次取中位数）"""
+    imports = [json.loads(_run(_IMPORT_SCRIPT, cwd).stdout.strip().splitlines()[-1]) for _ in range(repeat)]
+    requests = [json.loads(_run(_REQUEST_SCRIPT, cwd).stdout.strip().splitlines()[-1]) for _ in range(repeat)]
+    return {
+        "import_ms": round(statistics.median(item["import_ms"] for item in imports), 1),
+        "heavy_modules_at_import": imports[-1]["heavy"],
+        "first_request_ms": round(statistics.median(item["first_request_ms"] for item in requests), 1),
+        "warm_request_ms": round(statistics.median(item["warm_request_ms"] for item in requests), 1),
+        **import_times(cwd, top),
+    }
+
+
+def _worktree(rev: str) -> str:
+    """在临时目录中检出指定版本，返回其 backend 目录"""
+    path = tempfile.mkdtemp(prefix="aetheris-bench-")
+    os.rmdir(path)
+    subprocess.run(["git", "worktree", "add", "--detach", path, rev], cwd=BACKEND_DIR,
+                   check=True, capture_output=True)
+    return path
+
+
+def print_result(label: str, result: Dict[str, Any]) -> None:
+    print(f"### {label}")
+    print(f"- import app.main: {result['import_ms']}ms（-X importtime 累计 {result['app_main_cumulative_ms']}ms）")
+    print(f"- 导入时已加载的重量级模块: {', '.join(result['heavy_modules_at_import']) or '无'}")
+    print(f"- 首个条码请求: {result['first_request_ms']}ms，之后: {result['warm_request_ms']}ms")
+    print("| 模块 | 自身(ms) | 累计(ms) |")
+    print("|---|---:|---:|")
+    for module in result["top_modules"]:
+        print(f"| {module['module']} | {module['self_ms']:.1f} | {module['cumulative_ms']:.1f} |")
+    print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="服务启动与工具加载基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测量的子进程次数（取中位数）")
+    parser.add_argument("--top", type=int, default=10, help="列出导入耗时最多的模块数")
+    parser.add_argument("--compare-rev", default=None, help="同时测量的 git 版本（如 HEAD~1）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, Any]] = {}
+    worktree: Optional[str] = None
+    try:
+        if args.compare_rev:
+            worktree = _worktree(args.compare_rev)
+            results[args.compare_rev] = measure(os.path.join(worktree, "backend"), args.repeat, args.top)
+        results["当前"] = measure(BACKEND_DIR, args.repeat, args.top)
+    finally:
+        if worktree:
+            subprocess.run(["git", "worktree", "remove", "--force", worktree], cwd=BACKEND_DIR,
+                           capture_output=True)
+            shutil.rmtree(worktree, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        for label, result in results.items():
+            print_result(label, result)
+
+
+if __name__ == "__main__":
+    main()
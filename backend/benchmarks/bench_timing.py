@@ -0,0 +1,187 @@
+"""
+请求耗时统计与采样分析的开销基准
+    - 直方图记录、span 在请求内外的单次开销
+    - 同一个最小 FastAPI 应用在有/无 TimingMiddleware + TimedRoute 时的单次请求耗时（直接调用 ASGI，不经网络）
+    - 采样分析进行中，另一个线程执行纯 Python 计算的吞吐下降与采样线程自身的 CPU 时间
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_timing
+    python -m benchmarks.bench_timing --requests 5000 --json
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from fastapi import APIRouter, FastAPI
+
+from app.core import timing
+from app.core.timing import Histogram, RequestTiming, SamplingProfiler, TimedRoute, TimingMiddleware, TimingStats, span
+
+REPEAT = 5
+
+
+def _best_ns(func: Callable[[], Any], number: int) -> float:
+    """重复 REPEAT 轮取最快一轮，返回单次耗时（纳秒）"""
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best / number * 1e9
+
+
+def bench_primitives(number: int) -> List[Dict[str, Any]]:
+    histogram = Histogram()
+
+    def span_outside() -> None:
+        with span("cache"):
+            pass
+
+    request_timing = RequestTiming(time.perf_counter())
+
+    def span_inside() -> None:
+        token = timing._current.set(request_timing)
+        try:
+            with span("cache"):
+                pass
+        finally:
+            timing._current.reset(token)
+
+    def context_only() -> None:
+        token = timing._current.set(request_timing)
+        timing._current.reset(token)
+
+    baseline = _best_ns(context_only, number)
+    return [
+        {"case": "Histogram.observe", "ns": round(_best_ns(lambda: histogram.observe(0.0123), number), 1)},
+        {"case": "span（不在请求中）", "ns": round(_best_ns(span_outside, number), 1)},
+        {"case": "span（请求中）", "ns": round(_best_ns(span_inside, number) - baseline, 1)},
+    ]
+
+
+def _make_app(instrumented: bool) -> FastAPI:
+    router = APIRouter(route_class=TimedRoute) if instrumented else APIRouter()
+
+    @router.get("/items/{item_id}")
+    async def get_item(item_id: int, q: str = ""):
+        return {"item_id": item_id, "q": q}
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    if instrumented:
+        app.add_middleware(TimingMiddleware, stats=TimingStats())
+    return app
+
+
+async def _requests(app: FastAPI, count: int) -> float:
+    """直接调用 ASGI 应用 count 次，返回单次耗时（微秒）"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/api/items/42", "raw_path": b"/api/items/42", "root_path": "",
+        "query_string": b"q=bench", "headers": [(b"host", b"bench")], "server": ("bench", 80), "client": ("bench", 1),
+    }
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        pass
+
+    start = time.perf_counter()
+    for _ in range(count):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def bench_requests(count: int) -> List[Dict[str, Any]]:
+    rows = []
+    apps = {"无统计": _make_app(False), "TimingMiddleware + TimedRoute": _make_app(True)}
+
+    async def run() -> None:
+        # 交替运行多轮，各取最快一轮，减少机器负载波动的影响
+        best = {name: float("inf") for name in apps}
+        for name, app in apps.items():
+            await _requests(app, 100)
+        for _ in range(REPEAT):
+            for name, app in apps.items():
+                best[name] = min(best[name], await _requests(app, count))
+        for name, us in best.items():
+            rows.append({"case": name, "us_per_request": round(us, 1)})
+
+    asyncio.run(run())
+    rows.append({"case": "开销", "us_per_request": round(rows[1]["us_per_request"] - rows[0]["us_per_request"], 1)})
+    return rows
+
+
+def _cpu_work(stop: threading.Event, counter: List[int]) -> None:
+    total = 0
+    while not stop.is_set():
+        for i in range(1000):
+            total += i * i
+        counter[0] += 1
+
+
+def bench_profiler(seconds: float) -> List[Dict[str, Any]]:
+    """采样期间纯 Python 计算线程的吞吐（相对不采样时）"""
+    rows = []
+    for interval_ms in (None, 10.0, 1.0):
+        stop, counter = threading.Event(), [0]
+        worker = threading.Thread(target=_cpu_work, args=(stop, counter))
+        worker.start()
+        result: Dict[str, Any] = {}
+        if interval_ms is None:
+            time.sleep(seconds)
+        else:
+            result = SamplingProfiler().run(seconds, interval_ms / 1000)
+        stop.set()
+        worker.join()
+        rows.append({
+            "interval_ms": interval_ms,
+            "work_per_s": round(counter[0] / seconds),
+            "samples": result.get("samples"),
+            "sampler_cpu_ms": result.get("sampler_cpu_ms"),
+            "us_per_sample": round(result["sampler_cpu_ms"] * 1000 / result["samples"], 1) if result else None,
+        })
+    base = rows[0]["work_per_s"]
+    for row in rows:
+        row["throughput"] = round(row["work_per_s"] / base, 3) if base else None
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="请求耗时统计与采样分析的开销基准")
+    parser.add_argument("--number", type=int, default=200000, help="单项操作的重复次数")
+    parser.add_argument("--requests", type=int, default=2000, help="每轮请求数")
+    parser.add_argument("--profile-seconds", type=float, default=3.0, help="每种采样间隔的测量时间（秒）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    results = {
+        "primitives": bench_primitives(args.number),
+        "requests": bench_requests(args.requests),
+        "profiler": bench_profiler(args.profile_seconds),
+    }
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print("| 操作 | 单次(ns) |\n|---|---:|")
+    for row in results["primitives"]:
+        print(f"| {row['case']} | {row['ns']} |")
+    print("\n| 应用 | 单次请求(µs) |\n|---|---:|")
+    for row in results["requests"]:
+        print(f"| {row['case']} | {row['us_per_request']} |")
+    print("\n| 采样间隔(ms) | 计算吞吐(相对) | 采样次数 | 采样线程CPU(ms) | 每次采样(µs) |\n|---:|---:|---:|---:|---:|")
+    for row in results["profiler"]:
+        interval = "不采样" if row["interval_ms"] is None else row["interval_ms"]
+        samples = "-" if row["samples"] is None else row["samples"]
+        cpu = "-" if row["sampler_cpu_ms"] is None else row["sampler_cpu_ms"]
+        per_sample = "-" if row["us_per_sample"] is None else row["us_per_sample"]
+        print(f"| {interval} | {row['throughput']} | {samples} | {cpu} | {per_sample} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""测试JSON工具的数值精度（超出 64 位的整数不能被 orjson 转成浮点数）"""
+import asyncio
+from app.core import jsonlib
+from app.tools.json_field_extractor import extract_json_fields
+from app.tools.json_formatter import format_json
+
+BIG = 18446744073709551616
+NEGATIVE_BIG = -9223372036854775809
+
+
+def test_loads_big_int():
+    """测试 jsonlib 解析大整数"""
+    print("=== 测试大整数解析 ===")
+    source = f'{{"id":{BIG},"neg":{NEGATIVE_BIG},"max":18446744073709551615}}'
+    for value in (source, source.encode("utf-8"), memoryview(source.encode("utf-8"))):
+        data = jsonlib.loads(value)
+        assert data == {"id": BIG, "neg": NEGATIVE_BIG, "max": 18446744073709551615}, data
+        assert isinstance(data["id"], int)
+    print("成功: True")
+    print()
+
+
+async def test_format_big_int():
+    """测试格式化保留大整数"""
+    print("=== 测试格式化大整数 ===")
+    result = await format_json({"input": f'{{"id":{BIG}}}'})
+    assert result["success"], result
+    assert result["compressed"] == f'{{"id":{BIG}}}', result["compressed"]
+    result = await format_json({"input": f'{{"id":{BIG}}}\n{{"id":1}}', "input_mode": "ndjson"})
+    assert result["success"], result
+    assert str(BIG) in result["compressed"], result["compressed"]
+    print("成功: True")
+    print()
+
+
+async def test_extract_big_int():
+    """测试字段提取保留大整数"""
+    print("=== 测试字段提取大整数 ===")
+    result = await extract_json_fields({"json_input": f'[{{"id":{BIG}}}]', "fields": ["id"]})
+    assert result["success"], result
+    assert str(BIG) in str(result), result
+    assert "e+19" not in str(result), result
+    print("成功: True")
+    print()
+
+
+if __name__ == "__main__":
+    test_loads_big_int()
+    asyncio.run(test_format_big_int())
+    asyncio.run(test_extract_big_int())
+    print("所有测试完成!")